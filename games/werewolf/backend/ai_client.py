@@ -1,6 +1,48 @@
+import os
+import random
+import threading
+import asyncio
+import contextvars
+import functools
+import importlib
+import importlib.util
+import requests
+import json
+import re
+import time
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from typing import Dict, Any, Optional, List, Tuple
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
 BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.abspath(os.path.join(BACKEND_DIR, "..", "..", ".."))
 
+def _import_sibling(name: str):
+    """Import a module next to this file (package-relative, or by file path like app.py loads us)."""
+    if __package__:
+        return importlib.import_module(f"{__package__}.{name}")
+    spec = importlib.util.spec_from_file_location(f"werewolf_{name}", os.path.join(BACKEND_DIR, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+# process-wide call metrics (app.py records into the same registry through ai_client.metrics)
+metrics = _import_sibling("metrics")
+# full provider responses live in a bounded audit store; decision meta only carries "raw_id" (see audit.py)
+audit = _import_sibling("audit")
+AUDIT_STORE = audit.AuditStore.from_env()
+# per-provider token buckets + AIMD concurrency window around every provider call (see ratelimit.py)
+ratelimit = _import_sibling("ratelimit")
+# per-provider circuit breakers and health scores used for failover routing (see health.py)
+health = _import_sibling("health")
+# content-addressed cache of model replies for byte-identical requests (see llmcache.py)
+llmcache = _import_sibling("llmcache")
+# record / replay of provider traffic for reproducible runs without network (see replay.py)
+replay = _import_sibling("replay")
+
 def load_model_config() -> Dict[str, Any]:
     """
     加载后端可配置的模型映射配置。
@@ -33,42 +75,145 @@ def load_model_config() -> Dict[str, Any]:
             continue
     return {}
 
-# Preserve helper functions from previous implementation
-import os
-import random
-import requests
-import json
-import time
-from typing import Dict, Any, Optional, List, Tuple
-
 # Load config once
 _MODEL_CFG = load_model_config()
 
-# cached API keys file (project root: api_keys.json)
-_API_KEYS: Optional[Dict[str, Any]] = None
+# mtime-validated JSON config cache (api_keys.json, games/werewolf/config.json), shared with app.py.
+# Entries are re-read only when the file's mtime/size changes or after invalidate_config_cache().
+API_KEYS_PATH = os.path.join(PROJECT_ROOT, "api_keys.json")
+_JSON_CACHE: Dict[str, Tuple[Any, Any]] = {}
+_JSON_CACHE_LOCK = threading.Lock()
+
+def _file_stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+def read_json_cached(path: str) -> Any:
+    """
+    读取 JSON 文件并按 (mtime, size) 缓存解析结果；文件不存在或解析失败时返回 None。
+    返回的对象在缓存中共享，调用方不要原地修改。
+    """
+    stamp = _file_stamp(path)
+    cached = _JSON_CACHE.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    data = None
+    if stamp is not None:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            data = None
+    with _JSON_CACHE_LOCK:
+        _JSON_CACHE[path] = (stamp, data)
+    return data
+
+def invalidate_config_cache(path: Optional[str] = None):
+    """Drop one cached file (or all of them) so the next read goes to disk."""
+    with _JSON_CACHE_LOCK:
+        if path is None:
+            _JSON_CACHE.clear()
+        else:
+            _JSON_CACHE.pop(path, None)
+
+_EMPTY_API_KEYS: Dict[str, Any] = {"player_map": {}}
+# (parsed object from read_json_cached, normalized copy handed out by load_api_keys)
+_API_KEYS_NORMALIZED: Tuple[Any, Dict[str, Any]] = (None, _EMPTY_API_KEYS)
+
 def load_api_keys() -> Dict[str, Any]:
     """
-    从项目根目录读取 api_keys.json 并缓存结果。
+    从项目根目录读取 api_keys.json（经 read_json_cached 缓存，文件修改后自动重新加载）。
     支持两种 caller 传入 api_key 的形式：
       - 传入 provider id（即 api_keys.json 的 key）
       - 传入实际的 secret string（value['api_key']）
     返回 dict 或空 dict。
     """
-    global _API_KEYS
-    if _API_KEYS is not None:
-        return _API_KEYS
-    p = os.path.join(PROJECT_ROOT, "api_keys.json")
-    try:
-        if os.path.exists(p):
-            with open(p, "r", encoding="utf-8") as f:
-                _API_KEYS = json.load(f) or {}
-                if "player_map" not in _API_KEYS:
-                    _API_KEYS["player_map"] = {}
-                return _API_KEYS
-    except Exception:
-        _API_KEYS = {}
-    _API_KEYS = {"player_map": {}}
-    return _API_KEYS
+    global _API_KEYS_NORMALIZED
+    keys = read_json_cached(API_KEYS_PATH)
+    if not isinstance(keys, dict):
+        return _EMPTY_API_KEYS
+    source, normalized = _API_KEYS_NORMALIZED
+    if source is not keys:
+        # normalize a copy, once per parse: the cached object is shared with every other reader of the file
+        normalized = dict(keys)
+        normalized.setdefault("player_map", {})
+        _API_KEYS_NORMALIZED = (keys, normalized)
+    return normalized
+
+def _entry_secret(entry: Dict[str, Any]) -> Optional[str]:
+    return entry.get("api_key") or entry.get("key") or entry.get("secret")
+
+def _entry_url(entry: Dict[str, Any]) -> Optional[str]:
+    return entry.get("model_url") or entry.get("url") or entry.get("endpoint")
+
+# provider table derived from the currently cached api_keys.json; rebuilt only when that object changes
+_PROVIDER_INDEX: Dict[str, Any] = {"source": None, "providers": {}, "by_secret": {}, "resolved": {}}
+_PROVIDER_INDEX_LOCK = threading.Lock()
+
+def _provider_index() -> Dict[str, Any]:
+    global _PROVIDER_INDEX
+    keys = load_api_keys()
+    index = _PROVIDER_INDEX
+    if index["source"] is keys:
+        return index
+    providers: Dict[str, Dict[str, Any]] = {}
+    raw_providers = keys.get("providers")
+    if isinstance(raw_providers, dict):
+        providers = {k: v for k, v in raw_providers.items() if isinstance(v, dict)}
+    if not providers:
+        providers = {k: v for k, v in keys.items() if isinstance(v, dict) and (
+            "api_key" in v or "key" in v or "secret" in v
+        )}
+    by_secret: Dict[str, str] = {}
+    for name, entry in providers.items():
+        for field in ("api_key", "key", "secret"):
+            value = entry.get(field)
+            if isinstance(value, str) and value and value not in by_secret:
+                by_secret[value] = name
+    index = {"source": keys, "providers": providers, "by_secret": by_secret, "resolved": {}}
+    with _PROVIDER_INDEX_LOCK:
+        _PROVIDER_INDEX = index
+    return index
+
+def get_providers() -> Dict[str, Dict[str, Any]]:
+    return _provider_index()["providers"]
+
+def resolve_provider(api_key: Optional[str]) -> Dict[str, Any]:
+    """
+    把 caller 传入的 api_key（provider id / 实际 secret / 空）解析为
+    {"provider", "api_key", "model", "api_url"}，结果按 api_keys.json 版本缓存。
+    """
+    index = _provider_index()
+    cache_key = api_key or ""
+    resolved = index["resolved"].get(cache_key)
+    if resolved is not None:
+        return resolved
+    providers = index["providers"]
+    provider_name: Optional[str] = None
+    if not api_key and providers:
+        # pick first available provider when no api_key provided
+        provider_name = next(iter(providers))
+    elif api_key and providers:
+        # support caller passing provider name or raw key
+        if api_key in providers:
+            provider_name = api_key
+        else:
+            provider_name = index["by_secret"].get(api_key)
+    entry = providers.get(provider_name) if provider_name else None
+    if entry:
+        resolved = {
+            "provider": provider_name,
+            "api_key": _entry_secret(entry) or api_key,
+            "model": entry.get("model"),
+            "api_url": _entry_url(entry),
+        }
+    else:
+        resolved = {"provider": None, "api_key": api_key, "model": None, "api_url": None}
+    index["resolved"][cache_key] = resolved
+    return resolved
 
 OPENAI_API_URL = _MODEL_CFG.get("openai_api_url", "https://api.openai.com/v1/chat/completions")
 _DEFAULT_MODEL = _MODEL_CFG.get("default_model", "gpt-4o-mini")
@@ -76,6 +221,587 @@ _PLAYER_MODELS: Dict[str, str] = _MODEL_CFG.get("player_models", {})
 # runtime storage for last parsed actions per player (for logging/inspection)
 _LAST_ACTIONS: Dict[str, Any] = {}
 
+# HTTP connection pooling: one keep-alive session per resolved api_url, shared by all rooms/threads.
+# Tunable through ai_models.json -> "http": {"pool_size", "pool_connections", "retries", "backoff", "keep_alive", "timeout"}
+# or the WEREWOLF_HTTP_* environment variables (env wins).
+_HTTP_CFG: Dict[str, Any] = _MODEL_CFG.get("http") if isinstance(_MODEL_CFG.get("http"), dict) else {}
+
+def _config_setting(section: Dict[str, Any], env_prefix: str, name: str, default: Any, cast=float) -> Any:
+    raw = os.getenv(f"{env_prefix}{name.upper()}")
+    if raw is None:
+        raw = section.get(name, default)
+    try:
+        if cast is bool:
+            return str(raw).strip().lower() not in ("0", "false", "no", "off", "")
+        return cast(raw)
+    except (TypeError, ValueError):
+        return default
+
+def _http_setting(name: str, default: Any, cast=float) -> Any:
+    return _config_setting(_HTTP_CFG, "WEREWOLF_HTTP_", name, default, cast)
+
+HTTP_POOL_SIZE = _http_setting("pool_size", 16, int)
+HTTP_POOL_CONNECTIONS = _http_setting("pool_connections", 4, int)
+HTTP_RETRIES = _http_setting("retries", 2, int)
+HTTP_BACKOFF = _http_setting("backoff", 0.5, float)
+HTTP_KEEP_ALIVE = _http_setting("keep_alive", True, bool)
+HTTP_TIMEOUT = _http_setting("timeout", 12.0, float)
+
+# Provider rate limiting: "rpm" / "tpm" / "max_concurrency" per provider entry in api_keys.json, defaults from
+# ai_models.json -> "rate_limit": {"enabled", "max_concurrency", "min_concurrency", "max_wait"} or WEREWOLF_RATE_LIMIT_*.
+_RATE_CFG: Dict[str, Any] = _MODEL_CFG.get("rate_limit") if isinstance(_MODEL_CFG.get("rate_limit"), dict) else {}
+
+def _rate_setting(name: str, default: Any, cast=float) -> Any:
+    return _config_setting(_RATE_CFG, "WEREWOLF_RATE_LIMIT_", name, default, cast)
+
+RATE_LIMIT_ENABLED = _rate_setting("enabled", True, bool)
+RATE_LIMITS = ratelimit.LimiterRegistry({
+    "max_concurrency": _rate_setting("max_concurrency", HTTP_POOL_SIZE, int),
+    "min_concurrency": _rate_setting("min_concurrency", 1, int),
+    "max_wait": _rate_setting("max_wait", 30.0, float),
+})
+
+# Per-call deadline (seconds, covering limiter wait, retries and hedging) by metrics phase: ai_models.json ->
+# "deadlines": {"default": 20, "day_discussion": 25, ...} or WEREWOLF_DEADLINE_<PHASE> / WEREWOLF_DEADLINE_DEFAULT.
+_DEADLINE_CFG: Dict[str, Any] = _MODEL_CFG.get("deadlines") if isinstance(_MODEL_CFG.get("deadlines"), dict) else {}
+CALL_DEADLINE = _config_setting(_DEADLINE_CFG, "WEREWOLF_DEADLINE_", "default", 20.0, float)
+# an attempt that would get less time than this is not started
+MIN_ATTEMPT_SECONDS = 0.5
+# cap for the exponential backoff between attempts (before jitter)
+MAX_BACKOFF_SECONDS = 8.0
+
+def call_deadline(phase: Optional[str] = None) -> float:
+    """Time budget in seconds for one model call in `phase` (default: the current metrics phase)."""
+    phase = phase or metrics.current_phase()
+    return max(MIN_ATTEMPT_SECONDS, _config_setting(_DEADLINE_CFG, "WEREWOLF_DEADLINE_", phase, CALL_DEADLINE, float))
+
+# Hedged requests: when the primary call has not answered after its provider's p95 latency (or "delay" seconds),
+# the same prompt goes to a backup provider ("hedge_provider" on the provider entry in api_keys.json, else
+# "provider" here) and the first valid reply wins. ai_models.json -> "hedge": {"enabled", "provider", "delay",
+# "default_delay", "min_delay", "min_samples"} or WEREWOLF_HEDGE_*. Off by default: it can double provider spend.
+_HEDGE_CFG: Dict[str, Any] = _MODEL_CFG.get("hedge") if isinstance(_MODEL_CFG.get("hedge"), dict) else {}
+
+def _hedge_setting(name: str, default: Any, cast=float) -> Any:
+    return _config_setting(_HEDGE_CFG, "WEREWOLF_HEDGE_", name, default, cast)
+
+HEDGE_ENABLED = _hedge_setting("enabled", False, bool)
+HEDGE_PROVIDER = _hedge_setting("provider", "", str) or None
+# fixed hedge delay in seconds; 0 = use the primary's observed p95
+HEDGE_DELAY = _hedge_setting("delay", 0.0, float)
+HEDGE_DEFAULT_DELAY = _hedge_setting("default_delay", 2.0, float)
+HEDGE_MIN_DELAY = _hedge_setting("min_delay", 0.25, float)
+HEDGE_MIN_SAMPLES = _hedge_setting("min_samples", 20, int)
+_HEDGE_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_HEDGE_LOCK = threading.Lock()
+# backoff jitter only; kept off the global random module so seeded game runs are not perturbed by retries
+_JITTER = random.Random()
+
+# Circuit breakers: ai_models.json -> "circuit_breaker": {"enabled", "failure_threshold", "open_seconds",
+# "max_open_seconds", "failover"} or WEREWOLF_BREAKER_*. With failover on, calls for a provider whose breaker
+# is open go to the healthiest provider listed in its "compatible" entry in api_keys.json; otherwise they fail fast.
+_BREAKER_CFG: Dict[str, Any] = _MODEL_CFG.get("circuit_breaker") if isinstance(_MODEL_CFG.get("circuit_breaker"), dict) else {}
+
+def _breaker_setting(name: str, default: Any, cast=float) -> Any:
+    return _config_setting(_BREAKER_CFG, "WEREWOLF_BREAKER_", name, default, cast)
+
+BREAKER_ENABLED = _breaker_setting("enabled", True, bool)
+FAILOVER_ENABLED = _breaker_setting("failover", True, bool)
+PROVIDER_HEALTH = health.HealthRegistry(
+    failure_threshold=_breaker_setting("failure_threshold", 5, int),
+    open_seconds=_breaker_setting("open_seconds", 30.0, float),
+    max_open_seconds=_breaker_setting("max_open_seconds", 300.0, float),
+)
+# outcomes that say nothing about whether the provider is up
+_HEALTH_NEUTRAL_OUTCOMES = frozenset({"http_429", "rate_limited", "deadline_exceeded", "circuit_open"})
+
+# Response cache: ai_models.json -> "response_cache": {"enabled", "max_entries", "ttl", "path", "max_disk_entries"}
+# or WEREWOLF_RESPONSE_CACHE_*. Off by default: a game samples at temperature 0.7, so replaying a cached reply
+# is only what you want for eval reruns / replay debugging. "path" adds an SQLite tier that survives restarts.
+_CACHE_CFG: Dict[str, Any] = _MODEL_CFG.get("response_cache") if isinstance(_MODEL_CFG.get("response_cache"), dict) else {}
+
+def _cache_setting(name: str, default: Any, cast=float) -> Any:
+    return _config_setting(_CACHE_CFG, "WEREWOLF_RESPONSE_CACHE_", name, default, cast)
+
+RESPONSE_CACHE = llmcache.ResponseCache(
+    max_entries=_cache_setting("max_entries", 1000, int),
+    ttl=_cache_setting("ttl", 0.0, float),
+    path=_cache_setting("path", "", str) or None,
+    max_disk_entries=_cache_setting("max_disk_entries", 50000, int),
+) if _cache_setting("enabled", False, bool) else None
+
+# Record / replay: ai_models.json -> "transport": {"mode": "record" | "replay", "path", "replay_latency"}
+# or WEREWOLF_TRANSPORT_*. Every pooled session then records its provider traffic to / serves it from `path`.
+_TRANSPORT_CFG: Dict[str, Any] = _MODEL_CFG.get("transport") if isinstance(_MODEL_CFG.get("transport"), dict) else {}
+
+def _transport_setting(name: str, default: Any, cast=float) -> Any:
+    return _config_setting(_TRANSPORT_CFG, "WEREWOLF_TRANSPORT_", name, default, cast)
+
+TRANSCRIPT: Optional[Any] = None
+
+_HTTP_SESSIONS: Dict[str, requests.Session] = {}
+_HTTP_SESSIONS_LOCK = threading.Lock()
+_MOCK_LLM_MODULE: Any = None
+
+def _load_mock_llm():
+    global _MOCK_LLM_MODULE
+    if _MOCK_LLM_MODULE is None:
+        try:
+            _MOCK_LLM_MODULE = _import_sibling("mock_llm")
+        except Exception:
+            _MOCK_LLM_MODULE = False
+    return _MOCK_LLM_MODULE or None
+
+def _build_http_session() -> requests.Session:
+    # one attempt per POST: every retry (connect errors, 429, 5xx, bad JSON) is _call_with_retries' decision,
+    # so it stays within the call deadline and goes through the provider limiter / circuit breaker again
+    retry = Retry(total=0, connect=0, read=0, status=0, redirect=0, raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    mock_llm = _load_mock_llm()
+    if mock_llm is not None:
+        # model_url = mock://...: offline in-process provider (see mock_llm.py), same retry policy
+        session.mount(mock_llm.MOCK_SCHEME, mock_llm.MockLLMAdapter(max_retries=retry))
+    transcript = TRANSCRIPT
+    if transcript is not None:
+        for prefix, inner in list(session.adapters.items()):
+            session.mount(prefix, transcript.adapter(inner))
+    session.headers["Connection"] = "keep-alive" if HTTP_KEEP_ALIVE else "close"
+    return session
+
+def get_http_session(api_url: str) -> requests.Session:
+    """
+    返回 api_url 对应的共享 requests.Session（线程安全的懒加载）。
+    同一 provider endpoint 的所有调用复用同一个连接池，避免每次调用重新握手 TCP+TLS。
+    """
+    session = _HTTP_SESSIONS.get(api_url)
+    if session is not None:
+        return session
+    with _HTTP_SESSIONS_LOCK:
+        session = _HTTP_SESSIONS.get(api_url)
+        if session is None:
+            session = _build_http_session()
+            _HTTP_SESSIONS[api_url] = session
+        return session
+
+def close_http_sessions():
+    """Close and forget all pooled sessions (e.g. after api_keys.json changes)."""
+    with _HTTP_SESSIONS_LOCK:
+        sessions = list(_HTTP_SESSIONS.values())
+        _HTTP_SESSIONS.clear()
+    for session in sessions:
+        try:
+            session.close()
+        except Exception:
+            pass
+
+def use_transcript(mode: Optional[str], path: Optional[str] = None, replay_latency: bool = False) -> Optional[Any]:
+    """
+    Switch provider traffic to record ("record": real calls, appended to `path`) or replay ("replay": served
+    from `path`, no network) mode; mode=None goes back to plain calls. Pooled sessions are rebuilt.
+    """
+    global TRANSCRIPT
+    TRANSCRIPT = replay.Transcript(path, mode, replay_latency=replay_latency) if mode else None
+    close_http_sessions()
+    return TRANSCRIPT
+
+if _transport_setting("mode", "", str) and _transport_setting("path", "", str):
+    use_transcript(_transport_setting("mode", "", str).strip().lower(), _transport_setting("path", "", str),
+                   replay_latency=_transport_setting("replay_latency", False, bool))
+
+# per-call accounting; phase comes from the caller's metrics.phase(...) block (see app.py)
+LLM_REQUESTS = metrics.REGISTRY.counter(
+    "werewolf_llm_requests", "Chat-completion HTTP calls by outcome", ("provider", "model", "phase", "outcome"))
+LLM_LATENCY = metrics.REGISTRY.histogram(
+    "werewolf_llm_request_seconds", "Chat-completion call latency including transport retries", ("provider", "model", "phase"))
+LLM_RETRIES = metrics.REGISTRY.counter(
+    "werewolf_llm_retries", "Transport-level retries (429/5xx/connect) taken by chat-completion calls", ("provider", "model"))
+LLM_TOKENS = metrics.REGISTRY.counter(
+    "werewolf_llm_tokens", "Prompt/completion tokens (provider usage, else estimated from UTF-8 size)", ("provider", "model", "phase", "kind"))
+LLM_LIMITER_WAIT = metrics.REGISTRY.histogram(
+    "werewolf_llm_limiter_wait_seconds", "Time calls spent waiting for the provider rate limiter", ("provider",))
+LLM_HEDGES = metrics.REGISTRY.counter(
+    "werewolf_llm_hedges", "Hedged requests: fired (backup sent) and won (backup answered first)", ("provider", "backup", "outcome"))
+LLM_CIRCUIT = metrics.REGISTRY.counter(
+    "werewolf_llm_circuit_transitions", "Circuit breaker state changes per provider", ("provider", "state"))
+LLM_FAILOVERS = metrics.REGISTRY.counter(
+    "werewolf_llm_failovers", "Calls rerouted from a provider with an open circuit", ("provider", "target"))
+LLM_CACHE = metrics.REGISTRY.counter(
+    "werewolf_llm_cache_lookups", "Response cache lookups by tier (memory / disk hit, or miss)", ("model", "result"))
+LLM_THROTTLED = metrics.REGISTRY.counter(
+    "werewolf_llm_throttled", "429 / 5xx pushback seen per provider (each one shrinks its concurrency window)", ("provider", "status"))
+
+def _estimate_tokens(text: str) -> int:
+    # ~4 bytes per token: about right for English, and for CJK (3 bytes per char) a bit under one token per char
+    return max(1, len(text.encode("utf-8")) // 4) if text else 0
+
+def _call_outcome(exc: Exception) -> str:
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return f"http_{exc.response.status_code}"
+    if isinstance(exc, requests.Timeout):
+        return "timeout"
+    if isinstance(exc, requests.exceptions.RetryError):
+        return "retries_exhausted"
+    if isinstance(exc, requests.ConnectionError):
+        return "connection_error"
+    if isinstance(exc, ValueError):
+        return "bad_json"
+    return "error"
+
+def _usage_tokens(req: Dict[str, Any], data: Any, text: Optional[str]) -> Tuple[int, int]:
+    """(prompt, completion) tokens: provider usage when reported, else estimated."""
+    usage = data.get("usage") if isinstance(data, dict) else None
+    usage = usage if isinstance(usage, dict) else {}
+    prompt_tokens = usage.get("prompt_tokens")
+    if not isinstance(prompt_tokens, int):
+        prompt_tokens = sum(_estimate_tokens(str(m.get("content") or "")) for m in req["payload"].get("messages", []))
+    completion_tokens = usage.get("completion_tokens")
+    if not isinstance(completion_tokens, int):
+        completion_tokens = _estimate_tokens(text or "")
+    return prompt_tokens, completion_tokens
+
+def _record_llm_call(req: Dict[str, Any], latency: float, outcome: str, retries: int = 0, data: Any = None, text: Optional[str] = None):
+    labels = {"provider": req.get("provider") or "default", "model": req.get("model") or "", "phase": metrics.current_phase()}
+    LLM_REQUESTS.inc(outcome=outcome, **labels)
+    LLM_LATENCY.observe(latency, **labels)
+    if retries:
+        LLM_RETRIES.inc(retries, provider=labels["provider"], model=labels["model"])
+    if outcome != "ok":
+        return
+    prompt_tokens, completion_tokens = _usage_tokens(req, data, text)
+    LLM_TOKENS.inc(prompt_tokens, kind="prompt", **labels)
+    LLM_TOKENS.inc(completion_tokens, kind="completion", **labels)
+
+def _provider_limiter(req: Dict[str, Any]) -> Optional[Any]:
+    if not RATE_LIMIT_ENABLED:
+        return None
+    provider = req.get("provider") or "default"
+    return RATE_LIMITS.get(provider, get_providers().get(provider))
+
+def _reserved_tokens(req: Dict[str, Any]) -> int:
+    """Tokens/min budget taken up front: estimated prompt + the max_tokens the reply may use."""
+    prompt = sum(_estimate_tokens(str(m.get("content") or "")) for m in req["payload"].get("messages", []))
+    return prompt + int(req["payload"].get("max_tokens") or 0)
+
+def _throttled(limiter: Optional[Any], status: Any, retry_after: Optional[float] = None):
+    if limiter is None:
+        return
+    LLM_THROTTLED.inc(provider=limiter.name, status=str(status))
+    limiter.throttle(retry_after)
+
+def _post_chat(req: Dict[str, Any], limiter: Optional[Any], timeout: float, stream: bool = False) -> requests.Response:
+    """
+    One POST through the pooled session, no transport-level retries. A 429 pauses the whole provider for its
+    Retry-After before it is handed back; other error statuses reach the limiter through _release_limiter.
+    """
+    session = get_http_session(req["api_url"])
+    if stream:
+        r = session.post(req["api_url"], json=req["payload"], headers=req["headers"], timeout=timeout, stream=True)
+    else:
+        r = session.post(req["api_url"], json=req["payload"], headers=req["headers"], timeout=timeout)
+    if getattr(r, "status_code", None) == 429:
+        _throttled(limiter, 429, ratelimit.parse_retry_after(r.headers.get("Retry-After")))
+    return r
+
+def _release_limiter(limiter: Optional[Any], req: Dict[str, Any], status: Optional[int], used_tokens: int = 0, exc: Optional[Exception] = None):
+    if limiter is None:
+        return
+    if status in ratelimit.THROTTLE_STATUSES and status != 429:
+        # 429 was already reported (with its Retry-After) by _post_chat; other 4xx (bad model name, rejected
+        # response_format, auth) are this request's fault and must not shrink the window for every player
+        _throttled(limiter, status)
+    elif isinstance(exc, requests.Timeout):
+        _throttled(limiter, "timeout")
+    limiter.release(ok=status is not None and status < 400 and exc is None,
+                    token_delta=(used_tokens - _reserved_tokens(req)) if used_tokens else 0)
+
+def _valid_reply(req: Dict[str, Any], text: Optional[str]) -> bool:
+    """A reply worth returning without another attempt: non-empty, and parseable JSON when JSON mode was asked for."""
+    if not text:
+        return False
+    if "response_format" not in req["payload"]:
+        return True
+    try:
+        json.loads(text.strip())
+        return True
+    except ValueError:
+        return False
+
+_RETRYABLE_OUTCOMES = frozenset({
+    "timeout", "connection_error", "retries_exhausted", "bad_json", "rate_limited",
+    "http_429", "http_500", "http_502", "http_503", "http_504",
+})
+
+def _chat_attempt(req: Dict[str, Any], deadline: float, on_token=None) -> Dict[str, Any]:
+    """
+    One request (limiter slot, POST, parse) within `deadline` (epoch seconds).
+    Returns {"text", "data", "outcome", "error", "retries", "retry_after", "chunks", "valid"}; never raises.
+    """
+    result: Dict[str, Any] = {"text": None, "data": None, "outcome": "error", "error": None, "retries": 0,
+                              "retry_after": None, "chunks": 0, "valid": False}
+    remaining = deadline - time.time()
+    if remaining < MIN_ATTEMPT_SECONDS:
+        result.update(outcome="deadline_exceeded", error="deadline exceeded before the request was sent")
+        return result
+    # the breaker goes first: a rejected call must not take (and then leak) a limiter slot or reserved tokens
+    provider_health = PROVIDER_HEALTH.get(req.get("provider") or "default") if BREAKER_ENABLED else None
+    if provider_health is not None and not provider_health.breaker.allow():
+        provider_health.stats["rejected"] += 1
+        result.update(outcome="circuit_open", error=f"circuit open for provider {provider_health.name}")
+        return result
+    limiter = _provider_limiter(req)
+    if limiter is not None:
+        max_wait = min(limiter.max_wait, remaining - MIN_ATTEMPT_SECONDS)
+        waited = limiter.acquire(_reserved_tokens(req), max_wait=max_wait)
+        LLM_LIMITER_WAIT.observe(waited if waited is not None else max_wait, provider=limiter.name)
+        if waited is None:
+            result.update(outcome="rate_limited", error=f"rate limiter: no {limiter.name} slot within {max_wait:.1f}s")
+            # hands a claimed half-open probe back; nothing was sent
+            _report_health(provider_health, result["outcome"], 0.0)
+            return result
+    timeout = max(MIN_ATTEMPT_SECONDS, min(HTTP_TIMEOUT, deadline - time.time()))
+    status: Optional[int] = None
+    used_tokens = 0
+    error: Optional[Exception] = None
+    sent_at = time.time()
+    try:
+        stream = bool(req["payload"].get("stream"))
+        r = _post_chat(req, limiter, timeout, stream=stream)
+        status = getattr(r, "status_code", 200)
+        if status in (429, 503):
+            result["retry_after"] = ratelimit.parse_retry_after(r.headers.get("Retry-After"))
+        if not stream:
+            r.raise_for_status()
+            data = r.json()
+            text = _extract_chat_text(data)
+        else:
+            with r:
+                r.raise_for_status()
+                data, text = _read_chat_stream(r, req, on_token, result)
+        result.update(data=data, text=text, outcome="ok", valid=_valid_reply(req, text))
+        used_tokens = sum(_usage_tokens(req, data, text))
+    except Exception as e:
+        error = e
+        result.update(outcome=_call_outcome(e), error=str(e))
+    finally:
+        _release_limiter(limiter, req, status, used_tokens, error)
+    _report_health(provider_health, result["outcome"], time.time() - sent_at)
+    return result
+
+def _report_health(provider_health: Optional[Any], outcome: str, latency: float):
+    if provider_health is None:
+        return
+    if outcome in _HEALTH_NEUTRAL_OUTCOMES:
+        provider_health.breaker.cancel()
+        return
+    state = provider_health.observe(outcome == "ok", latency)
+    if state:
+        LLM_CIRCUIT.inc(provider=provider_health.name, state=state)
+        print(f"[WARN] provider {provider_health.name} circuit -> {state} (last outcome {outcome})")
+
+def report_probe(provider: str, reachable: Optional[bool]) -> Dict[str, Any]:
+    """Feed an out-of-band reachability probe (/config/api_keys/test) into the provider's health; returns its snapshot."""
+    provider_health = PROVIDER_HEALTH.get(provider)
+    if reachable is True:
+        state = provider_health.breaker.probe_reachable()
+        if state:
+            LLM_CIRCUIT.inc(provider=provider, state=state)
+    elif reachable is False:
+        _report_health(provider_health, "probe_unreachable", 0.0)
+    return provider_health.snapshot()
+
+def _compatible_providers(provider: Optional[str]) -> List[str]:
+    providers = get_providers()
+    entry = providers.get(provider or "") or {}
+    value = entry.get("compatible") or []
+    if isinstance(value, str):
+        value = [value]
+    return [name for name in value if isinstance(name, str) and name != provider and name in providers]
+
+def _route_request(req: Dict[str, Any], prompt: str, system: str, response_format: Optional[Dict[str, Any]],
+                   force_json: bool, extra_headers: Optional[Dict[str, str]]) -> Optional[Dict[str, Any]]:
+    """The request to send: as prepared, or rerouted to a healthy compatible provider; None = fail fast (circuit open)."""
+    name = req.get("provider") or "default"
+    if not BREAKER_ENABLED or PROVIDER_HEALTH.available(name):
+        return req
+    target = PROVIDER_HEALTH.pick(_compatible_providers(req.get("provider"))) if FAILOVER_ENABLED else None
+    if target is None:
+        PROVIDER_HEALTH.get(name).stats["rejected"] += 1
+        _record_llm_call(req, 0.0, "circuit_open")
+        return None
+    LLM_FAILOVERS.inc(provider=name, target=target)
+    # the player's model belongs to the original provider; the target's own "model" entry applies
+    return _prepare_chat_request(prompt, target, None, system, response_format, force_json, extra_headers)
+
+def _cache_lookup(req: Dict[str, Any]) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """(cache key, cached {"text", "data", "model"} or None); the key is None when the response cache is off."""
+    if RESPONSE_CACHE is None:
+        return None, None
+    key = llmcache.cache_key(req["payload"])
+    value, tier = RESPONSE_CACHE.lookup(key)
+    LLM_CACHE.inc(model=req.get("model") or "", result=tier)
+    return key, value
+
+def _cache_store(key: Optional[str], result: Dict[str, Any], model_used: Optional[str]):
+    # only replies the caller could parse: a cached truncated JSON would be replayed forever
+    if key is None or result["outcome"] != "ok" or not result["valid"]:
+        return
+    RESPONSE_CACHE.put(key, {"text": result["text"], "data": result["data"], "model": model_used})
+
+def _read_chat_stream(r: requests.Response, req: Dict[str, Any], on_token, result: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[str]]:
+    """Consume an SSE chat stream, calling on_token per delta; returns (assembled chat.completion, text)."""
+    if "text/event-stream" not in (r.headers.get("Content-Type") or ""):
+        # provider ignored "stream": a plain completion, delivered as a single delta
+        data = r.json()
+        text = _extract_chat_text(data)
+        if text:
+            result["chunks"] = 1
+            _notify_token(on_token, text, text)
+        return data, text
+    text_so_far = ""
+    last_event: Dict[str, Any] = {}
+    r.encoding = r.encoding or "utf-8"
+    for line in r.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        body = line[5:].strip()
+        if body == "[DONE]":
+            break
+        try:
+            event = json.loads(body)
+        except ValueError:
+            continue
+        if not isinstance(event, dict):
+            continue
+        last_event = event
+        result["chunks"] += 1
+        for choice in event.get("choices") or []:
+            delta = (choice.get("delta") or {}).get("content") or choice.get("text")
+            if delta:
+                text_so_far += delta
+                _notify_token(on_token, delta, text_so_far)
+    text = text_so_far.strip() or None
+    data = {
+        "id": last_event.get("id"),
+        "object": "chat.completion",
+        "model": last_event.get("model") or req["model"],
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}}],
+        "usage": last_event.get("usage"),
+        "stream_chunks": result["chunks"],
+    }
+    return data, text
+
+def _backoff_delay(attempt: int) -> float:
+    return min(MAX_BACKOFF_SECONDS, HTTP_BACKOFF * (2 ** attempt)) * _JITTER.uniform(0.5, 1.0)
+
+def _call_with_retries(req: Dict[str, Any], deadline: float, on_token=None) -> Dict[str, Any]:
+    """
+    Attempts with exponential backoff (or the provider's Retry-After) until a valid reply, HTTP_RETRIES retries,
+    or the deadline. A stream that already delivered tokens is never retried (listeners saw them).
+    Recorded as one call in the metrics; returns the last attempt's result.
+    """
+    start = time.time()
+    retries = 0
+    attempt = 0
+    previous: Optional[Dict[str, Any]] = None
+    while True:
+        result = _chat_attempt(req, deadline, on_token)
+        if result["outcome"] == "deadline_exceeded" and previous is not None:
+            # a retry squeezed out by sleep overrun sent nothing; the attempt before it says what went wrong
+            result = previous
+            break
+        previous = result
+        retryable = (result["outcome"] in _RETRYABLE_OUTCOMES or (result["outcome"] == "ok" and not result["valid"]))
+        if not retryable or result["chunks"] or attempt >= HTTP_RETRIES:
+            break
+        # every sleep ends in time for one more attempt before the deadline; a Retry-After beyond that ends
+        # the call (the provider asked us not to come back sooner), a longer backoff is just cut short
+        remaining = deadline - time.time() - MIN_ATTEMPT_SECONDS
+        if remaining <= 0 or (result["retry_after"] is not None and result["retry_after"] > remaining):
+            break
+        delay = result["retry_after"] if result["retry_after"] is not None else min(_backoff_delay(attempt), remaining)
+        attempt += 1
+        retries += 1
+        time.sleep(delay)
+    result["retries"] = retries
+    _record_llm_call(req, time.time() - start, result["outcome"], retries, result["data"], result["text"])
+    return result
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    global _HEDGE_EXECUTOR
+    if _HEDGE_EXECUTOR is None:
+        with _HEDGE_LOCK:
+            if _HEDGE_EXECUTOR is None:
+                _HEDGE_EXECUTOR = ThreadPoolExecutor(max_workers=max(4, HTTP_POOL_SIZE * 2), thread_name_prefix="werewolf-hedge")
+    return _HEDGE_EXECUTOR
+
+def _hedge_backup(req: Dict[str, Any]) -> Optional[str]:
+    if not HEDGE_ENABLED:
+        return None
+    providers = get_providers()
+    entry = providers.get(req.get("provider") or "") or {}
+    backup = entry.get("hedge_provider") or HEDGE_PROVIDER
+    if not backup or backup == req.get("provider") or backup not in providers:
+        return None
+    if BREAKER_ENABLED and not PROVIDER_HEALTH.available(backup):
+        return None
+    return backup
+
+def _hedge_delay(req: Dict[str, Any]) -> float:
+    """Seconds to give the primary before hedging: configured delay, else its observed p95 in this phase."""
+    if HEDGE_DELAY > 0:
+        return HEDGE_DELAY
+    labels = {"provider": req.get("provider") or "default", "model": req.get("model") or "", "phase": metrics.current_phase()}
+    delay = HEDGE_DEFAULT_DELAY
+    if LLM_LATENCY.count(**labels) >= HEDGE_MIN_SAMPLES:
+        delay = LLM_LATENCY.quantile(0.95, **labels) or delay
+    return max(HEDGE_MIN_DELAY, delay)
+
+def _hedged_call(req: Dict[str, Any], backup_req: Dict[str, Any], deadline: float) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Primary now, backup after _hedge_delay(); (result, request) of the first valid reply (else the last one)."""
+    executor = _get_hedge_executor()
+    # one context copy per task: a Context can only be entered by one thread at a time
+    primary = executor.submit(contextvars.copy_context().run, _call_with_retries, req, deadline)
+    try:
+        result = primary.result(timeout=max(0.0, min(_hedge_delay(req), deadline - time.time())))
+        if result["valid"] or time.time() >= deadline:
+            return result, req
+    except FutureTimeout:
+        pass
+    labels = {"provider": req.get("provider") or "default", "backup": backup_req.get("provider") or ""}
+    LLM_HEDGES.inc(outcome="fired", **labels)
+    # primary is still running (or came back without a valid reply): race it against the backup
+    backup = executor.submit(contextvars.copy_context().run, _call_with_retries, backup_req, deadline)
+    pending = {primary: req, backup: backup_req}
+    last: Optional[Tuple[Dict[str, Any], Dict[str, Any]]] = None
+    while pending:
+        done, _ = wait(list(pending), timeout=max(0.0, deadline - time.time()), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            sent = pending.pop(future)
+            last = (future.result(), sent)
+            if last[0]["valid"]:
+                if sent is backup_req:
+                    LLM_HEDGES.inc(outcome="won", **labels)
+                return last
+    if last is not None:
+        return last
+    # both still in flight at the deadline; they finish (and release their limiter slots) in the background
+    return {"text": None, "data": None, "outcome": "deadline_exceeded", "error": "deadline exceeded waiting for hedged calls",
+            "chunks": 0, "valid": False}, req
+
+def _call_meta(raw: Any, model_used: Optional[str], latency: float, provider: Optional[str], player: str, kind: str) -> Dict[str, Any]:
+    """Decision meta for one model call; the provider response itself goes to AUDIT_STORE."""
+    meta: Dict[str, Any] = {"model": model_used, "latency": latency, "provider": provider, "json_mode": True}
+    raw_id = AUDIT_STORE.put(raw, player=player, kind=kind, provider=provider, model=model_used, phase=metrics.current_phase())
+    if raw_id:
+        meta["raw_id"] = raw_id
+    if raw and isinstance(raw, dict) and raw.get("error"):
+        meta["error"] = raw.get("error")
+    return meta
+
 def choose_from_candidates(text: str, candidates: List[str]) -> Optional[str]:
     text_low = (text or "").strip().lower()
     # exact match
@@ -110,6 +836,193 @@ def summarize_history(state: Dict[str, Any], max_entries: int = 10) -> str:
             parts.append(f"End: winner={h.get('winner')}")
     return "\n".join(parts)
 
+# LOGIC_SPEC §8 上下文管理：每次调用的 token 预算（selective_retention）。
+# 最近 recent_days 天的事件原样保留（去掉 meta / latency 等审计字段），更早的天压缩成一行摘要；
+# 仍超预算时依次截短旧发言、把最早的"近期"天并入摘要、丢弃最老的摘要行。
+# ai_models.json -> "context_management": {"max_tokens", "recent_days", "speech_chars"}，环境变量 WEREWOLF_CONTEXT_* 优先。
+_CONTEXT_CFG: Dict[str, Any] = _MODEL_CFG.get("context_management") if isinstance(_MODEL_CFG.get("context_management"), dict) else {}
+
+def _context_setting(name: str, default: int) -> int:
+    raw = os.getenv(f"WEREWOLF_CONTEXT_{name.upper()}", _CONTEXT_CFG.get(name, default))
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        return default
+
+CONTEXT_MAX_TOKENS = _context_setting("max_tokens", 8000)
+CONTEXT_RECENT_DAYS = _context_setting("recent_days", 2)
+CONTEXT_SPEECH_CHARS = _context_setting("speech_chars", 160)
+# 历史之外（角色、存活名单、当天发言等 always_include 部分）至少给历史留下的 token 数
+_CONTEXT_MIN_HISTORY_TOKENS = 200
+
+# summarize_instead: player_metadata —— 这些字段只用于审计 / 回放，对模型决策没有信息量
+_CONTEXT_DROP_KEYS = frozenset({"meta", "model", "provider", "latency", "votes_meta", "raw", "raw_id", "heuristic", "speeches"})
+
+def _slim_event(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _slim_event(v) for k, v in value.items() if k not in _CONTEXT_DROP_KEYS and v is not None}
+    if isinstance(value, list):
+        return [_slim_event(v) for v in value]
+    return value
+
+# INPUT_JSON 的序列化：当天发言里的 meta / raw / latency 等审计字段两种模式都去掉（每次调用都不同，
+# 留在 prompt 里会让响应缓存和回放的 key 对同一局面也对不上）；compact 模式另外不缩进；
+# short_keys 再把历史与当天发言中反复出现的键缩写（附 key_legend 供模型对照）。
+# ai_models.json -> "prompt": {"compact", "short_keys"}，环境变量 WEREWOLF_PROMPT_COMPACT / WEREWOLF_PROMPT_SHORT_KEYS 优先。
+_PROMPT_CFG: Dict[str, Any] = _MODEL_CFG.get("prompt") if isinstance(_MODEL_CFG.get("prompt"), dict) else {}
+
+def _prompt_flag(name: str, default: bool) -> bool:
+    raw = os.getenv(f"WEREWOLF_PROMPT_{name.upper()}", _PROMPT_CFG.get(name, default))
+    return str(raw).strip().lower() not in ("0", "false", "no", "off", "")
+
+PROMPT_COMPACT = _prompt_flag("compact", True)
+PROMPT_SHORT_KEYS = _prompt_flag("short_keys", False)
+_SHORT_KEYS = {
+    "player": "p", "speech": "s", "round": "r", "phase": "ph", "day": "d", "target": "tg",
+    "announcement": "ann", "votes": "v", "lynched": "ly", "talks": "t", "night_talks": "nt",
+}
+
+def _abbreviate(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {_SHORT_KEYS.get(k, k): _abbreviate(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_abbreviate(v) for v in value]
+    return value
+
+def _prompt_dumps(obj: Any, compact: Optional[bool] = None) -> str:
+    if PROMPT_COMPACT if compact is None else compact:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+    return json.dumps(obj, ensure_ascii=False, indent=2)
+
+def render_input_json(input_obj: Dict[str, Any], compact: Optional[bool] = None, short_keys: Optional[bool] = None) -> str:
+    """Serialize a prompt's INPUT_JSON; the top-level LOGIC_SPEC keys are never renamed."""
+    compact = PROMPT_COMPACT if compact is None else compact
+    short_keys = PROMPT_SHORT_KEYS if short_keys is None else short_keys
+    obj = dict(input_obj)
+    if "current_phase_details" in obj:
+        obj["current_phase_details"] = _slim_event(obj["current_phase_details"])
+    if short_keys:
+        for key in ("complete_history", "current_phase_details"):
+            if key in obj:
+                obj[key] = _abbreviate(obj[key])
+        obj["key_legend"] = {short: full for full, short in _SHORT_KEYS.items()}
+    return _prompt_dumps(obj, compact)
+
+def _summarize_day(day: Any, events: List[Dict[str, Any]]) -> str:
+    parts = []
+    for h in events:
+        phase = h.get("phase")
+        if phase == "night":
+            killed = h.get("killed") or h.get("killed_players") or h.get("announcement")
+            parts.append(f"night: {killed or 'no deaths'}")
+        elif phase == "day":
+            if h.get("idiot_revealed"):
+                parts.append(f"idiot revealed={h['idiot_revealed']}")
+                continue
+            speakers = len(h.get("talks") or h.get("speeches") or [])
+            parts.append(f"lynched={h.get('lynched')}, votes={h.get('votes') or {}}, speeches={speakers}")
+        elif phase == "death_event":
+            parts.append(f"death {h.get('player')} ({h.get('cause')})")
+        elif phase == "end":
+            parts.append(f"end: winner={h.get('winner')}")
+    return f"Day {day}: " + "; ".join(parts) if parts else f"Day {day}: -"
+
+def _dumps_tokens(obj: Any) -> int:
+    return _estimate_tokens(_prompt_dumps(obj))
+
+def compress_history(
+    history: List[Dict[str, Any]],
+    max_tokens: Optional[int] = None,
+    recent_days: Optional[int] = None,
+    speech_chars: Optional[int] = None,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Fit `history` into `max_tokens` (estimated, see _estimate_tokens).
+    Returns ({"day_events": [...], "earlier_days": ["Day 1: ...", ...]}, report) where report has
+    original_tokens / compressed_tokens / ratio / summarized_days / truncated_speeches / dropped_summaries.
+    """
+    max_tokens = CONTEXT_MAX_TOKENS if max_tokens is None else max_tokens
+    recent_days = CONTEXT_RECENT_DAYS if recent_days is None else recent_days
+    speech_chars = CONTEXT_SPEECH_CHARS if speech_chars is None else speech_chars
+    history = [h for h in history or [] if isinstance(h, dict)]
+    original_tokens = _dumps_tokens(history) if history else 0
+
+    # group by day, keeping order; entries without a day stick to the previous one
+    days: List[Tuple[Any, List[Dict[str, Any]]]] = []
+    for h in history:
+        day = h.get("day", days[-1][0] if days else None)
+        if not days or days[-1][0] != day:
+            days.append((day, []))
+        days[-1][1].append(h)
+
+    split = max(0, len(days) - max(recent_days, 0))
+    earlier = [_summarize_day(d, evs) for d, evs in days[:split]]
+    recent = [[_slim_event(h) for h in evs] for _, evs in days[split:]]
+    truncated = 0
+    dropped = 0
+
+    def _size() -> int:
+        return _dumps_tokens({"day_events": [h for evs in recent for h in evs], "earlier_days": earlier})
+
+    def _shorten_speeches(evs: List[Dict[str, Any]]) -> int:
+        count = 0
+        for h in evs:
+            for key in ("talks", "night_talks"):
+                for talk in h.get(key) or []:
+                    speech = talk.get("speech") if isinstance(talk, dict) else None
+                    if isinstance(speech, str) and len(speech) > speech_chars:
+                        talk["speech"] = speech[:speech_chars] + "…"
+                        count += 1
+        return count
+
+    if max_tokens > 0:
+        # oldest verbatim day first: its speeches get shortened, then the whole day becomes a summary line
+        for i in range(len(recent)):
+            if _size() <= max_tokens:
+                break
+            truncated += _shorten_speeches(recent[i])
+        while len(recent) > 1 and _size() > max_tokens:
+            day, _ = days[split]
+            earlier.append(_summarize_day(day, days[split][1]))
+            recent.pop(0)
+            split += 1
+        while earlier and _size() > max_tokens:
+            earlier.pop(0)
+            dropped += 1
+
+    compressed = {"day_events": [h for evs in recent for h in evs], "earlier_days": earlier}
+    compressed_tokens = _size() if history else 0
+    report = {
+        "original_tokens": original_tokens,
+        "compressed_tokens": compressed_tokens,
+        "ratio": round(compressed_tokens / original_tokens, 4) if original_tokens else 1.0,
+        "summarized_days": split,
+        "truncated_speeches": truncated,
+        "dropped_summaries": dropped,
+        "max_tokens": max_tokens,
+    }
+    return compressed, report
+
+PROMPT_HISTORY_TOKENS = metrics.REGISTRY.counter(
+    "werewolf_prompt_history_tokens", "Estimated history tokens in prompts before/after context compression", ("phase", "stage"))
+PROMPT_COMPRESSION_RATIO = metrics.REGISTRY.histogram(
+    "werewolf_prompt_compression_ratio", "Compressed / original history size per prompt", ("phase",),
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0))
+# last compression report (for logging / inspection, like _LAST_ACTIONS)
+_LAST_CONTEXT_REPORT: Dict[str, Any] = {}
+
+def _history_for_prompt(ctx: Dict[str, Any], input_obj: Dict[str, Any], player: str) -> Dict[str, Any]:
+    """Compress ctx["history"] into whatever budget the rest of input_obj leaves and record the ratio."""
+    budget = max(_CONTEXT_MIN_HISTORY_TOKENS, CONTEXT_MAX_TOKENS - _dumps_tokens(input_obj)) if CONTEXT_MAX_TOKENS > 0 else 0
+    compressed, report = compress_history(ctx.get("history", []), max_tokens=budget)
+    if report["original_tokens"]:
+        phase = metrics.current_phase()
+        PROMPT_HISTORY_TOKENS.inc(report["original_tokens"], phase=phase, stage="original")
+        PROMPT_HISTORY_TOKENS.inc(report["compressed_tokens"], phase=phase, stage="compressed")
+        PROMPT_COMPRESSION_RATIO.observe(report["ratio"], phase=phase)
+    _LAST_CONTEXT_REPORT[player] = report
+    return compressed
+
 def get_model_for(player: str) -> str:
     """
     返回用于该玩家决策调用的模型名称
@@ -131,55 +1044,58 @@ def call_openai_chat_with_meta(
     response_format: Optional[Dict[str, Any]] = None,
     force_json: bool = False,
     extra_headers: Optional[Dict[str, str]] = None,
+    deadline: Optional[float] = None,
 ) -> Tuple[Optional[str], Optional[Dict[str, Any]], Optional[str]]:
     """
     Calls the model and returns a tuple: (text, raw_response_json_or_text, model_used).
+    deadline: seconds for the whole call incl. retries / hedging (default: call_deadline() for the current phase).
     容错逻辑：
       - 若 caller 未传 api_key，则从项目根的 api_keys.json 随机选择一个可用的 entry。
       - 若传入的 api_key 是 provider id（api_keys.json 的 key）或实际 secret，则会自动匹配对应 entry，并优先使用该 entry 中的 "model" 和 "model_url"（若提供）。
       - 最终选择顺序：函数参数 model -> api_keys.json 中 entry.model -> _PLAYER_MODELS (按 player 使用时传入) -> _DEFAULT_MODEL
     """
-    # try to resolve api_key -> provider entry (api_keys.json)
-    model_from_key = None
-    api_url_from_key = None
-    keys = load_api_keys()
-    providers: Dict[str, Dict[str, Any]] = {}
-    if isinstance(keys, dict):
-        raw_providers = keys.get("providers")
-        if isinstance(raw_providers, dict):
-            providers = {k: v for k, v in raw_providers.items() if isinstance(v, dict)}
-        if not providers:
-            providers = {k: v for k, v in keys.items() if isinstance(v, dict) and (
-                "api_key" in v or "key" in v or "secret" in v
-            )}
-
-    resolved_api_key = api_key
-
-    if not api_key and providers:
-        # pick first available provider when no api_key provided
-        first = next(iter(providers.values()), None)
-        if first:
-            resolved_api_key = first.get("api_key") or first.get("key") or first.get("secret")
-            model_from_key = first.get("model")
-            api_url_from_key = first.get("model_url") or first.get("url") or first.get("endpoint")
+    req = _prepare_chat_request(prompt, api_key, model, system, response_format, force_json, extra_headers)
+    if req is None:
+        return None, None, None
+    # keyed on the request as asked for, so a reply served by a failover / hedge provider is replayed too
+    cache_key, cached = _cache_lookup(req)
+    if cached is not None:
+        return cached["text"], cached["data"], cached["model"]
+    routed = _route_request(req, prompt, system, response_format, force_json, extra_headers)
+    if routed is None:
+        return None, {"error": f"circuit open for provider {req.get('provider') or 'default'}"}, req["model"]
+    req = routed
+    deadline = time.time() + (deadline if deadline is not None else call_deadline())
+    backup = _hedge_backup(req)
+    backup_req = _prepare_chat_request(prompt, backup, None, system, response_format, force_json, extra_headers) if backup else None
+    if backup_req is None:
+        result, sent = _call_with_retries(req, deadline), req
+    else:
+        result, sent = _hedged_call(req, backup_req, deadline)
+    if result["outcome"] != "ok":
+        # return the error string as raw for diagnostics
+        return None, {"error": result["error"]}, sent["model"]
+    _cache_store(cache_key, result, sent["model"])
+    return result["text"], result["data"], sent["model"]
 
-    if api_key and providers:
-        # support caller passing provider name or raw key
-        if api_key in providers:
-            entry = providers.get(api_key) or {}
-            resolved_api_key = entry.get("api_key") or entry.get("key") or entry.get("secret") or api_key
-            model_from_key = entry.get("model") or model_from_key
-            api_url_from_key = entry.get("model_url") or entry.get("url") or entry.get("endpoint") or api_url_from_key
-        else:
-            for prov, entry in providers.items():
-                if api_key == entry.get("api_key") or api_key == entry.get("key") or api_key == entry.get("secret"):
-                    resolved_api_key = entry.get("api_key") or entry.get("key") or entry.get("secret")
-                    model_from_key = entry.get("model") or model_from_key
-                    api_url_from_key = entry.get("model_url") or entry.get("url") or entry.get("endpoint") or api_url_from_key
-                    break
+def _prepare_chat_request(
+    prompt: str,
+    api_key: str,
+    model: Optional[str],
+    system: str,
+    response_format: Optional[Dict[str, Any]],
+    force_json: bool,
+    extra_headers: Optional[Dict[str, str]],
+) -> Optional[Dict[str, Any]]:
+    """Resolve provider/model/url and build the chat-completions request; None when no key is available."""
+    # resolve api_key -> provider entry (api_keys.json), cached per api_keys.json version
+    resolved = resolve_provider(api_key)
+    resolved_api_key = resolved["api_key"]
+    model_from_key = resolved["model"]
+    api_url_from_key = resolved["api_url"]
 
     if not resolved_api_key:
-        return None, None, None
+        return None
 
     model_to_use = model or model_from_key or _DEFAULT_MODEL
     api_url = api_url_from_key or OPENAI_API_URL
@@ -201,23 +1117,122 @@ def call_openai_chat_with_meta(
     json_mode = response_format if response_format is not None else ({"type": "json_object"} if auto_force_json else None)
     if json_mode:
         payload["response_format"] = json_mode
+    return {"api_url": api_url, "headers": headers, "payload": payload, "model": model_to_use, "provider": resolved["provider"]}
+
+def _extract_chat_text(data: Any) -> Optional[str]:
+    choices = data.get("choices") if isinstance(data, dict) else None
+    if not isinstance(choices, list) or not choices or not isinstance(choices[0], dict):
+        return None
+    choice = choices[0]
+    # structured chat response
+    msg = (choice.get("message") or {}).get("content")
+    if msg:
+        return msg.strip() or None
+    # fallback to older text completion shape
+    return str(choice.get("text", "")).strip() or None
+
+def stream_openai_chat_with_meta(
+    prompt: str,
+    api_key: str,
+    on_token,
+    model: Optional[str] = None,
+    system: str = "You are a game AI.",
+    response_format: Optional[Dict[str, Any]] = None,
+    force_json: bool = False,
+    extra_headers: Optional[Dict[str, str]] = None,
+    deadline: Optional[float] = None,
+) -> Tuple[Optional[str], Optional[Dict[str, Any]], Optional[str]]:
+    """
+    流式版本的 call_openai_chat_with_meta：请求带 "stream": true，逐行解析 SSE `data:` 块，
+    每收到一段内容增量就调用 on_token(delta, text_so_far)。
+    返回值与非流式版本相同：(text, raw, model_used)，raw 为拼装后的 chat.completion 结构。
+    若 provider 忽略 stream 参数直接返回完整 JSON，则按普通响应处理并一次性回调。
+    """
+    req = _prepare_chat_request(prompt, api_key, model, system, response_format, force_json, extra_headers)
+    if req is None:
+        return None, None, None
+    cache_key, cached = _cache_lookup(req)
+    if cached is not None:
+        # a cached reply arrives in one piece, like a provider that ignores "stream"
+        _notify_token(on_token, cached["text"], cached["text"])
+        return cached["text"], cached["data"], cached["model"]
+    routed = _route_request(req, prompt, system, response_format, force_json, extra_headers)
+    if routed is None:
+        return None, {"error": f"circuit open for provider {req.get('provider') or 'default'}", "stream_chunks": 0}, req["model"]
+    req = dict(routed, payload=dict(routed["payload"], stream=True))
+    deadline = time.time() + (deadline if deadline is not None else call_deadline())
+    result = _call_with_retries(req, deadline, on_token=on_token)
+    if result["outcome"] != "ok":
+        return None, {"error": result["error"], "stream_chunks": result["chunks"]}, req["model"]
+    _cache_store(cache_key, result, req["model"])
+    return result["text"], result["data"], req["model"]
+
+def _notify_token(on_token, delta: str, text_so_far: str):
     try:
-        r = requests.post(api_url, json=payload, headers=headers, timeout=12)
-        r.raise_for_status()
-        data = r.json()
-        # try structured chat response
-        if isinstance(data.get("choices"), list) and data["choices"]:
-            msg = data["choices"][0].get("message", {}).get("content")
-            text = msg.strip() if msg else None
-            return text, data, model_to_use
-        # fallback to older text completion shape
-        if data.get("choices") and isinstance(data["choices"][0], dict):
-            text = str(data["choices"][0].get("text", "")).strip() or None
-            return text, data, model_to_use
-        return None, data, model_to_use
-    except Exception as e:
-        # return the exception string as raw for diagnostics
-        return None, {"error": str(e)}, model_to_use
+        on_token(delta, text_so_far)
+    except Exception:
+        # a broken listener must never break the model call
+        pass
+
+class SpeechStreamDecoder:
+    """
+    Incrementally extracts the "speech" string from a streamed JSON reply like
+    {"action":"speak","speech":"..."} so listeners see speech text rather than raw JSON.
+    Plain-text replies (no leading "{") are passed through as-is.
+    """
+    _SPEECH_KEY = re.compile(r'"speech"\s*:\s*"')
+
+    def __init__(self):
+        self.buffer = ""
+        self.text = ""
+        self._start: Optional[int] = None
+        self._done = False
+
+    def feed(self, delta: str) -> str:
+        self.buffer += delta
+        if self._done:
+            return ""
+        head = self.buffer.lstrip()
+        if head and not head.startswith("{"):
+            piece = self.buffer[len(self.text):] if self._start is None else ""
+            self.text = self.buffer
+            return piece
+        if self._start is None:
+            match = self._SPEECH_KEY.search(self.buffer)
+            if not match:
+                return ""
+            self._start = match.end()
+        body = self.buffer[self._start:]
+        i = 0
+        while i < len(body):
+            if body[i] == "\\":
+                i += 2
+                continue
+            if body[i] == '"':
+                self._done = True
+                body = body[:i]
+                break
+            i += 1
+        decoded = None
+        # an escape sequence may be cut in half at the end of the chunk; back off until it decodes
+        for trim in range(0, 7):
+            candidate = body[: len(body) - trim] if trim else body
+            try:
+                decoded = json.loads('"' + candidate + '"')
+                break
+            except ValueError:
+                continue
+        if decoded is None or len(decoded) <= len(self.text):
+            return ""
+        piece = decoded[len(self.text):]
+        self.text = decoded
+        return piece
+
+def _message_id(player: str, phase: str, day: Any, *parts: Any) -> str:
+    # derived from the request instead of drawn at random: identical requests stay byte-identical,
+    # which the response cache and transcript replay both key on
+    seed = "|".join(str(p) for p in (player, phase, day) + parts)
+    return str(1000 + zlib.crc32(seed.encode("utf-8")) % 9000)
 
 def build_night_prompt(player: str, role: str, state: Dict[str, Any], game_id: Optional[str] = None, message_id: Optional[str] = None) -> str:
     """
@@ -231,7 +1246,7 @@ def build_night_prompt(player: str, role: str, state: Dict[str, Any], game_id: O
     history = summarize_history(ctx, max_entries=6)
     input_obj = {
         "game_id": game_id or "local_game",
-        "message_id": message_id or str(random.randint(1000, 9999)),
+        "message_id": message_id or _message_id(player, "night", ctx.get("day", state.get("day", 0)), role),
         "phase": "night",
         "day": ctx.get("day", state.get("day", 0)),
         "current_player": player,
@@ -257,7 +1272,7 @@ def build_night_prompt(player: str, role: str, state: Dict[str, Any], game_id: O
     }
     prompt = (
         "INPUT_JSON:\n"
-        f"{json.dumps(input_obj, ensure_ascii=False, indent=2)}\n\n"
+        f"{render_input_json(input_obj)}\n\n"
         "INSTRUCTION: Reply with a single JSON object matching the LOGIC_SPEC for night actions.\n"
         "Examples (night): {\"action\":\"kill\",\"target\":\"AI_3\"} or {\"action\":\"none\"}.\n"
         "Do not include any extra text outside the JSON object."
@@ -274,7 +1289,7 @@ def build_day_prompt(player: str, state: Dict[str, Any], game_id: Optional[str]
     history = summarize_history(ctx, max_entries=8)
     input_obj = {
         "game_id": game_id or "local_game",
-        "message_id": message_id or str(random.randint(1000, 9999)),
+        "message_id": message_id or _message_id(player, "day_voting", ctx.get("day", state.get("day", 0))),
         "phase": "day_discussion",
         "day": ctx.get("day", state.get("day", 0)),
         "current_player": player,
@@ -284,13 +1299,14 @@ def build_day_prompt(player: str, state: Dict[str, Any], game_id: Optional[str]
             "dead_players": [p for p in ctx.get("players", []) if p not in alive],
             "game_config": {"total_players": len(ctx.get("players", []))}
         },
-        "complete_history": {"day_events": ctx.get("history", [])},
+        "complete_history": {},
         "current_phase_details": {"previous_speeches_today": ctx.get("phase_context", {}).get("current_talks", [])},
         "action_requirements": {"expected_action": "vote", "format_requirements": {}, "deadline": None}
     }
+    input_obj["complete_history"] = _history_for_prompt(ctx, input_obj, player)
     prompt = (
         "INPUT_JSON:\n"
-        f"{json.dumps(input_obj, ensure_ascii=False, indent=2)}\n\n"
+        f"{render_input_json(input_obj)}\n\n"
         "INSTRUCTION: Reply with a single JSON object like {\"action\":\"vote\",\"target\":\"AI_2\"}.\n"
         "Do not include any extra text outside the JSON object."
     )
@@ -307,19 +1323,20 @@ def build_talk_prompt(player: str, state: Dict[str, Any], talk_history: List[Dic
     past_list = talk_history[-10:] if talk_history else []
     input_obj = {
         "game_id": game_id or "local_game",
-        "message_id": message_id or str(random.randint(1000, 9999)),
+        "message_id": message_id or _message_id(player, "day_discussion", ctx.get("day", state.get("day", 0)), len(talk_history or [])),
         "phase": "day_discussion",
         "day": ctx.get("day", state.get("day", 0)),
         "current_player": player,
         "your_role": ctx.get("roles_known_to_server", {}).get(player),
         "game_context": {"alive_players": alive},
-        "complete_history": {"day_events": ctx.get("history", [])},
+        "complete_history": {},
         "current_phase_details": {"previous_speeches_today": past_list},
         "action_requirements": {"expected_action": "speak", "format_requirements": {}, "deadline": None}
     }
+    input_obj["complete_history"] = _history_for_prompt(ctx, input_obj, player)
     prompt = (
         "INPUT_JSON:\n"
-        f"{json.dumps(input_obj, ensure_ascii=False, indent=2)}\n\n"
+        f"{render_input_json(input_obj)}\n\n"
         "INSTRUCTION: Reply with a single JSON object like {\"action\":\"speak\",\"speech\":\"I suspect AI_4\",\"meta\":{}}.\n"
         "Do not include any extra text outside the JSON object."
     )
@@ -379,13 +1396,55 @@ def validate_json_response(text: str, schema_type: str, role: Optional[str] = No
     # fallback: accept object
     return obj, None
 
+def _model_state_from_context(context: Dict[str, Any]) -> Tuple[Optional[str], Dict[str, Any], bool]:
+    """
+    decide_* 接受两种上下文：
+      - 旧形状 {"role": ..., "state": Game.to_dict()}
+      - app.py 的玩家视角上下文（Game._build_player_context：your_role / alive_players / history / teammates ...）
+    返回 (role, state, from_app)，state 统一成 build_*_prompt 读取的 {"alive", "players", "day", "history", ...}。
+    """
+    if "alive_players" not in context:
+        return context.get("role"), context.get("state", {}), False
+    player = context.get("player")
+    role = context.get("your_role") or context.get("role")
+    known: Dict[str, Any] = {player: role} if player and role else {}
+    if role == "werewolf":
+        for mate in context.get("teammates") or []:
+            known[mate] = "werewolf"
+    state = {
+        "day": context.get("day", 0),
+        "players": context.get("players") or [],
+        "alive": context.get("alive_players") or [],
+        "history": context.get("history") or [],
+        "roles_known_to_server": known,
+        "phase_context": {"current_talks": context.get("previous_speeches") or context.get("previous_discussions") or []},
+        "resources": {
+            "witch_save_available": context.get("save_available", True),
+            "witch_poison_available": context.get("poison_available", True),
+        },
+    }
+    return role, state, True
+
+def _witch_decision(obj: Dict[str, Any], alive: List[str]) -> Dict[str, Any]:
+    """Map a witch reply onto the {"decision", "save_target", "poison_target"} shape app.py applies."""
+    action = obj.get("action") or obj.get("decision")
+    save = obj.get("save_target") or (obj.get("target") if action == "save" else None)
+    poison = obj.get("poison_target") or (obj.get("target") if action == "poison" else None)
+    decision = {"decision": action if action in ("save", "poison") else "none"}
+    if isinstance(save, str):
+        decision["save_target"] = choose_from_candidates(save, alive)
+    if isinstance(poison, str):
+        decision["poison_target"] = choose_from_candidates(poison, alive)
+    return decision
+
 def decide_night_action(player: str, context: Dict[str, Any], api_key: str) -> Optional[str]:
     """
     Use call_openai_chat_with_meta, record meta, parse JSON-first response and fall back to heuristics.
     Returns target player name or None.
+    With app.py's per-player context the witch gets a {"decision", "save_target", "poison_target"} dict,
+    and no usable model reply returns None so the game applies its own fallback.
     """
-    role = context.get("role")
-    state = context.get("state", {})
+    role, state, from_app = _model_state_from_context(context)
     alive = state.get("alive", [])
     alive = [p for p in alive if p != player]
 
@@ -411,14 +1470,17 @@ def decide_night_action(player: str, context: Dict[str, Any], api_key: str) -> O
             force_json=True,
         )
         latency = time.time() - start
-        meta = {"model": model_used, "latency": latency, "provider": provider_hint, "raw": raw, "json_mode": True}
-        if raw and isinstance(raw, dict) and raw.get("error"):
-            meta["error"] = raw.get("error")
-            print(f"[WARN] decide_night_action model error player={player} role={role} provider={provider_hint}: {raw.get('error')}")
+        meta = _call_meta(raw, model_used, latency, provider_hint, player, "night_action")
+        if meta.get("error"):
+            print(f"[WARN] decide_night_action model error player={player} role={role} provider={provider_hint}: {meta['error']}")
         if text:
             text_clean = text.strip().strip('"').strip("'")
             try:
                 obj = json.loads(text_clean)
+                if from_app and role == "witch" and isinstance(obj, dict):
+                    decision = _witch_decision(obj, alive)
+                    _LAST_ACTIONS[player] = {"action": decision["decision"], "target": decision.get("poison_target") or decision.get("save_target"), "raw": obj, "meta": meta}
+                    return decision
                 parsed, err = validate_json_response(json.dumps(obj), "night", role=role)
                 if parsed and err is None:
                     tgt_raw = parsed.get("target") or parsed.get("vote") or parsed.get("player")
@@ -442,19 +1504,22 @@ def decide_night_action(player: str, context: Dict[str, Any], api_key: str) -> O
             if picked:
                 _LAST_ACTIONS[player] = {"action": None, "target": picked, "raw_text": text_clean, "meta": meta}
                 return picked
-        # if online call returned no usable result, allow one retry with higher temperature off (not implemented) -> fallthrough
+        # no usable result even after call_openai_chat_with_meta's retries / hedging -> fallthrough
 
-    # Heuristic fallback
+    if from_app:
+        return None
+    # Heuristic fallback; a caller-supplied context["rng"] (random.Random) keeps standalone runs reproducible
+    rng = context.get("rng") or random
     if role == "werewolf":
         known = state.get("roles_known_to_server", {})
         candidates = [p for p in alive if known.get(p) != "werewolf"]
         if not candidates:
             candidates = alive
-        pick = random.choice(candidates)
+        pick = rng.choice(candidates)
         _LAST_ACTIONS[player] = {"action": "kill", "target": pick, "raw_text": "heuristic"}
         return pick
     if role == "seer":
-        pick = random.choice(alive)
+        pick = rng.choice(alive)
         _LAST_ACTIONS[player] = {"action": "reveal", "target": pick, "raw_text": "heuristic"}
         return pick
     if role == "witch":
@@ -465,19 +1530,19 @@ def decide_night_action(player: str, context: Dict[str, Any], api_key: str) -> O
                 last = h["killed"]
                 break
         # Prefer saving if someone died and save is still available
-        if last and random.random() < 0.7:
+        if last and rng.random() < 0.7:
             _LAST_ACTIONS[player] = {"action": "save", "target": last, "raw_text": "heuristic"}
             return last
         # Only occasionally use poison to avoid连续大量淘汰
-        if random.random() < 0.2:
+        if rng.random() < 0.2:
             known = state.get("roles_known_to_server", {})
             candidates = [p for p in alive if known.get(p) != "werewolf"] or alive
-            pick = random.choice(candidates)
+            pick = rng.choice(candidates)
             _LAST_ACTIONS[player] = {"action": "poison", "target": pick, "raw_text": "heuristic"}
             return pick
         _LAST_ACTIONS[player] = {"action": "none", "target": None, "raw_text": "heuristic"}
         return None
-    pick = random.choice(alive)
+    pick = rng.choice(alive)
     _LAST_ACTIONS[player] = {"action": None, "target": pick, "raw_text": "heuristic"}
     return pick
 
@@ -487,11 +1552,11 @@ def decide_vote(player: str, context: Dict[str, Any], api_key: str) -> str:
     context: {"state": Game.to_dict()}
     现在优先解析模型返回的 JSON，例如: {"action":"vote","target":"AI_2"} 或 {"target":"AI_2"}。
     """
-    state = context.get("state", {})
+    _, state, from_app = _model_state_from_context(context)
     alive = state.get("alive", [])
     alive = [p for p in alive if p != player]
     if not alive:
-        return player
+        return None if from_app else player
 
     # reset last action
     try:
@@ -512,10 +1577,9 @@ def decide_vote(player: str, context: Dict[str, Any], api_key: str) -> str:
             force_json=True,
         )
         latency = time.time() - start
-        meta = {"model": model_used, "latency": latency, "provider": provider_hint, "raw": raw, "json_mode": True}
-        if raw and isinstance(raw, dict) and raw.get("error"):
-            meta["error"] = raw.get("error")
-            print(f"[WARN] decide_vote model error player={player} provider={provider_hint}: {raw.get('error')}")
+        meta = _call_meta(raw, model_used, latency, provider_hint, player, "vote")
+        if meta.get("error"):
+            print(f"[WARN] decide_vote model error player={player} provider={provider_hint}: {meta['error']}")
         if text:
             cleaned = text.strip().strip('"').strip("'")
             try:
@@ -535,8 +1599,11 @@ def decide_vote(player: str, context: Dict[str, Any], api_key: str) -> str:
                 _LAST_ACTIONS[player] = {"action": "vote", "target": picked, "raw_text": cleaned, "meta": meta}
                 return picked
 
+    if from_app:
+        # app.py 自带投票兜底（default_choice）
+        return None
     # 启发式：当前随机（后续可替换为基于历史/交互的策略）
-    pick = random.choice(alive)
+    pick = (context.get("rng") or random).choice(alive)
     _LAST_ACTIONS[player] = {"action": "vote", "target": pick, "raw_text": "heuristic"}
     return pick
 # Additional helpers: parse generic action responses and day-speech handler
@@ -588,38 +1655,56 @@ def _parse_action_text_and_pick(text: str, schema_type: str, alive: List[str], r
             picked = choose_from_candidates(parsed.get("save_target"), alive)
     return parsed, None, picked
 
-def decide_talk(player: str, state: Dict[str, Any], talk_history: List[Dict[str, Any]], api_key: str) -> Optional[Dict[str, Any]]:
+def decide_talk(player: str, state: Dict[str, Any], talk_history: List[Dict[str, Any]], api_key: str, on_token=None) -> Optional[Dict[str, Any]]:
     """
     Produce a speech dict for the player during day discussion.
     Returns {"speech": "...", "meta": {...}} or None if no speech.
+    When on_token is given the reply is streamed and on_token(piece, speech_so_far) receives
+    the decoded speech text as it arrives.
     """
     # backward-compatible wrapper expected by app.py as decide_talk(player, state, talk_history, api_key)
     # Note: some callers pass (player, state, talk_history, api_key) or (player, state, talk_history)
     # We implement the full signature here.
     try:
         # resolve alive list
-        ctx = state.get("model_state") if state.get("model_state") else state
+        _, model_state, from_app = _model_state_from_context(state)
+        if not from_app:
+            model_state = state
+        ctx = model_state.get("model_state") if model_state.get("model_state") else model_state
         alive = ctx.get("alive", [])
         if player not in alive:
             return None
         model = get_model_for(player)
         provider_hint = state.get("provider")
         # build prompt
-        prompt = build_talk_prompt(player, state, talk_history)
+        prompt = build_talk_prompt(player, model_state, talk_history)
         start = time.time()
-        # prefer openai-style call_with_meta to capture raw
-        text, raw, model_used = call_openai_chat_with_meta(
-            prompt,
-            api_key,
-            model=model,
-            system="You are a game AI. Reply with a JSON object like {\"action\":\"speak\",\"speech\":\"...\",\"meta\":{}}.",
-            force_json=True,
-        )
+        talk_system = "You are a game AI. Reply with a JSON object like {\"action\":\"speak\",\"speech\":\"...\",\"meta\":{}}."
+        if on_token is not None:
+            decoder = SpeechStreamDecoder()
+
+            def _on_delta(delta: str, _text: str):
+                piece = decoder.feed(delta)
+                if piece:
+                    on_token(piece, decoder.text)
+
+            text, raw, model_used = stream_openai_chat_with_meta(
+                prompt, api_key, _on_delta, model=model, system=talk_system, force_json=True
+            )
+        else:
+            # prefer openai-style call_with_meta to capture raw
+            text, raw, model_used = call_openai_chat_with_meta(
+                prompt,
+                api_key,
+                model=model,
+                system=talk_system,
+                force_json=True,
+            )
         latency = time.time() - start
-        meta = {"model": model_used, "latency": latency, "provider": provider_hint, "raw": raw, "json_mode": True}
-        if raw and isinstance(raw, dict) and raw.get("error"):
-            meta["error"] = raw.get("error")
-            print(f"[WARN] decide_talk model error player={player} provider={provider_hint}: {raw.get('error')}")
+        meta = _call_meta(raw, model_used, latency, provider_hint, player, "talk")
+        meta["streamed"] = on_token is not None
+        if meta.get("error"):
+            print(f"[WARN] decide_talk model error player={player} provider={provider_hint}: {meta['error']}")
         speech_text = None
         if text:
             parsed, err = validate_json_response(text, "speak")
@@ -635,6 +1720,9 @@ def decide_talk(player: str, state: Dict[str, Any], talk_history: List[Dict[str,
                 except Exception:
                     # fallback: use text as raw speech
                     speech_text = text
+        if not speech_text and from_app:
+            # app.py 有自己的发言兜底
+            return None
         if not speech_text:
             # no valid output from model -> heuristic short statement
             speech_text = f"{player} has nothing special to say."
@@ -649,4 +1737,47 @@ def decide_talk(player: str, state: Dict[str, Any], talk_history: List[Dict[str,
         except Exception:
             return {"speech": f"{player} has nothing to add.", "meta": {"heuristic": True}}
     except Exception:
-        return {"speech": f"{player} has nothing to add.", "meta": {"heuristic": True}}
\ No newline at end of file
+        return {"speech": f"{player} has nothing to add.", "meta": {"heuristic": True}}
+# asyncio facade used by the async engine (app.AsyncGame). This is not async I/O: the provider calls stay
+# on the pooled requests sessions (limiter, breaker, cache and replay included) and are offloaded to one
+# bounded thread pool shared by every coroutine. An event loop can host many rooms without an OS thread
+# per room, but at most ASYNC_OFFLOAD_WORKERS model calls are in flight across all of them; further
+# calls queue for a worker. ai_models.json -> "async": {"offload_workers"} or WEREWOLF_ASYNC_OFFLOAD_WORKERS
+# (WEREWOLF_ASYNC_IO_WORKERS is still read); the default is the pooled sessions' connection capacity,
+# since a worker beyond that would only wait for a free connection.
+_ASYNC_CFG: Dict[str, Any] = _MODEL_CFG.get("async") if isinstance(_MODEL_CFG.get("async"), dict) else {}
+ASYNC_OFFLOAD_WORKERS = max(1, _config_setting(
+    _ASYNC_CFG, "WEREWOLF_ASYNC_", "offload_workers",
+    _config_setting({}, "WEREWOLF_ASYNC_IO_", "workers", HTTP_POOL_SIZE * HTTP_POOL_CONNECTIONS, int), int))
+_ASYNC_OFFLOAD_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_ASYNC_OFFLOAD_LOCK = threading.Lock()
+
+def _get_offload_executor() -> ThreadPoolExecutor:
+    global _ASYNC_OFFLOAD_EXECUTOR
+    if _ASYNC_OFFLOAD_EXECUTOR is None:
+        with _ASYNC_OFFLOAD_LOCK:
+            if _ASYNC_OFFLOAD_EXECUTOR is None:
+                _ASYNC_OFFLOAD_EXECUTOR = ThreadPoolExecutor(max_workers=ASYNC_OFFLOAD_WORKERS, thread_name_prefix="werewolf-offload")
+    return _ASYNC_OFFLOAD_EXECUTOR
+
+async def run_blocking(func, *args, **kwargs):
+    """Await a blocking callable on the shared offload pool (at most ASYNC_OFFLOAD_WORKERS at a time) without stalling the event loop."""
+    loop = asyncio.get_running_loop()
+    # carry contextvars (e.g. the metrics phase label) over to the worker thread
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_get_offload_executor(), functools.partial(ctx.run, func, *args, **kwargs))
+
+async def acall_openai_chat_with_meta(prompt: str, api_key: str, **kwargs) -> Tuple[Optional[str], Optional[Dict[str, Any]], Optional[str]]:
+    return await run_blocking(call_openai_chat_with_meta, prompt, api_key, **kwargs)
+
+async def adecide_night_action(player: str, context: Dict[str, Any], api_key: str) -> Optional[str]:
+    return await run_blocking(decide_night_action, player, context, api_key)
+
+async def adecide_vote(player: str, context: Dict[str, Any], api_key: str) -> str:
+    return await run_blocking(decide_vote, player, context, api_key)
+
+async def adecide_talk(player: str, state: Dict[str, Any], talk_history: List[Dict[str, Any]], api_key: str, on_token=None) -> Optional[Dict[str, Any]]:
+    # on_token fires on an offload worker thread; listeners must be thread-safe
+    if on_token is None:
+        return await run_blocking(decide_talk, player, state, talk_history, api_key)
+    return await run_blocking(decide_talk, player, state, talk_history, api_key, on_token=on_token)
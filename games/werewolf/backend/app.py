@@ -1,11 +1,20 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 import os
 import json
+import queue
 import random
 import threading
 import time
 import uuid
-from typing import List, Dict, Any, Optional, Tuple
+import zlib
+import asyncio
+import itertools
+import weakref
+import tempfile
+from collections import deque
+from collections.abc import Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterable, List, Dict, Any, Optional, Tuple
 
 BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.abspath(os.path.join(BACKEND_DIR, "..", "..", ".."))
@@ -121,6 +130,34 @@ except Exception:
         except Exception:
             models = None
 
+# process-wide metrics registry: reuse ai_client's module so decisions and HTTP calls land in one registry
+metrics = getattr(ai_client, "metrics", None)
+if metrics is None:
+    try:
+        from . import metrics as _metrics  # type: ignore
+        metrics = _metrics
+    except Exception:
+        spec = importlib.util.spec_from_file_location(
+            "werewolf_metrics", os.path.join(os.path.dirname(os.path.abspath(__file__)), "metrics.py")
+        )
+        metrics = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(metrics)
+
+# per-room append-only journal + snapshots for crash recovery (see journal.py and recover_rooms)
+try:
+    from . import journal as room_journal  # type: ignore
+except Exception:
+    spec = importlib.util.spec_from_file_location(
+        "werewolf_journal", os.path.join(os.path.dirname(os.path.abspath(__file__)), "journal.py")
+    )
+    room_journal = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(room_journal)
+
+AI_DECISIONS = metrics.REGISTRY.counter(
+    "werewolf_ai_decisions", "AI decisions by source (model reply or heuristic fallback)", ("provider", "phase", "kind", "source"))
+AI_DECISION_LATENCY = metrics.REGISTRY.histogram(
+    "werewolf_ai_decision_seconds", "End-to-end AI decision latency including provider slot wait", ("provider", "phase"))
+
 app = Flask(__name__)
 
 if models and hasattr(models, "Role"):
@@ -128,15 +165,245 @@ if models and hasattr(models, "Role"):
 else:
     ROLES = ["werewolf", "seer", "witch", "villager"]
 
+# Independent AI calls (e.g. day votes) can be fanned out on a shared worker pool.
+# WEREWOLF_AI_WORKERS bounds the pool for the whole process, WEREWOLF_PROVIDER_CONCURRENCY bounds
+# in-flight calls per provider across all rooms; WEREWOLF_PARALLEL_AI_CALLS=0 restores strictly sequential calls.
+PARALLEL_AI_CALLS = os.getenv("WEREWOLF_PARALLEL_AI_CALLS", "1").strip().lower() not in ("0", "false", "no", "off")
+AI_WORKERS = max(1, int(os.getenv("WEREWOLF_AI_WORKERS", "16")))
+PROVIDER_CONCURRENCY = max(1, int(os.getenv("WEREWOLF_PROVIDER_CONCURRENCY", "8")))
+# Day speeches are streamed token by token to room subscribers (GET /rooms/<id>/stream) when enabled.
+STREAM_SPEECHES = os.getenv("WEREWOLF_STREAM_SPEECHES", "1").strip().lower() not in ("0", "false", "no", "off")
+
+_AI_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_AI_EXECUTOR_LOCK = threading.Lock()
+_PROVIDER_SLOTS: Dict[str, threading.BoundedSemaphore] = {}
+_PROVIDER_SLOTS_LOCK = threading.Lock()
+
+
+def _get_ai_executor() -> ThreadPoolExecutor:
+    global _AI_EXECUTOR
+    if _AI_EXECUTOR is None:
+        with _AI_EXECUTOR_LOCK:
+            if _AI_EXECUTOR is None:
+                _AI_EXECUTOR = ThreadPoolExecutor(max_workers=AI_WORKERS, thread_name_prefix="werewolf-ai")
+    return _AI_EXECUTOR
+
+
+# process-wide so a snapshot version never repeats, even across games replacing each other in a room
+_SNAPSHOT_VERSIONS = itertools.count(1)
+
+
+def _provider_slot(provider: Optional[str]) -> threading.BoundedSemaphore:
+    key = provider or "__default__"
+    slot = _PROVIDER_SLOTS.get(key)
+    if slot is None:
+        with _PROVIDER_SLOTS_LOCK:
+            slot = _PROVIDER_SLOTS.setdefault(key, threading.BoundedSemaphore(PROVIDER_CONCURRENCY))
+    return slot
+
+
+# Game.history keeps the newest WEREWOLF_HISTORY_MAX_EVENTS events in memory; older events are appended to
+# <WEREWOLF_HISTORY_ARCHIVE_DIR>/<log id>.jsonl (default: a werewolf_history folder in the temp dir,
+# "off" drops them) and can be paged with HistoryLog.page() / GET /rooms/<id>/history.
+HISTORY_MAX_EVENTS = max(8, int(os.getenv("WEREWOLF_HISTORY_MAX_EVENTS", "200")))
+HISTORY_ARCHIVE_DIR = os.getenv("WEREWOLF_HISTORY_ARCHIVE_DIR") or os.path.join(tempfile.gettempdir(), "werewolf_history")
+
+
+class HistoryLog(Sequence):
+    """
+    Bounded, list-like event history. Indexing, slicing and iteration cover the in-memory window only
+    (so history[-8:] keeps working); page() addresses every event ever appended by absolute index.
+    """
+
+    # byte offset of every _CHECKPOINT-th archived event, so paging seeks instead of scanning the file
+    _CHECKPOINT = 64
+
+    def __init__(self, max_events: Optional[int] = None, archive_dir: Optional[str] = None):
+        self.max_events = max(1, max_events or HISTORY_MAX_EVENTS)
+        archive_dir = HISTORY_ARCHIVE_DIR if archive_dir is None else archive_dir
+        self.archive_dir = None if str(archive_dir).lower() in ("", "off", "none", "0") else archive_dir
+        self.archive_path: Optional[str] = None
+        self.archived = 0
+        self.archive_errors = 0
+        self._events: List[Dict[str, Any]] = []
+        self._checkpoints: List[int] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def __getitem__(self, index):
+        return self._events[index]
+
+    def __iter__(self):
+        return iter(self._events)
+
+    def __repr__(self) -> str:
+        return f"HistoryLog(total={self.total}, in_memory={len(self._events)}, archived={self.archived})"
+
+    @property
+    def total(self) -> int:
+        return self.archived + len(self._events)
+
+    def append(self, event: Dict[str, Any]):
+        self._events.append(event)
+        # spill in batches so the amortized cost per append stays O(1)
+        if len(self._events) > self.max_events + max(1, self.max_events // 4):
+            self._spill(len(self._events) - self.max_events)
+
+    def _spill(self, count: int):
+        with self._lock:
+            batch = self._events[:count]
+            if self.archive_dir:
+                try:
+                    if self.archive_path is None:
+                        os.makedirs(self.archive_dir, exist_ok=True)
+                        self.archive_path = os.path.join(self.archive_dir, f"{uuid.uuid4().hex}.jsonl")
+                    with open(self.archive_path, "ab") as f:
+                        for i, event in enumerate(batch, start=self.archived):
+                            if i % self._CHECKPOINT == 0:
+                                self._checkpoints.append(f.tell())
+                            f.write(json.dumps(event, ensure_ascii=False, default=str).encode("utf-8") + b"\n")
+                except (OSError, TypeError, ValueError):
+                    # the events are gone either way; later pages simply come back shorter
+                    self.archive_errors += 1
+            self.archived += count
+            del self._events[:count]
+
+    def _read_archive(self, start: int, stop: int) -> List[Dict[str, Any]]:
+        if not self.archive_path or start // self._CHECKPOINT >= len(self._checkpoints):
+            return []
+        out: List[Dict[str, Any]] = []
+        index = (start // self._CHECKPOINT) * self._CHECKPOINT
+        try:
+            with open(self.archive_path, "rb") as f:
+                f.seek(self._checkpoints[start // self._CHECKPOINT])
+                for line in f:
+                    if index >= stop:
+                        break
+                    if index >= start:
+                        out.append(json.loads(line))
+                    index += 1
+        except (OSError, ValueError):
+            pass
+        return out
+
+    def export_state(self, since: Optional[int] = None) -> Dict[str, Any]:
+        """
+        JSON-safe state for the room journal: archive bookkeeping plus the events from absolute index
+        `since` on (default: only the in-memory window; archived events stay in the archive file).
+        """
+        with self._lock:
+            archived = self.archived
+            checkpoints = list(self._checkpoints)
+        since = archived if since is None else since
+        total = self.total
+        return {
+            "max_events": self.max_events,
+            "archive_path": self.archive_path,
+            "archived": archived,
+            "checkpoints": checkpoints,
+            "total": total,
+            "since": since,
+            "events": self.page(since, total - since),
+        }
+
+    @classmethod
+    def restore(cls, state: Dict[str, Any], events: List[Dict[str, Any]], base: int) -> "HistoryLog":
+        """Rebuild from export_state() bookkeeping and the events with absolute indices [base, base + len(events))."""
+        log = cls(max_events=state.get("max_events"))
+        log.archive_path = state.get("archive_path")
+        if log.archive_path:
+            # keep appending to the same archive file the crashed process was writing
+            log.archive_dir = os.path.dirname(log.archive_path)
+        log.archived = int(state.get("archived", 0))
+        log._checkpoints = list(state.get("checkpoints") or [])
+        log._events = list(events[max(0, log.archived - base):])
+        return log
+
+    def remove_archive(self):
+        """Delete the archive file (the room is gone); events spilled after this are dropped, not archived again."""
+        with self._lock:
+            path, self.archive_path, self.archive_dir = self.archive_path, None, None
+            self._checkpoints = []
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def page(self, offset: int = 0, limit: int = 50) -> List[Dict[str, Any]]:
+        """Events [offset, offset + limit) by absolute index, reading archived ones back from disk."""
+        offset = max(0, offset)
+        with self._lock:
+            archived = self.archived
+            memory = list(self._events)
+        stop = min(offset + max(0, limit), archived + len(memory))
+        events = self._read_archive(offset, min(stop, archived)) if offset < archived else []
+        return events + memory[max(0, offset - archived):max(0, stop - archived)]
+
+
+# History events are stored normalized: every speech, vote and night action exists exactly once
+# (night: "actions" + "night_talks"; day: "talks" + "votes_meta"). The overlapping legacy fields
+# (day "speeches" / "announcement", night "werewolf_choices", werewolf.actions / .discussions,
+# seer.meta, witch.actions / .meta) are derived on read by legacy_history_event().
+HISTORY_FORMATS = ("normalized", "legacy")
+
+def legacy_history_event(event: Dict[str, Any], announcement: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Pre-normalization shape of one history event (shallow: nested entries are shared, not copied).
+    `announcement` is the latest night announcement, which legacy day events repeated.
+    """
+    phase = event.get("phase")
+    if phase == "night" and "werewolf_choices" not in event:
+        actions = event.get("actions") or []
+        wolf_actions = [a for a in actions if a.get("action") == "werewolf_vote"]
+        seer_meta = next((a.get("meta") for a in actions if a.get("action") == "seer_reveal"), None)
+        witch_actions = [a for a in actions if a.get("action") in ("witch_save", "witch_poison")]
+        witch = dict(event.get("witch") or {})
+        witch.setdefault("meta", witch_actions[0].get("meta") if witch_actions else {})
+        witch["actions"] = witch_actions
+        seer = dict(event.get("seer") or {})
+        seer["meta"] = seer_meta or {}
+        werewolf = dict(event.get("werewolf") or {})
+        werewolf["actions"] = wolf_actions
+        werewolf["discussions"] = [t for t in event.get("night_talks") or [] if t.get("type") != "monologue"]
+        legacy = dict(event)
+        legacy.update(
+            werewolf=werewolf,
+            seer=seer,
+            witch=witch,
+            werewolf_choices=[a.get("target") for a in wolf_actions if a.get("target")],
+        )
+        return legacy
+    if phase == "day" and "talks" in event and "speeches" not in event:
+        legacy = dict(event)
+        legacy["speeches"] = event["talks"]
+        legacy.setdefault("announcement", announcement)
+        return legacy
+    return event
+
+def legacy_history(events: List[Dict[str, Any]], announcement: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    out = []
+    for event in events:
+        if event.get("phase") == "night":
+            announcement = event.get("announcement")
+        out.append(legacy_history_event(event, announcement))
+    return out
+
 class Game:
-    def __init__(self, players: List[str] = None):
+    def __init__(self, players: List[str] = None, seed: Optional[int] = None):
         self.players = players or [f"AI_{i}" for i in range(6)]
+        # every random choice of this game (role shuffle, heuristic fallbacks) comes from self.rng, so a seed
+        # replays the same game; without one the seed is drawn from the module RNG (random.seed() still works)
+        self.seed: int = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
         self.num_players = len(self.players)
         self.roles: Dict[str, str] = {}
         self.alive = set(self.players)
         self.day = 0
         self.state = "lobby"  # lobby, night, day_morning, day_discussion, day_voting, vote_reveal, ended
-        self.history: List[Dict[str, Any]] = []
+        self.history: HistoryLog = HistoryLog()
         # Witch resources tracked on server (one-time save and poison)
         self.witch_save_available = True
         self.witch_poison_available = True
@@ -154,15 +421,55 @@ class Game:
         self.witch_action_log: Dict[str, List[Dict[str, Any]]] = {}
         self.werewolf_discussion_log: List[Dict[str, Any]] = []
         self.day_discussion_rounds: int = 2
+        self.parallel_ai_calls: bool = PARALLEL_AI_CALLS
+        self.stream_speeches: bool = STREAM_SPEECHES
+        # False plays every decision with the built-in heuristics (no model calls at all)
+        self.ai_enabled: bool = True
+        # optional listener for live events: event_sink(event_type, data); may be called from worker threads
+        self.event_sink: Optional[Callable[[str, Dict[str, Any]], None]] = None
+        # bumped (via _touch) after every mutation visible in to_dict; keys the cached JSON snapshot
+        self._version: int = next(_SNAPSHOT_VERSIONS)
+        # history format ("normalized" / "legacy") -> (version, json text)
+        self._snapshot_cache: Dict[str, Tuple[int, str]] = {}
+        self._snapshot_lock = threading.Lock()
         self.gs = None
         self.assign_roles()
 
+    def _touch(self):
+        self._version = next(_SNAPSHOT_VERSIONS)
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def to_json(self, history_format: str = "normalized") -> Tuple[int, str]:
+        """Serialized to_dict(history_format) snapshot, rebuilt only when the version moved since the last call."""
+        cached = self._snapshot_cache.get(history_format)
+        if cached is not None and cached[0] == self._version:
+            return cached
+        # one serializer per game: concurrent pollers of a stale version wait and reuse its result
+        with self._snapshot_lock:
+            for _ in range(3):
+                # read the version first: a mutation racing with serialization bumps it again afterwards
+                version = self._version
+                cached = self._snapshot_cache.get(history_format)
+                if cached is not None and cached[0] == version:
+                    return cached
+                try:
+                    cached = (version, json.dumps(self.to_dict(history_format), ensure_ascii=False, default=str))
+                except RuntimeError:
+                    # a container was resized by the game thread mid-dump; take a fresh look
+                    continue
+                self._snapshot_cache[history_format] = cached
+                return cached
+            return (self._version, json.dumps(self.to_dict(history_format), ensure_ascii=False, default=str))
+
     def assign_roles(self):
         self.roles = {}
         self.gs = None
         if models and hasattr(models, "create_default_game"):
             try:
-                self.gs = models.create_default_game(self.players)  # type: ignore[attr-defined]
+                self.gs = models.create_default_game(self.players, rng=self.rng)  # type: ignore[attr-defined]
                 for player in getattr(self.gs, "players", []):
                     role_obj = getattr(player, "role", None)
                     role_value = getattr(role_obj, "value", None)
@@ -172,11 +479,12 @@ class Game:
                 except Exception:
                     alive_players = [player.name for player in getattr(self.gs, "players", [])]
                 self.alive = set(alive_players)
+                self._touch()
                 return
             except Exception:
                 self.gs = None
         order = list(self.players)
-        random.shuffle(order)
+        self.rng.shuffle(order)
         fallback_roles: List[str] = []
         if models and hasattr(models, "default_roles_for"):
             try:
@@ -192,6 +500,7 @@ class Game:
         self._refresh_role_metadata()
         self.seer_reveals = {p: [] for p in self.players if self.roles.get(p) == "seer"}
         self.witch_action_log = {p: [] for p in self.players if self.roles.get(p) == "witch"}
+        self._touch()
 
     def _refresh_role_metadata(self):
         """Recompute per-player role metadata used for context building."""
@@ -225,6 +534,7 @@ class Game:
                         target_player.role = role
             except Exception:
                 pass
+        self._touch()
 
     def _mark_dead(self, player: Optional[str], cause: str):
         if not player or player not in self.alive:
@@ -244,6 +554,7 @@ class Game:
                 pass
         # record history entry for this death
         self.history.append({"phase": "death_event", "day": self.day, "player": player, "cause": cause})
+        self._emit("death", {"day": self.day, "player": player, "cause": cause})
         # handle Cupid lover consequence: if player had a lover, that lover dies of heartbreak (if still alive)
         try:
             if self.gs and hasattr(self.gs, "get_player"):
@@ -259,13 +570,16 @@ class Game:
                             p_obj.meta["death_cause"] = "lover_heartbreak"
                             p_obj.meta["death_day"] = self.day
                     self.history.append({"phase": "death_event", "day": self.day, "player": partner, "cause": "lover_heartbreak", "linked_to": player})
+                    self._emit("death", {"day": self.day, "player": partner, "cause": "lover_heartbreak", "linked_to": player})
         except Exception:
             pass
+        self._touch()
 
     def _reset_day_buffers(self):
         self.current_talks = []
         self.current_votes = {}
         self.current_votes_meta = []
+        self._touch()
 
     def _get_model_name(self, player: str) -> Optional[str]:
         try:
@@ -278,10 +592,75 @@ class Game:
         if winner:
             self.state = "ended"
             self.history.append({"phase": "end", "winner": winner, "day": self.day})
+            self._touch()
+            self._emit_phase(winner=winner)
             return True
         return False
 
-    def to_dict(self):
+    # everything a restarted server needs to resume the game at a phase boundary (see recover_rooms)
+    _PERSISTED_FIELDS = (
+        "players", "roles", "day", "state", "witch_save_available", "witch_poison_available",
+        "last_night_result", "morning_announcement", "current_talks", "current_votes", "current_votes_meta",
+        "guard_last_protected", "seer_reveals", "witch_action_log", "werewolf_discussion_log",
+        "day_discussion_rounds", "ai_enabled", "parallel_ai_calls", "stream_speeches", "seed",
+    )
+
+    def export_state(self, history_since: Optional[int] = None) -> Dict[str, Any]:
+        state: Dict[str, Any] = {name: getattr(self, name) for name in self._PERSISTED_FIELDS}
+        state["alive"] = sorted(self.alive)
+        state["engine"] = "async" if isinstance(self, AsyncGame) else "thread"
+        state["history"] = self.history.export_state(history_since)
+        version, internal, gauss = self.rng.getstate()
+        state["rng"] = [version, list(internal), gauss]
+        if self.gs is not None and hasattr(self.gs, "players"):
+            model_players = []
+            for player in self.gs.players:
+                fields = dict(vars(player))
+                fields["role"] = getattr(player.role, "value", player.role)
+                model_players.append(fields)
+            state["model_players"] = model_players
+        return state
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any], history_events: List[Dict[str, Any]], history_base: int = 0) -> "Game":
+        game = cls(list(state["players"]), seed=state.get("seed"))
+        for name in cls._PERSISTED_FIELDS:
+            if name in state:
+                setattr(game, name, state[name])
+        if state.get("rng"):
+            version, internal, gauss = state["rng"]
+            game.rng.setstate((version, tuple(internal), gauss))
+        game.num_players = len(game.players)
+        game.alive = set(state.get("alive") or [])
+        game.history = HistoryLog.restore(state.get("history") or {}, history_events, history_base)
+        if game.gs is not None and hasattr(game.gs, "get_player"):
+            for fields in state.get("model_players") or []:
+                player = game.gs.get_player(fields.get("name"))
+                if player is None:
+                    continue
+                for key, value in fields.items():
+                    if key == "role" and models is not None and hasattr(models, "Role"):
+                        try:
+                            value = models.Role(value)  # type: ignore[attr-defined]
+                        except ValueError:
+                            pass
+                    setattr(player, key, value)
+        game._refresh_role_metadata()
+        game._touch()
+        return game
+
+    def history_view(self, history_format: str = "normalized", limit: Optional[int] = 20) -> List[Dict[str, Any]]:
+        """The last `limit` history events, as stored ("normalized") or in the pre-normalization "legacy" shape."""
+        events = self.history[-limit:] if limit else list(self.history)
+        if history_format != "legacy":
+            return events
+        # legacy day events repeated the announcement of the night before the window started
+        start = len(self.history) - len(events)
+        announcement = next((h.get("announcement") for h in reversed(self.history[:start]) if h.get("phase") == "night"), None)
+        return legacy_history(events, announcement)
+
+    def to_dict(self, history_format: str = "normalized"):
+        legacy = history_format == "legacy"
         snapshot: Dict[str, Any] = {
             "players": self.players,
             "alive": list(self.alive),
@@ -290,9 +669,10 @@ class Game:
             "day": self.day,
             "state": self.state,
             "available_roles": ROLES,
-            "history": self.history[-20:],
+            "history": self.history_view(history_format),
+            "history_format": "legacy" if legacy else "normalized",
             "phase_context": {
-                "last_night_result": self.last_night_result,
+                "last_night_result": legacy_history_event(self.last_night_result) if legacy and self.last_night_result else self.last_night_result,
                 "morning_announcement": self.morning_announcement,
                 "current_talks": self.current_talks,
                 "current_votes": self.current_votes,
@@ -366,49 +746,94 @@ class Game:
         
         # 生成简短独白
         speech = f"[{role}的思考] {context_desc}。"
+        heuristic = True
         
-        # 尝试调用AI生成更丰富的独白
-        try:
-            prompt_context = {
-                "role": role,
-                "state": self.to_dict(),
-                "action_context": context_desc
-            }
-            prompt_context.update(
-                {
-                    "provider": provider_name,
-                    "provider_model": (creds.get("provider_config") or {}).get("model"),
-                    "provider_url": (creds.get("provider_config") or {}).get("model_url"),
+        # 尝试调用AI生成更丰富的独白（heuristic-only 对局跳过）
+        if self.ai_enabled:
+            try:
+                prompt_context = {
+                    "role": role,
+                    "state": self.to_dict(),
+                    "action_context": context_desc
                 }
-            )
-            talk_result = ai_client.decide_talk(player, prompt_context, [], api_token)
-            if isinstance(talk_result, dict) and talk_result.get("speech"):
-                speech = f"[{role}独白] " + talk_result["speech"][:100]  # 限制长度
-        except:
-            pass  # 使用默认 speech
+                prompt_context.update(
+                    {
+                        "provider": provider_name,
+                        "provider_model": (creds.get("provider_config") or {}).get("model"),
+                        "provider_url": (creds.get("provider_config") or {}).get("model_url"),
+                    }
+                )
+                with metrics.phase("monologue"):
+                    talk_result = ai_client.decide_talk(player, prompt_context, [], api_token)
+                if isinstance(talk_result, dict) and talk_result.get("speech"):
+                    speech = f"[{role}独白] " + talk_result["speech"][:100]  # 限制长度
+                    heuristic = False
+            except:
+                pass  # 使用默认 speech
         
         latency = time.time() - start
+        self._record_decision(provider_name, "monologue", "talk", latency, heuristic)
         return {
             "player": player,
             "role": role,
             "speech": speech,
             "type": "monologue",
-            "meta": {"heuristic": False, "provider": provider_name},
+            "meta": {"heuristic": heuristic, "provider": provider_name},
             "model": model_used,
             "latency": latency
         }
 
     def night_phase(self):
         """Night resolution aligning with reference logic."""
+        self._begin_night()
+
+        # Night scheduler: the seer chain (check + monologue) does not depend on the wolves, so it runs
+        # alongside the werewolf resolution; the witch strictly waits for the final wolf target.
+        seer_fallback = self._seer_fallback_target()
+        seer_future = _get_ai_executor().submit(self._run_seer_chain, seer_fallback) if self.parallel_ai_calls else None
+        werewolf_outcome = self._resolve_werewolf_night()
+        seer_outcome, seer_monologue = seer_future.result() if seer_future else self._run_seer_chain(seer_fallback)
+        witch_outcome = self._resolve_witch_night(werewolf_outcome.get("target"))
+        witch_monologue_args = self._witch_monologue_args(witch_outcome)
+        witch_monologue = self._role_monologue(*witch_monologue_args) if witch_monologue_args else None
+
+        self._finish_night(werewolf_outcome, seer_outcome, seer_monologue, witch_outcome, witch_monologue)
+
+    def _begin_night(self):
         self.state = "night"
         self.day += 1
         self._refresh_role_metadata()
         self.werewolf_discussion_log = []
+        self._touch()
+        self._emit_phase()
 
-        werewolf_outcome = self._resolve_werewolf_night()
-        seer_outcome = self._resolve_seer_night()
-        witch_outcome = self._resolve_witch_night(werewolf_outcome.get("target"))
+    def _emit_phase(self, winner: Optional[str] = None):
+        data: Dict[str, Any] = {"state": self.state, "day": self.day, "alive": sorted(self.alive)}
+        if winner:
+            data["winner"] = winner
+        self._emit("phase", data)
 
+    def _witch_monologue_args(self, witch_outcome: Dict[str, Any]) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+        witch_actor = witch_outcome.get("actor")
+        if not witch_actor or witch_actor not in self.alive:
+            return None
+        if witch_outcome.get("saved_player"):
+            action_context = {"result": "saved", "target": witch_outcome.get("saved_player")}
+        elif witch_outcome.get("poisoned_player"):
+            action_context = {"result": "poisoned", "target": witch_outcome.get("poisoned_player")}
+        else:
+            action_context = {"result": "none"}
+        return witch_actor, self.roles.get(witch_actor, "witch"), action_context
+
+    def _finish_night(
+        self,
+        werewolf_outcome: Dict[str, Any],
+        seer_outcome: Dict[str, Any],
+        seer_monologue: Optional[Dict[str, Any]],
+        witch_outcome: Dict[str, Any],
+        witch_monologue: Optional[Dict[str, Any]],
+    ):
+        """Apply the resolved night decisions: deaths, announcement and the night history event."""
         killed_players: List[str] = []
         saved_player = witch_outcome.get("saved_player")
         poisoned_player = witch_outcome.get("poisoned_player")
@@ -423,30 +848,10 @@ class Game:
 
         night_talks: List[Dict[str, Any]] = list(self.werewolf_discussion_log)
 
-        if seer_outcome.get("actor") and seer_outcome.get("actor") in self.alive:
-            night_talks.append(
-                self._role_monologue(
-                    seer_outcome["actor"],
-                    self.roles.get(seer_outcome["actor"], "seer"),
-                    {"target": seer_outcome.get("target"), "revealed_role": seer_outcome.get("revealed_role")},
-                )
-            )
-
-        if witch_outcome.get("actor") and witch_outcome.get("actor") in self.alive:
-            witch_actor = witch_outcome["actor"]
-            if witch_outcome.get("saved_player"):
-                action_context = {"result": "saved", "target": witch_outcome.get("saved_player")}
-            elif witch_outcome.get("poisoned_player"):
-                action_context = {"result": "poisoned", "target": witch_outcome.get("poisoned_player")}
-            else:
-                action_context = {"result": "none"}
-            night_talks.append(
-                self._role_monologue(
-                    witch_actor,
-                    self.roles.get(witch_actor, "witch"),
-                    action_context,
-                )
-            )
+        if seer_monologue:
+            night_talks.append(seer_monologue)
+        if witch_monologue:
+            night_talks.append(witch_monologue)
 
         for victim in killed_players:
             cause = "night"
@@ -475,6 +880,10 @@ class Game:
             )
         actions.extend(witch_outcome.get("actions", []))
 
+        # normalized: actions / talks live only in "actions" and "night_talks" (see legacy_history_event)
+        witch_summary = {k: witch_outcome.get(k) for k in ("actor", "saved_player", "poisoned_player")}
+        if witch_outcome.get("actor") and not witch_outcome.get("actions"):
+            witch_summary["meta"] = witch_outcome.get("meta") or {}
         night_event = {
             "phase": "night",
             "day": self.day,
@@ -483,21 +892,34 @@ class Game:
             "actions": actions,
             "night_talks": night_talks,
             "announcement": announcement,
-            "werewolf_choices": [entry.get("target") for entry in werewolf_outcome.get("actions", []) if entry.get("target")],
             "witch_save_available": self.witch_save_available,
             "witch_poison_available": self.witch_poison_available,
             "guard_last_protected": dict(self.guard_last_protected),
-            "werewolf": werewolf_outcome,
-            "seer": seer_outcome,
-            "witch": witch_outcome,
+            "werewolf": {"target": werewolf_outcome.get("target"), "votes": werewolf_outcome.get("votes") or {}},
+            "seer": {k: seer_outcome.get(k) for k in ("actor", "target", "revealed_role")},
+            "witch": witch_summary,
         }
 
         self.last_night_result = night_event
         self.morning_announcement = announcement
         self.history.append(night_event)
         self._refresh_role_metadata()
+        self._touch()
+        self._emit("night_result", {"day": self.day, "announcement": announcement})
         self._check_and_finalize_winner()
 
+    def _run_seer_chain(self, fallback_target: Optional[str] = None) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        """Seer check followed by the seer's monologue; independent of the werewolf decisions."""
+        seer_outcome = self._resolve_seer_night(fallback_target)
+        monologue = None
+        if seer_outcome.get("actor") and seer_outcome.get("actor") in self.alive:
+            monologue = self._role_monologue(
+                seer_outcome["actor"],
+                self.roles.get(seer_outcome["actor"], "seer"),
+                {"target": seer_outcome.get("target"), "revealed_role": seer_outcome.get("revealed_role")},
+            )
+        return seer_outcome, monologue
+
     def _call_ai_function(
         self,
         func_type: str,
@@ -505,19 +927,65 @@ class Game:
         context: Dict[str, Any],
         fallback=None,
         talk_history: Optional[List[Dict[str, Any]]] = None,
+        stream: bool = False,
     ) -> Tuple[Any, Dict[str, Any]]:
-        model_used = self._get_model_name(player)
+        setup = self._ai_call_setup(player)
+        on_token = self._speech_token_callback(player, context) if stream else None
+        start = time.time()
+        with metrics.phase(context.get("phase")), _provider_slot(setup["provider"]):
+            raw_result = self._invoke_ai_client(func_type, player, context, setup["token"], talk_history, on_token)
+        return self._ai_call_result(setup, time.time() - start, raw_result, fallback, func_type, context.get("phase"))
+
+    def _emit(self, event_type: str, data: Dict[str, Any]):
+        sink = self.event_sink
+        if sink is None:
+            return
+        try:
+            sink(event_type, data)
+        except Exception:
+            # listeners are best-effort and must never break the game loop
+            pass
+
+    def _speech_token_callback(self, player: str, context: Dict[str, Any]):
+        """Build the on_token listener for a streamed speech, or None when nobody is listening."""
+        if not self.stream_speeches or self.event_sink is None:
+            return None
+        base = {"player": player, "day": self.day, "round": context.get("round")}
+
+        def on_token(piece: str, text: str):
+            self._emit("speech_token", dict(base, delta=piece, text=text))
+
+        return on_token
+
+    def _ai_call_setup(self, player: str) -> Dict[str, Any]:
         creds = resolve_player_credentials(player)
         provider_name = creds.get("provider")
         api_token = creds.get("api_key") or API_KEY
         if not api_token and provider_name:
             api_token = provider_name
-        provider_cfg = creds.get("provider_config") or {}
-        token = api_token or ""
-        start = time.time()
+        return {
+            "model": self._get_model_name(player),
+            "provider": provider_name,
+            "provider_config": creds.get("provider_config") or {},
+            "token": api_token or "",
+        }
+
+    def _invoke_ai_client(
+        self,
+        func_type: str,
+        player: str,
+        context: Dict[str, Any],
+        token: str,
+        talk_history: Optional[List[Dict[str, Any]]] = None,
+        on_token=None,
+    ) -> Any:
         raw_result: Any = None
+        if not self.ai_enabled:
+            return None
         try:
-            if func_type == "talk":
+            if func_type == "talk" and on_token is not None:
+                raw_result = ai_client.decide_talk(player, context, talk_history or [], token, on_token=on_token)
+            elif func_type == "talk":
                 raw_result = ai_client.decide_talk(player, context, talk_history or [], token)
             elif func_type == "action":
                 raw_result = ai_client.decide_night_action(player, context, token)
@@ -537,11 +1005,21 @@ class Game:
                 raw_result = None
         except Exception:
             raw_result = None
+        return raw_result
 
-        latency = time.time() - start
+    def _ai_call_result(
+        self,
+        setup: Dict[str, Any],
+        latency: float,
+        raw_result: Any,
+        fallback=None,
+        func_type: Optional[str] = None,
+        phase: Optional[str] = None,
+    ) -> Tuple[Any, Dict[str, Any]]:
+        provider_cfg = setup["provider_config"]
         meta: Dict[str, Any] = {
-            "model": model_used,
-            "provider": provider_name,
+            "model": setup["model"],
+            "provider": setup["provider"],
             "latency": latency,
         }
         if provider_cfg.get("model"):
@@ -553,8 +1031,30 @@ class Game:
             raw_result = fallback()
             meta["heuristic"] = True
 
+        self._record_decision(setup["provider"], phase, func_type, latency, bool(meta.get("heuristic")))
         return raw_result, meta
 
+    def _record_decision(self, provider: Optional[str], phase: Optional[str], kind: Optional[str], latency: float, heuristic: bool):
+        if not self.ai_enabled:
+            # heuristic-only games never consult a model; keep them out of the fallback rate
+            return
+        provider = provider or "default"
+        phase = phase or "unknown"
+        AI_DECISIONS.inc(provider=provider, phase=phase, kind=kind or "unknown", source="heuristic" if heuristic else "model")
+        AI_DECISION_LATENCY.observe(latency, provider=provider, phase=phase)
+
+    def _call_ai_functions(self, calls: List[Dict[str, Any]]) -> List[Tuple[Any, Dict[str, Any]]]:
+        """
+        Run several independent _call_ai_function invocations (each a kwargs dict).
+        With parallel_ai_calls enabled they are issued at once on the shared worker pool;
+        results are always returned in the order of `calls`.
+        """
+        if not self.parallel_ai_calls or len(calls) < 2:
+            return [self._call_ai_function(**call) for call in calls]
+        executor = _get_ai_executor()
+        futures = [executor.submit(self._call_ai_function, **call) for call in calls]
+        return [future.result() for future in futures]
+
     def _normalize_speech(self, raw: Any, default_text: str) -> Tuple[str, Dict[str, Any]]:
         if isinstance(raw, dict):
             speech = raw.get("speech") or default_text
@@ -606,11 +1106,16 @@ class Game:
     def _get_visible_history_for(self, player: str) -> List[Dict[str, Any]]:
         role = self.roles.get(player)
         visible: List[Dict[str, Any]] = []
-        for event in self.history[-8:]:
+        events = self.history[-8:]
+        start = len(self.history) - len(events)
+        # day events show the morning announcement, i.e. that of the latest night
+        announcement = next((h.get("announcement") for h in reversed(self.history[:start]) if h.get("phase") == "night"), None)
+        for event in events:
             phase = event.get("phase")
             entry: Dict[str, Any] = {"phase": phase, "day": event.get("day")}
             if phase == "night":
-                entry["announcement"] = event.get("announcement")
+                announcement = event.get("announcement")
+                entry["announcement"] = announcement
                 if role == "werewolf" and event.get("werewolf"):
                     entry["werewolf"] = {
                         "target": event["werewolf"].get("target"),
@@ -630,69 +1135,92 @@ class Game:
                 entry["talks"] = event.get("talks") or event.get("speeches")
                 entry["votes"] = event.get("votes")
                 entry["lynched"] = event.get("lynched")
-                entry["announcement"] = event.get("announcement")
+                entry["announcement"] = event.get("announcement", announcement)
             elif phase == "end":
                 entry["winner"] = event.get("winner")
             visible.append(entry)
         return visible
 
     def _resolve_werewolf_night(self) -> Dict[str, Any]:
-        wolves = [p for p in self.alive if self.roles.get(p) == "werewolf"]
+        wolves = [p for p in sorted(self.alive) if self.roles.get(p) == "werewolf"]
         if not wolves:
-            self._werewolf_choices = []
-            self.werewolf_discussion_log = []
-            return {"target": None, "actions": [], "votes": {}, "discussions": []}
+            return self._empty_werewolf_outcome()
 
         discussions: List[Dict[str, Any]] = []
-        action_logs: List[Dict[str, Any]] = []
-        kill_votes: Dict[str, int] = {}
-
         for round_index in range(1, 4):
             for wolf in wolves:
-                fallback_text = f"{wolf} 暂无明确目标，继续讨论。"
-                fallback_payload = {"speech": fallback_text, "meta": {"heuristic": True}}
-                context = self._build_player_context(
-                    wolf,
-                    "werewolf_discussion",
-                    {
-                        "round": round_index,
-                        "previous_discussions": list(discussions),
-                        "teammates": [w for w in wolves if w != wolf],
-                        "alive_players": sorted(self.alive),
-                    },
-                )
-                raw, meta = self._call_ai_function("talk", wolf, context, fallback=lambda: fallback_payload, talk_history=discussions)
-                speech, speech_meta = self._normalize_speech(raw, fallback_text)
-                if meta.get("heuristic"):
-                    speech_meta["heuristic"] = True
-                speech_meta.setdefault("provider", meta.get("provider"))
-                discussions.append(
-                    {
-                        "player": wolf,
-                        "round": round_index,
-                        "speech": speech,
-                        "meta": speech_meta,
-                        "model": meta.get("model"),
-                        "provider": meta.get("provider"),
-                        "latency": meta.get("latency"),
-                    }
-                )
+                call = self._werewolf_discussion_call(wolf, wolves, round_index, discussions)
+                raw, meta = self._call_ai_function(**call)
+                discussions.append(self._speech_entry(wolf, round_index, raw, meta, self._werewolf_fallback_text(wolf)))
 
         self.werewolf_discussion_log = list(discussions)
 
-        for wolf in wolves:
-            fallback_choice = self._random_vote_choice(wolf, sorted(self.alive), allow_self=False, exclude=wolves)
-            context = self._build_player_context(
-                wolf,
-                "werewolf_kill",
-                {
-                    "previous_discussions": list(discussions),
-                    "teammates": [w for w in wolves if w != wolf],
-                    "alive_players": sorted(self.alive),
-                    "default_choice": fallback_choice,
-                },
-            )
-            raw, meta = self._call_ai_function("action", wolf, context, fallback=lambda: {"target": fallback_choice} if fallback_choice else {"target": None})
+        # final kill votes only depend on the finished discussion, so they are issued together
+        calls = [self._werewolf_kill_call(wolf, wolves, discussions) for wolf in wolves]
+        return self._tally_werewolf_kill(wolves, discussions, self._call_ai_functions(calls))
+
+    def _empty_werewolf_outcome(self) -> Dict[str, Any]:
+        self._werewolf_choices = []
+        self.werewolf_discussion_log = []
+        return {"target": None, "actions": [], "votes": {}, "discussions": []}
+
+    def _werewolf_fallback_text(self, wolf: str) -> str:
+        return f"{wolf} 暂无明确目标，继续讨论。"
+
+    def _werewolf_discussion_call(
+        self,
+        wolf: str,
+        wolves: List[str],
+        round_index: int,
+        discussions: List[Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        fallback_payload = {"speech": self._werewolf_fallback_text(wolf), "meta": {"heuristic": True}}
+        context = self._build_player_context(
+            wolf,
+            "werewolf_discussion",
+            {
+                "round": round_index,
+                "previous_discussions": list(discussions),
+                "teammates": [w for w in wolves if w != wolf],
+                "alive_players": sorted(self.alive),
+            },
+        )
+        return {
+            "func_type": "talk",
+            "player": wolf,
+            "context": context,
+            "fallback": lambda: fallback_payload,
+            "talk_history": discussions,
+        }
+
+    def _werewolf_kill_call(self, wolf: str, wolves: List[str], discussions: List[Dict[str, Any]]) -> Dict[str, Any]:
+        fallback_choice = self._random_vote_choice(wolf, sorted(self.alive), allow_self=False, exclude=wolves)
+        context = self._build_player_context(
+            wolf,
+            "werewolf_kill",
+            {
+                "previous_discussions": list(discussions),
+                "teammates": [w for w in wolves if w != wolf],
+                "alive_players": sorted(self.alive),
+                "default_choice": fallback_choice,
+            },
+        )
+        return {
+            "func_type": "action",
+            "player": wolf,
+            "context": context,
+            "fallback": lambda: {"target": fallback_choice},
+        }
+
+    def _tally_werewolf_kill(
+        self,
+        wolves: List[str],
+        discussions: List[Dict[str, Any]],
+        results: List[Tuple[Any, Dict[str, Any]]],
+    ) -> Dict[str, Any]:
+        action_logs: List[Dict[str, Any]] = []
+        kill_votes: Dict[str, int] = {}
+        for wolf, (raw, meta) in zip(wolves, results):
             target = self._normalize_target(raw)
             if target and target in self.alive and target not in wolves:
                 kill_votes[target] = kill_votes.get(target, 0) + 1
@@ -705,11 +1233,11 @@ class Game:
             candidates = [p for p in top_targets if p in self.alive and p not in wolves]
             pool = candidates or [p for p in kill_votes if p in self.alive]
             if pool:
-                chosen_target = random.choice(pool)
+                chosen_target = self._pick(pool)
         if not chosen_target:
             non_wolf_players = [p for p in self.alive if p not in wolves]
             if non_wolf_players:
-                chosen_target = random.choice(non_wolf_players)
+                chosen_target = self._pick(non_wolf_players)
 
         self._werewolf_choices = [entry.get("target") for entry in action_logs if entry.get("target")]
 
@@ -720,12 +1248,25 @@ class Game:
             "discussions": discussions,
         }
 
-    def _resolve_seer_night(self) -> Dict[str, Any]:
+    def _resolve_seer_night(self, fallback_target: Optional[str] = None) -> Dict[str, Any]:
         seer = next((p for p in self.alive if self.roles.get(p) == "seer"), None)
         if not seer:
             return {"actor": None, "target": None, "revealed_role": None, "meta": {}}
+        raw, meta = self._call_ai_function(**self._seer_call(seer, fallback_target))
+        return self._apply_seer_result(seer, raw, meta)
 
-        available_targets = [p for p in self.alive if p != seer]
+    def _seer_fallback_target(self) -> Optional[str]:
+        """
+        The seer's heuristic target for tonight. Drawn by night_phase before the seer chain is scheduled:
+        the chain runs next to the werewolf resolution, and draws made from there would interleave with the
+        wolves' draws on self.rng in whatever order the threads / tasks happen to run.
+        """
+        seer = next((p for p in self.alive if self.roles.get(p) == "seer"), None)
+        targets = [p for p in sorted(self.alive) if p != seer]
+        return self._pick(targets) if seer and targets else None
+
+    def _seer_call(self, seer: str, fallback_target: Optional[str] = None) -> Dict[str, Any]:
+        available_targets = [p for p in sorted(self.alive) if p != seer]
         context = self._build_player_context(
             seer,
             "seer_reveal",
@@ -734,13 +1275,9 @@ class Game:
                 "seer_reveals": list(self.seer_reveals.get(seer, [])),
             },
         )
+        return {"func_type": "action", "player": seer, "context": context, "fallback": lambda: {"target": fallback_target}}
 
-        def _fallback():
-            if not available_targets:
-                return {"target": None}
-            return {"target": random.choice(available_targets)}
-
-        raw, meta = self._call_ai_function("action", seer, context, fallback=_fallback)
+    def _apply_seer_result(self, seer: str, raw: Any, meta: Dict[str, Any]) -> Dict[str, Any]:
         target = self._normalize_target(raw)
         if not target or target == seer or target not in self.players:
             target = None
@@ -752,11 +1289,13 @@ class Game:
 
     def _resolve_witch_night(self, pending_target: Optional[str]) -> Dict[str, Any]:
         witch = next((p for p in self.alive if self.roles.get(p) == "witch"), None)
-        actions: List[Dict[str, Any]] = []
         if not witch:
-            return {"actor": None, "saved_player": None, "poisoned_player": None, "actions": actions, "meta": {}}
+            return {"actor": None, "saved_player": None, "poisoned_player": None, "actions": [], "meta": {}}
+        raw, meta = self._call_ai_function(**self._witch_call(witch, pending_target))
+        return self._apply_witch_result(witch, pending_target, raw, meta)
 
-        available_targets = [p for p in self.alive if p != witch]
+    def _witch_call(self, witch: str, pending_target: Optional[str]) -> Dict[str, Any]:
+        available_targets = [p for p in sorted(self.alive) if p != witch]
         context = self._build_player_context(
             witch,
             "witch_action",
@@ -768,8 +1307,11 @@ class Game:
                 "witch_actions": list(self.witch_action_log.get(witch, [])),
             },
         )
+        return {"func_type": "action", "player": witch, "context": context, "fallback": lambda: {"decision": "none"}}
 
-        raw, meta = self._call_ai_function("action", witch, context, fallback=lambda: {"decision": "none"})
+    def _apply_witch_result(self, witch: str, pending_target: Optional[str], raw: Any, meta: Dict[str, Any]) -> Dict[str, Any]:
+        actions: List[Dict[str, Any]] = []
+        available_targets = [p for p in sorted(self.alive) if p != witch]
 
         save_candidate: Optional[str] = None
         poison_candidate: Optional[str] = None
@@ -782,7 +1324,7 @@ class Game:
             if raw.get("decision") == "poison" and not poison_candidate:
                 choices = [p for p in available_targets if p != pending_target]
                 if choices:
-                    poison_candidate = random.choice(choices)
+                    poison_candidate = self._pick(choices)
         elif isinstance(raw, str):
             lowered = raw.lower()
             if "save" in lowered and pending_target:
@@ -827,49 +1369,81 @@ class Game:
         exclude = exclude or []
         options = [p for p in alive_list if (allow_self or p != voter) and p not in exclude]
         if options:
-            return random.choice(options)
+            return self._pick(options)
         return None
 
+    def _pick(self, options: Iterable[str]) -> str:
+        # sorted: candidate lists built from self.alive (a set) come out in a per-process hash order
+        return self.rng.choice(sorted(options))
+
     def _run_discussion(self, rounds: int = 2) -> List[Dict[str, Any]]:
         talks: List[Dict[str, Any]] = []
+        # published as it grows so state snapshots show speeches made so far
+        self.current_talks = talks
         for round_index in range(1, rounds + 1):
             for player in self.players:
                 if player not in self.alive:
                     continue
-                fallback_text = f"{player} 暂时没有明确的看法，继续观察。"
-                fallback_payload = {"speech": fallback_text, "meta": {"heuristic": True}}
-                context = self._build_player_context(
-                    player,
-                    "day_discussion",
-                    {
-                        "round": round_index,
-                        "previous_speeches": list(talks),
-                    },
-                )
-                raw, meta = self._call_ai_function("talk", player, context, fallback=lambda: fallback_payload, talk_history=talks)
-                speech, speech_meta = self._normalize_speech(raw, fallback_text)
-                if meta.get("heuristic"):
-                    speech_meta["heuristic"] = True
-                speech_meta.setdefault("provider", meta.get("provider"))
-                talks.append(
-                    {
-                        "player": player,
-                        "round": round_index,
-                        "speech": speech,
-                        "meta": speech_meta,
-                        "model": meta.get("model"),
-                        "provider": meta.get("provider"),
-                        "latency": meta.get("latency"),
-                    }
-                )
-        self.current_talks = talks
+                raw, meta = self._call_ai_function(**self._discussion_call(player, round_index, talks))
+                talks.append(self._speech_entry(player, round_index, raw, meta, self._discussion_fallback_text(player)))
+                self._touch()
+                self._emit_speech(talks[-1])
         return talks
 
+    def _emit_speech(self, entry: Dict[str, Any]):
+        # final text closes the live speech_token sequence for this player
+        self._emit("speech", {"player": entry["player"], "day": self.day, "round": entry.get("round"), "speech": entry.get("speech")})
+
+    def _discussion_fallback_text(self, player: str) -> str:
+        return f"{player} 暂时没有明确的看法，继续观察。"
+
+    def _discussion_call(self, player: str, round_index: int, talks: List[Dict[str, Any]]) -> Dict[str, Any]:
+        fallback_payload = {"speech": self._discussion_fallback_text(player), "meta": {"heuristic": True}}
+        context = self._build_player_context(
+            player,
+            "day_discussion",
+            {
+                "round": round_index,
+                "previous_speeches": list(talks),
+            },
+        )
+        return {
+            "func_type": "talk",
+            "player": player,
+            "context": context,
+            "fallback": lambda: fallback_payload,
+            "talk_history": talks,
+            "stream": True,
+        }
+
+    def _speech_entry(self, player: str, round_index: int, raw: Any, meta: Dict[str, Any], fallback_text: str) -> Dict[str, Any]:
+        speech, speech_meta = self._normalize_speech(raw, fallback_text)
+        if meta.get("heuristic"):
+            speech_meta["heuristic"] = True
+        speech_meta.setdefault("provider", meta.get("provider"))
+        return {
+            "player": player,
+            "round": round_index,
+            "speech": speech,
+            "meta": speech_meta,
+            "model": meta.get("model"),
+            "provider": meta.get("provider"),
+            "latency": meta.get("latency"),
+        }
+
     def _run_voting(self, speech_history: List[Dict[str, Any]]) -> Dict[str, Any]:
         alive_list = sorted(self.alive)
-        votes_meta: List[Dict[str, Any]] = []
-        tally: Dict[str, int] = {}
+        # votes are independent: build every ballot request first, then fan them out
+        fallback_choices, calls = self._vote_calls(alive_list, speech_history)
+        return self._tally_votes(alive_list, fallback_choices, self._call_ai_functions(calls))
 
+    def _vote_calls(
+        self,
+        alive_list: List[str],
+        speech_history: List[Dict[str, Any]],
+    ) -> Tuple[List[Optional[str]], List[Dict[str, Any]]]:
+        fallback_choices: List[Optional[str]] = []
+        calls: List[Dict[str, Any]] = []
         for voter in alive_list:
             fallback_choice = self._random_vote_choice(voter, alive_list)
             context = self._build_player_context(
@@ -881,7 +1455,26 @@ class Game:
                     "default_choice": fallback_choice,
                 },
             )
-            raw, meta = self._call_ai_function("vote", voter, context, fallback=lambda: {"vote_target": fallback_choice or "abstain"})
+            fallback_choices.append(fallback_choice)
+            calls.append(
+                {
+                    "func_type": "vote",
+                    "player": voter,
+                    "context": context,
+                    "fallback": lambda choice=fallback_choice: {"vote_target": choice or "abstain"},
+                }
+            )
+        return fallback_choices, calls
+
+    def _tally_votes(
+        self,
+        alive_list: List[str],
+        fallback_choices: List[Optional[str]],
+        results: List[Tuple[Any, Dict[str, Any]]],
+    ) -> Dict[str, Any]:
+        votes_meta: List[Dict[str, Any]] = []
+        tally: Dict[str, int] = {}
+        for voter, fallback_choice, (raw, meta) in zip(alive_list, fallback_choices, results):
             choice = self._normalize_vote_choice(raw)
             if not choice:
                 choice = fallback_choice or "abstain"
@@ -900,9 +1493,11 @@ class Game:
             if meta.get("heuristic"):
                 vote_meta["heuristic"] = True
             votes_meta.append(vote_meta)
+            self._emit("vote", {"day": self.day, "voter": voter, "vote": choice})
 
         self.current_votes = tally
         self.current_votes_meta = votes_meta
+        self._touch()
 
         non_abstain_votes = {k: v for k, v in tally.items() if k.lower() != "abstain"}
         lynched: Optional[str] = None
@@ -936,16 +1531,24 @@ class Game:
                     except Exception:
                         pass
                 self.history.append({"phase": "day", "day": self.day, "idiot_revealed": lynched})
+                self._touch()
                 return None
             self._mark_dead(lynched, "vote")
         return lynched
 
     def day_phase(self):
         """执行白天阶段：公告 -> 多轮发言 -> 投票 -> 结算。"""
-        self.state = "day"
-        self._reset_day_buffers()
+        self._begin_day()
         speeches = self._run_discussion(self.day_discussion_rounds)
         voting_result = self._run_voting(speeches)
+        self._finish_day(voting_result)
+
+    def _begin_day(self):
+        self.state = "day"
+        self._reset_day_buffers()
+        self._emit_phase()
+
+    def _finish_day(self, voting_result: Dict[str, Any]):
         lynched = self._finalize_vote(voting_result)
         day_event = {
             "phase": "day",
@@ -954,10 +1557,10 @@ class Game:
             "votes": dict(self.current_votes),
             "votes_meta": list(self.current_votes_meta),
             "talks": list(self.current_talks),
-            "speeches": list(self.current_talks),
-            "announcement": self.morning_announcement,
         }
         self.history.append(day_event)
+        self._touch()
+        self._emit("vote_result", {"day": self.day, "lynched": lynched, "tally": dict(self.current_votes)})
         self._check_and_finalize_winner()
 
     def step(self):
@@ -965,22 +1568,589 @@ class Game:
             self.night_phase()
         elif self.state == "night":
             self.day_phase()
+        self._after_step()
+
+    def _after_step(self):
         winner = self.check_win()
         if winner:
             self.state = "ended"
             self.history.append({"phase": "end", "winner": winner})
+            self._touch()
+            self._emit_phase(winner=winner)
+
+_ASYNC_PROVIDER_SLOTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+
+
+def _async_provider_slot(provider: Optional[str]) -> asyncio.Semaphore:
+    slots = _ASYNC_PROVIDER_SLOTS.setdefault(asyncio.get_running_loop(), {})
+    key = provider or "__default__"
+    slot = slots.get(key)
+    if slot is None:
+        slot = slots[key] = asyncio.Semaphore(PROVIDER_CONCURRENCY)
+    return slot
+
+
+async def _run_blocking(func, *args):
+    runner = getattr(ai_client, "run_blocking", None)
+    if runner is not None:
+        return await runner(func, *args)
+    return await asyncio.get_running_loop().run_in_executor(_get_ai_executor(), func, *args)
+
+
+class AsyncGame(Game):
+    """
+    asyncio 版本的对局引擎：规则与记账逻辑与 Game 共享，只有 AI 调用改为 await，
+    因此一个事件循环可以同时推进大量房间。AI 调用本身仍是阻塞调用，在 ai_client 的
+    offload 线程池上执行，同时在途的调用数以 ai_client.ASYNC_OFFLOAD_WORKERS 为上限。
+    同步的 step() 仍然可用。
+    """
+
+    async def astep(self):
+        if self.state in ("lobby", "day"):
+            await self.anight_phase()
+        elif self.state == "night":
+            await self.aday_phase()
+        self._after_step()
+
+    async def arun_to_end(self, max_steps: int = 1000):
+        for _ in range(max_steps):
+            if self.state == "ended":
+                break
+            await self.astep()
+        return self
+
+    async def anight_phase(self):
+        self._begin_night()
+        seer_fallback = self._seer_fallback_target()
+        seer_task = asyncio.ensure_future(self._arun_seer_chain(seer_fallback)) if self.parallel_ai_calls else None
+        werewolf_outcome = await self._aresolve_werewolf_night()
+        if seer_task is not None:
+            seer_outcome, seer_monologue = await seer_task
+        else:
+            seer_outcome, seer_monologue = await self._arun_seer_chain(seer_fallback)
+        witch_outcome = await self._aresolve_witch_night(werewolf_outcome.get("target"))
+        witch_monologue_args = self._witch_monologue_args(witch_outcome)
+        witch_monologue = await _run_blocking(self._role_monologue, *witch_monologue_args) if witch_monologue_args else None
+        self._finish_night(werewolf_outcome, seer_outcome, seer_monologue, witch_outcome, witch_monologue)
+
+    async def aday_phase(self):
+        self._begin_day()
+        speeches = await self._arun_discussion(self.day_discussion_rounds)
+        voting_result = await self._arun_voting(speeches)
+        self._finish_day(voting_result)
+
+    async def _acall_ai_function(
+        self,
+        func_type: str,
+        player: str,
+        context: Dict[str, Any],
+        fallback=None,
+        talk_history: Optional[List[Dict[str, Any]]] = None,
+        stream: bool = False,
+    ) -> Tuple[Any, Dict[str, Any]]:
+        setup = self._ai_call_setup(player)
+        on_token = self._speech_token_callback(player, context) if stream else None
+        start = time.time()
+        with metrics.phase(context.get("phase")):
+            async with _async_provider_slot(setup["provider"]):
+                raw_result = await self._ainvoke_ai_client(func_type, player, context, setup["token"], talk_history, on_token)
+        return self._ai_call_result(setup, time.time() - start, raw_result, fallback, func_type, context.get("phase"))
+
+    async def _ainvoke_ai_client(
+        self,
+        func_type: str,
+        player: str,
+        context: Dict[str, Any],
+        token: str,
+        talk_history: Optional[List[Dict[str, Any]]] = None,
+        on_token=None,
+    ) -> Any:
+        if not self.ai_enabled:
+            return None
+        name = {"talk": "adecide_talk", "action": "adecide_night_action", "vote": "adecide_vote"}.get(func_type)
+        afunc = getattr(ai_client, name, None) if name else None
+        if afunc is None:
+            return await _run_blocking(self._invoke_ai_client, func_type, player, context, token, talk_history, on_token)
+        try:
+            if func_type == "talk" and on_token is not None:
+                return await afunc(player, context, talk_history or [], token, on_token=on_token)
+            if func_type == "talk":
+                return await afunc(player, context, talk_history or [], token)
+            return await afunc(player, context, token)
+        except Exception:
+            return None
+
+    async def _acall_ai_functions(self, calls: List[Dict[str, Any]]) -> List[Tuple[Any, Dict[str, Any]]]:
+        if not self.parallel_ai_calls:
+            return [await self._acall_ai_function(**call) for call in calls]
+        return list(await asyncio.gather(*(self._acall_ai_function(**call) for call in calls)))
+
+    async def _arun_seer_chain(self, fallback_target: Optional[str] = None) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        seer_outcome = await self._aresolve_seer_night(fallback_target)
+        monologue = None
+        if seer_outcome.get("actor") and seer_outcome.get("actor") in self.alive:
+            monologue = await _run_blocking(
+                self._role_monologue,
+                seer_outcome["actor"],
+                self.roles.get(seer_outcome["actor"], "seer"),
+                {"target": seer_outcome.get("target"), "revealed_role": seer_outcome.get("revealed_role")},
+            )
+        return seer_outcome, monologue
+
+    async def _aresolve_werewolf_night(self) -> Dict[str, Any]:
+        wolves = [p for p in sorted(self.alive) if self.roles.get(p) == "werewolf"]
+        if not wolves:
+            return self._empty_werewolf_outcome()
+
+        discussions: List[Dict[str, Any]] = []
+        for round_index in range(1, 4):
+            for wolf in wolves:
+                call = self._werewolf_discussion_call(wolf, wolves, round_index, discussions)
+                raw, meta = await self._acall_ai_function(**call)
+                discussions.append(self._speech_entry(wolf, round_index, raw, meta, self._werewolf_fallback_text(wolf)))
+
+        self.werewolf_discussion_log = list(discussions)
+
+        calls = [self._werewolf_kill_call(wolf, wolves, discussions) for wolf in wolves]
+        return self._tally_werewolf_kill(wolves, discussions, await self._acall_ai_functions(calls))
+
+    async def _aresolve_seer_night(self, fallback_target: Optional[str] = None) -> Dict[str, Any]:
+        seer = next((p for p in self.alive if self.roles.get(p) == "seer"), None)
+        if not seer:
+            return {"actor": None, "target": None, "revealed_role": None, "meta": {}}
+        raw, meta = await self._acall_ai_function(**self._seer_call(seer, fallback_target))
+        return self._apply_seer_result(seer, raw, meta)
+
+    async def _aresolve_witch_night(self, pending_target: Optional[str]) -> Dict[str, Any]:
+        witch = next((p for p in self.alive if self.roles.get(p) == "witch"), None)
+        if not witch:
+            return {"actor": None, "saved_player": None, "poisoned_player": None, "actions": [], "meta": {}}
+        raw, meta = await self._acall_ai_function(**self._witch_call(witch, pending_target))
+        return self._apply_witch_result(witch, pending_target, raw, meta)
+
+    async def _arun_discussion(self, rounds: int = 2) -> List[Dict[str, Any]]:
+        talks: List[Dict[str, Any]] = []
+        self.current_talks = talks
+        for round_index in range(1, rounds + 1):
+            for player in self.players:
+                if player not in self.alive:
+                    continue
+                raw, meta = await self._acall_ai_function(**self._discussion_call(player, round_index, talks))
+                talks.append(self._speech_entry(player, round_index, raw, meta, self._discussion_fallback_text(player)))
+                self._touch()
+                self._emit_speech(talks[-1])
+        return talks
+
+    async def _arun_voting(self, speech_history: List[Dict[str, Any]]) -> Dict[str, Any]:
+        alive_list = sorted(self.alive)
+        fallback_choices, calls = self._vote_calls(alive_list, speech_history)
+        return self._tally_votes(alive_list, fallback_choices, await self._acall_ai_functions(calls))
+
+def run_headless_game(
+    players: Optional[List[str]] = None,
+    roles: Optional[Dict[str, str]] = None,
+    heuristic_only: bool = False,
+    seed: Optional[int] = None,
+    max_steps: int = 1000,
+    archive_history: bool = False,
+) -> Game:
+    """
+    Play one complete game without rooms, auto-runner threads or Flask (batch simulations / evals).
+    roles: optional {player: role} overrides; seed seeds the game's RNG (role shuffle and heuristic fallbacks).
+    archive_history: spill events beyond the in-memory window to HISTORY_ARCHIVE_DIR; off by default, since
+    nothing owns (or later deletes) the archive of a headless game.
+    """
+    game = Game(players or [f"AI_{i}" for i in range(1, 7)], seed=seed)
+    if not archive_history:
+        game.history.archive_dir = None
+    game.ai_enabled = not heuristic_only
+    # nothing to overlap without model calls; staying on one thread also keeps seeded runs reproducible
+    game.parallel_ai_calls = game.parallel_ai_calls and not heuristic_only
+    for player, role in (roles or {}).items():
+        game.set_player_role(player, role)
+    for _ in range(max_steps):
+        if game.state == "ended":
+            break
+        game.step()
+    return game
 
 # Rooms management
 rooms_lock = threading.Lock()
 rooms: Dict[str, Dict[str, Any]] = {}
 _AUTO_THREADS: Dict[str, threading.Thread] = {}
 _AUTO_STOP_FLAGS: Dict[str, threading.Event] = {}
+_AUTO_TASKS: Dict[str, Future] = {}
 AUTO_STEP_DELAY = float(os.getenv("WEREWOLF_AUTO_STEP_DELAY", "1.5"))
+# "thread": one auto-runner thread per room (default); "async": every room runs as a task on one shared event loop
+ENGINE_MODE = os.getenv("WEREWOLF_ENGINE", "thread").strip().lower()
+_ASYNC_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_ASYNC_LOOP_LOCK = threading.Lock()
+
+
+class RoomEventStream:
+    """
+    Fan-out of live room events to subscribers; each connected client owns a bounded queue.
+    Durable events get a per-room sequence number and are kept in a ring buffer so a client can
+    resume from the last seq it saw. Transient events (speech tokens) are only delivered live.
+    """
+
+    def __init__(self, max_queue: int = 1000, backlog: Optional[int] = None):
+        self.max_queue = max_queue
+        self._subscribers: List[queue.Queue] = []
+        self._backlog: deque = deque(maxlen=backlog or EVENT_BACKLOG)
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+    def publish(self, event_type: str, data: Dict[str, Any], transient: bool = False):
+        with self._lock:
+            item: Dict[str, Any] = {"type": event_type, "data": data, "ts": time.time()}
+            if not transient:
+                self._seq += 1
+                item["seq"] = self._seq
+                self._backlog.append(item)
+            # delivered under the lock so every subscriber sees events in seq order
+            for q in self._subscribers:
+                try:
+                    q.put_nowait(item)
+                except queue.Full:
+                    # a stalled client loses events instead of blocking the game; it resumes via seq
+                    pass
+
+    def subscribe(self, since: Optional[int] = None) -> Tuple[queue.Queue, List[Dict[str, Any]], bool]:
+        """
+        Register a subscriber. Returns (queue, replay, resync): replay holds buffered events after
+        `since`; resync is True when events after `since` were already evicted (or the seq is from
+        an older stream), in which case the client must refetch the full room state.
+        """
+        q: queue.Queue = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._subscribers.append(q)
+            if since is None:
+                return q, [], False
+            if since > self._seq:
+                return q, [], True
+            replay = [item for item in self._backlog if item["seq"] > since]
+            oldest = self._backlog[0]["seq"] if self._backlog else self._seq + 1
+            return q, replay, since < oldest - 1
+
+    def unsubscribe(self, q: queue.Queue):
+        with self._lock:
+            if q in self._subscribers:
+                self._subscribers.remove(q)
+
+    def close(self, reason: str):
+        """Wake every subscriber with a final live-only `end` event (the room is gone)."""
+        self.publish("end", {"reason": reason}, transient=True)
+
+
+_ROOM_STREAMS: Dict[str, RoomEventStream] = {}
+_ROOM_STREAMS_LOCK = threading.Lock()
+SSE_HEARTBEAT_SECONDS = float(os.getenv("WEREWOLF_SSE_HEARTBEAT", "15"))
+EVENT_BACKLOG = max(1, int(os.getenv("WEREWOLF_EVENT_BACKLOG", "500")))
+# live-only events: never numbered, buffered or replayed
+TRANSIENT_EVENTS = {"speech_token"}
+
+
+def _room_stream(room_id: str) -> RoomEventStream:
+    with _ROOM_STREAMS_LOCK:
+        stream = _ROOM_STREAMS.get(room_id)
+        if stream is None:
+            stream = _ROOM_STREAMS[room_id] = RoomEventStream()
+    return stream
+
+
+def _publish_room_event(room_id: str, event_type: str, data: Dict[str, Any]):
+    transient = event_type in TRANSIENT_EVENTS
+    _room_stream(room_id).publish(event_type, data, transient=transient)
+    journal = _ROOM_JOURNALS.get(room_id)
+    if journal is not None and not transient:
+        # batched fsync: the durable "step" record at the end of the phase flushes these too
+        _journal_append(journal, "event", event=event_type, data=data)
+
+
+def _sse_format(event_type: str, data: Any, seq: Optional[int] = None) -> str:
+    head = f"id: {seq}\n" if seq is not None else ""
+    return f"{head}event: {event_type}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+# "single": at most one active room, ended rooms are cleaned up on create (default, what the UI expects);
+# "multi": every create makes a new room, up to WEREWOLF_MAX_ACTIVE_ROOMS games run at once and further
+# starts wait in a FIFO admission queue (room state "queued").
+ROOM_MODE = os.getenv("WEREWOLF_ROOM_MODE", "single").strip().lower()
+MAX_ACTIVE_ROOMS = max(1, int(os.getenv("WEREWOLF_MAX_ACTIVE_ROOMS", "4")))
+ENDED_ROOM_RETENTION = max(0, int(os.getenv("WEREWOLF_ENDED_ROOM_RETENTION", "20")))
+
+# Lock order: rooms_lock (room table) -> room["lock"] (one room's fields) -> _ADMISSION_LOCK (leaf).
+# Never take rooms_lock while holding a room lock.
+_ADMISSION_LOCK = threading.Lock()
+# room id -> the game holding its run slot (a restarted room must not lose the slot to the old runner)
+_ACTIVE_ROOMS: Dict[str, Any] = {}
+_ADMISSION_QUEUE: deque = deque()
+
+
+def _get_room(room_id: str) -> Optional[Dict[str, Any]]:
+    with rooms_lock:
+        return rooms.get(room_id)
+
+
+def _acquire_run_slot(room_id: str, game: Any) -> bool:
+    """Reserve a run slot for the room's game, or queue it (multi-room mode only) and return False."""
+    with _ADMISSION_LOCK:
+        if room_id in _ACTIVE_ROOMS:
+            _ACTIVE_ROOMS[room_id] = game
+            return True
+        if ROOM_MODE != "multi" or (len(_ACTIVE_ROOMS) < MAX_ACTIVE_ROOMS and not _ADMISSION_QUEUE):
+            _ACTIVE_ROOMS[room_id] = game
+            return True
+        if room_id not in _ADMISSION_QUEUE:
+            _ADMISSION_QUEUE.append(room_id)
+        return False
+
+
+def _queue_position(room_id: str) -> Optional[int]:
+    with _ADMISSION_LOCK:
+        try:
+            return _ADMISSION_QUEUE.index(room_id) + 1
+        except ValueError:
+            return None
+
+
+def _release_run_slot(room_id: str, game: Any):
+    """Give back the slot held by `game` (ended / stopped) and start queued rooms that now fit."""
+    with _ADMISSION_LOCK:
+        if _ACTIVE_ROOMS.get(room_id) is game:
+            del _ACTIVE_ROOMS[room_id]
+    _admit_queued_rooms()
+
+
+def _admit_queued_rooms():
+    while True:
+        with _ADMISSION_LOCK:
+            if not _ADMISSION_QUEUE or len(_ACTIVE_ROOMS) >= MAX_ACTIVE_ROOMS:
+                return
+            room_id = _ADMISSION_QUEUE.popleft()
+        r = _get_room(room_id)
+        if not r:
+            continue
+        with r["lock"]:
+            if r["state"] != "queued":
+                continue
+            with _ADMISSION_LOCK:
+                _ACTIVE_ROOMS[room_id] = r.get("game")
+            r["state"] = "running"
+            _journal_room(r)
+        print(f"[DEBUG] admission: room {room_id} admitted from queue")
+        _ensure_auto_runner(room_id)
+
+
+def _discard_room_unsafe(room_id: str):
+    """Drop a room and its runner/stream bookkeeping and files (caller holds rooms_lock)."""
+    _drop_room_journal(room_id)
+    history = getattr(rooms[room_id].get("game"), "history", None)
+    if isinstance(history, HistoryLog):
+        history.remove_archive()
+    _stop_auto_runner(room_id)
+    _AUTO_THREADS.pop(room_id, None)
+    _AUTO_TASKS.pop(room_id, None)
+    _AUTO_STOP_FLAGS.pop(room_id, None)
+    stream = _ROOM_STREAMS.pop(room_id, None)
+    if stream is not None:
+        stream.close("room_removed")
+    with _ADMISSION_LOCK:
+        _ACTIVE_ROOMS.pop(room_id, None)
+        if room_id in _ADMISSION_QUEUE:
+            _ADMISSION_QUEUE.remove(room_id)
+    del rooms[room_id]
+
+
+# Room journal (off unless WEREWOLF_JOURNAL_DIR is set): room changes and every game event are appended to
+# <dir>/<room id>/journal.jsonl, each finished step writes a durable "step" record (game state + the history
+# events appended since the previous record), and every WEREWOLF_JOURNAL_SNAPSHOT_EVERY steps the full state
+# goes to snapshot.json and the journal starts over. recover_rooms() rebuilds `rooms` from it on startup;
+# a step that was still running when the process died is played again from its start.
+JOURNAL_DIR = os.getenv("WEREWOLF_JOURNAL_DIR", "").strip() or None
+if JOURNAL_DIR and JOURNAL_DIR.lower() in ("off", "none", "0"):
+    JOURNAL_DIR = None
+JOURNAL_SNAPSHOT_EVERY = max(1, int(os.getenv("WEREWOLF_JOURNAL_SNAPSHOT_EVERY", "10")))
+JOURNAL_FSYNC_INTERVAL = max(0.0, float(os.getenv("WEREWOLF_JOURNAL_FSYNC_INTERVAL", "1.0")))
+_ROOM_JOURNALS: Dict[str, Any] = {}
+_ROOM_JOURNALS_LOCK = threading.Lock()
+
+
+def _room_journal(room_id: str) -> Optional[Any]:
+    if not JOURNAL_DIR:
+        return None
+    with _ROOM_JOURNALS_LOCK:
+        journal = _ROOM_JOURNALS.get(room_id)
+        if journal is None:
+            try:
+                journal = _ROOM_JOURNALS[room_id] = room_journal.RoomJournal(JOURNAL_DIR, room_id, JOURNAL_FSYNC_INTERVAL)
+            except OSError as exc:
+                print(f"[ERROR] journal: cannot open journal for room {room_id}: {exc}")
+                return None
+    return journal
+
+
+def _drop_room_journal(room_id: str):
+    with _ROOM_JOURNALS_LOCK:
+        journal = _ROOM_JOURNALS.pop(room_id, None)
+    if journal is not None:
+        journal.remove()
+
+
+def _journal_append(journal: Any, record_type: str, durable: bool = False, **payload: Any):
+    # a full disk must not take the game down with it
+    try:
+        journal.append(record_type, durable=durable, **payload)
+    except (OSError, TypeError, ValueError) as exc:
+        print(f"[ERROR] journal: room {journal.room_id} {record_type} record not written: {exc}")
+
+
+def _room_meta(r: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: r.get(k) for k in ("id", "owner", "players", "max_players", "created_at", "last_step", "state")}
+
+
+def _journal_room(r: Dict[str, Any]):
+    """Room fields changed (create / join / leave / start / admission); caller holds r["lock"]."""
+    journal = _room_journal(r["id"])
+    if journal is not None:
+        _journal_append(journal, "room", durable=True, room=_room_meta(r))
+
+
+def _journal_snapshot(r: Dict[str, Any], game: Optional[Game]):
+    """Full room + game state; caller holds r["lock"]."""
+    journal = _room_journal(r["id"])
+    if journal is None:
+        return
+    state = {"room": _room_meta(r), "game": game.export_state() if game is not None else None}
+    try:
+        journal.write_snapshot(state)
+    except (OSError, TypeError, ValueError) as exc:
+        print(f"[ERROR] journal: room {r['id']} snapshot not written: {exc}")
+        return
+    r["journal_steps"] = 0
+    r["journal_history_total"] = game.history.total if game is not None else 0
+
+
+def _journal_step(r: Dict[str, Any], game: Game):
+    """After a step: durable delta record, or a fresh snapshot every JOURNAL_SNAPSHOT_EVERY steps / at the end."""
+    journal = _room_journal(r["id"])
+    if journal is None:
+        return
+    steps = r.get("journal_steps", 0) + 1
+    if steps >= JOURNAL_SNAPSHOT_EVERY or r["state"] == "ended":
+        _journal_snapshot(r, game)
+        return
+    since = r.get("journal_history_total", 0)
+    _journal_append(journal, "step", durable=True, room=_room_meta(r), game=game.export_state(history_since=since))
+    r["journal_steps"] = steps
+    r["journal_history_total"] = game.history.total
+
+
+def _replay_room_journal(journal: Any) -> Tuple[Optional[Dict[str, Any]], Optional[Game], int]:
+    """(room fields, rebuilt game, game events journaled after the last finished step) from snapshot + journal."""
+    snapshot, records = journal.load()
+    state = (snapshot or {}).get("state") or {}
+    room = state.get("room")
+    game_state = state.get("game")
+    events: List[Dict[str, Any]] = []
+    base = 0
+    if game_state:
+        base = game_state["history"]["since"]
+        events = list(game_state["history"]["events"])
+    pending_events = 0
+    for record in records:
+        if record.get("type") in ("room", "step"):
+            room = record.get("room") or room
+        if record.get("type") == "step":
+            game_state = record["game"]
+            history = game_state["history"]
+            if not events and not base:
+                base = history["since"]
+            del events[max(0, history["since"] - base):]
+            events.extend(history["events"])
+            pending_events = 0
+        elif record.get("type") == "event":
+            pending_events += 1
+    if not room:
+        return None, None, 0
+    game = None
+    if game_state and room.get("state") != "waiting":
+        cls = AsyncGame if game_state.get("engine") == "async" else Game
+        game = cls.from_state(game_state, events, base)
+    return room, game, pending_events
+
+
+def recover_rooms(directory: Optional[str] = None) -> List[str]:
+    """
+    Rebuild `rooms` from the room journals (after a restart) and resume the auto-runners of rooms that
+    were running or queued. Rooms already present are left alone. Returns the recovered room ids.
+    """
+    global JOURNAL_DIR
+    if directory:
+        JOURNAL_DIR = directory
+    if not JOURNAL_DIR:
+        return []
+    recovered: List[str] = []
+    for room_id in room_journal.room_ids(JOURNAL_DIR):
+        if _get_room(room_id):
+            continue
+        journal = _room_journal(room_id)
+        if journal is None:
+            continue
+        try:
+            meta, game, pending_events = _replay_room_journal(journal)
+        except (KeyError, TypeError, ValueError) as exc:
+            print(f"[ERROR] journal: room {room_id} not recoverable: {exc}")
+            continue
+        if not meta:
+            continue
+        r = dict(meta, id=room_id, game=game, lock=threading.RLock())
+        if game is not None:
+            game.event_sink = lambda event_type, data, rid=room_id: _publish_room_event(rid, event_type, data)
+        with rooms_lock:
+            rooms[room_id] = r
+        with r["lock"]:
+            # start the new journal generation from a snapshot of what was recovered
+            _journal_snapshot(r, game)
+        recovered.append(room_id)
+        print(f"[DEBUG] journal: recovered room {room_id} state={r['state']} day={getattr(game, 'day', None)} "
+              f"(replaying the interrupted step, {pending_events} events)")
+    # queued rooms keep their order (created_at) when they line up for a run slot again
+    for room_id in sorted(recovered, key=lambda rid: rooms[rid].get("created_at", 0)):
+        r = rooms[room_id]
+        with r["lock"]:
+            if r["state"] not in ("running", "queued") or r.get("game") is None:
+                continue
+            admitted = _acquire_run_slot(room_id, r["game"])
+            r["state"] = "running" if admitted else "queued"
+        if admitted:
+            _ensure_auto_runner(room_id)
+    return recovered
+
+
+def _new_game(players: List[str], seed: Optional[int] = None) -> Game:
+    return AsyncGame(players, seed=seed) if ENGINE_MODE == "async" else Game(players, seed=seed)
+
+
+def _get_async_loop() -> asyncio.AbstractEventLoop:
+    global _ASYNC_LOOP
+    with _ASYNC_LOOP_LOCK:
+        if _ASYNC_LOOP is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="werewolf-async-engine", daemon=True).start()
+            _ASYNC_LOOP = loop
+    return _ASYNC_LOOP
 
 
 def _auto_runner_active(room_id: str) -> bool:
     thread = _AUTO_THREADS.get(room_id)
-    return bool(thread and thread.is_alive())
+    task = _AUTO_TASKS.get(room_id)
+    return bool(thread and thread.is_alive()) or bool(task and not task.done())
 
 
 def _stop_auto_runner(room_id: str):
@@ -990,30 +2160,72 @@ def _stop_auto_runner(room_id: str):
 
 
 def _auto_run_room(room_id: str, stop_flag: threading.Event):
-    while not stop_flag.is_set():
-        with rooms_lock:
-            r = rooms.get(room_id)
+    game: Optional[Game] = None
+    try:
+        while not stop_flag.is_set():
+            r = _get_room(room_id)
             if not r:
                 break
-            game: Optional[Game] = r.get("game")
-            state = r.get("state")
-        if not game or state != "running":
-            break
-        try:
-            game.step()
-            with rooms_lock:
-                r = rooms.get(room_id)
-                if r:
-                    r["last_step"] = time.time()
-                    if getattr(game, "state", None) == "ended":
-                        r["state"] = "ended"
-                        stop_flag.set()
-                        break
-        except Exception as exc:
-            print(f"[ERROR] auto_run_room room={room_id} exception: {exc}")
-            stop_flag.set()
-            break
-        stop_flag.wait(AUTO_STEP_DELAY)
+            with r["lock"]:
+                game = r.get("game")
+                state = r.get("state")
+            if not game or state != "running":
+                break
+            try:
+                game.step()
+                if _record_step(r, game):
+                    stop_flag.set()
+                    break
+            except Exception as exc:
+                print(f"[ERROR] auto_run_room room={room_id} exception: {exc}")
+                stop_flag.set()
+                break
+            stop_flag.wait(AUTO_STEP_DELAY)
+    finally:
+        if game is not None:
+            _release_run_slot(room_id, game)
+
+
+def _record_step(r: Dict[str, Any], game: Game) -> bool:
+    """Stamp the room after a step; returns True once the game has ended."""
+    with r["lock"]:
+        r["last_step"] = time.time()
+        ended = getattr(game, "state", None) == "ended"
+        if ended:
+            r["state"] = "ended"
+        _journal_step(r, game)
+    return ended
+
+
+async def _auto_run_room_async(room_id: str, stop_flag: threading.Event):
+    game: Optional[Game] = None
+    try:
+        while not stop_flag.is_set():
+            r = _get_room(room_id)
+            if not r:
+                break
+            with r["lock"]:
+                game = r.get("game")
+                state = r.get("state")
+            if not game or state != "running":
+                break
+            try:
+                if isinstance(game, AsyncGame):
+                    await game.astep()
+                else:
+                    await _run_blocking(game.step)
+                if _record_step(r, game):
+                    stop_flag.set()
+                    break
+            except Exception as exc:
+                print(f"[ERROR] auto_run_room_async room={room_id} exception: {exc}")
+                stop_flag.set()
+                break
+            await asyncio.sleep(AUTO_STEP_DELAY)
+    finally:
+        # admission may start other rooms' runners; keep that off the event loop thread
+        if game is not None:
+            await _run_blocking(_release_run_slot, room_id, game)
 
 
 def _ensure_auto_runner(room_id: str):
@@ -1021,6 +2233,9 @@ def _ensure_auto_runner(room_id: str):
         return
     stop_flag = threading.Event()
     _AUTO_STOP_FLAGS[room_id] = stop_flag
+    if ENGINE_MODE == "async":
+        _AUTO_TASKS[room_id] = asyncio.run_coroutine_threadsafe(_auto_run_room_async(room_id, stop_flag), _get_async_loop())
+        return
     thread = threading.Thread(target=_auto_run_room, args=(room_id, stop_flag), daemon=True)
     _AUTO_THREADS[room_id] = thread
     thread.start()
@@ -1032,7 +2247,10 @@ def create_room(owner: str, max_players: int = 6) -> str:
       - Only allow creation when no active (non-ended) room exists.
     Invoke-WebRequest -Uri "http://127.0.0.1:8080/rooms/<roomId>/state" -Method GET -UseBasicParsing | Select-Object -ExpandProperty Content    Invoke-WebRequest -Uri "http://127.0.0.1:8080/rooms/<roomId>/state" -Method GET -UseBasicParsing | Select-Object -ExpandProperty Content      - Clean up old 'ended' rooms to prevent accumulation.
     This keeps frontend logic simple: there is at most one room to show at any time.
+    With WEREWOLF_ROOM_MODE=multi every call creates a new room instead (see _create_room_multi).
     """
+    if ROOM_MODE == "multi":
+        return _create_room_multi(owner, max_players)
     with rooms_lock:
         # Clean up old ended rooms first (keep only most recent ended room for history)
         ended_rooms = [(rid, r) for rid, r in rooms.items() if r.get("state") == "ended"]
@@ -1041,18 +2259,16 @@ def create_room(owner: str, max_players: int = 6) -> str:
             ended_rooms.sort(key=lambda x: x[1].get("created_at", 0), reverse=True)
             for rid, _ in ended_rooms[1:]:
                 print(f"[DEBUG] create_room cleanup: deleting old ended room {rid}")
-                _stop_auto_runner(rid)
-                _AUTO_THREADS.pop(rid, None)
-                _AUTO_STOP_FLAGS.pop(rid, None)
-                del rooms[rid]
+                _discard_room_unsafe(rid)
         
         # If an active (non-ended) room exists, return it
         for rid, r in rooms.items():
             state = r.get("state")
             if state and state != "ended":
                 # Ensure owner is in players list (防止空列表导致房间被删除)
-                if owner not in r["players"]:
-                    r["players"].append(owner)
+                with r["lock"]:
+                    if owner not in r["players"]:
+                        r["players"].append(owner)
                 return rid
         
         # Otherwise create a fresh room (清理所有ended房间,只保留新房间)
@@ -1060,29 +2276,40 @@ def create_room(owner: str, max_players: int = 6) -> str:
         for rid in list(rooms.keys()):
             if rooms[rid].get("state") == "ended":
                 print(f"[DEBUG] create_room removing ended room during new create: {rid}")
-                _stop_auto_runner(rid)
-                _AUTO_THREADS.pop(rid, None)
-                _AUTO_STOP_FLAGS.pop(rid, None)
-                del rooms[rid]
+                _discard_room_unsafe(rid)
         
-        rid = str(uuid.uuid4())[:8]
-        rooms[rid] = {
-            "id": rid,
-            "owner": owner,
-            "players": [owner],
-            "max_players": max_players,
-            "game": None,
-            "created_at": time.time(),
-            "last_step": 0,
-            "state": "waiting",  # waiting, running, ended
-        }
-        return rid
+        return _add_room_unsafe(owner, max_players)
+
+def _add_room_unsafe(owner: str, max_players: int) -> str:
+    rid = str(uuid.uuid4())[:8]
+    rooms[rid] = {
+        "id": rid,
+        "owner": owner,
+        "players": [owner],
+        "max_players": max_players,
+        "game": None,
+        "created_at": time.time(),
+        "last_step": 0,
+        "state": "waiting",  # waiting, queued, running, ended
+        # guards this room's fields; see the lock order note above _get_room
+        "lock": threading.RLock(),
+    }
+    _journal_room(rooms[rid])
+    return rid
 
-def join_room(room_id: str, player: str) -> Optional[str]:
+def _create_room_multi(owner: str, max_players: int) -> str:
+    """Multi-room mode: always a fresh room; only the oldest ended rooms beyond the retention are dropped."""
     with rooms_lock:
-        r = rooms.get(room_id)
-        if not r:
-            return "room_not_found"
+        ended = sorted((r.get("created_at", 0), rid) for rid, r in rooms.items() if r.get("state") == "ended")
+        for _, rid in ended[: max(0, len(ended) - ENDED_ROOM_RETENTION)]:
+            _discard_room_unsafe(rid)
+        return _add_room_unsafe(owner, max_players)
+
+def join_room(room_id: str, player: str) -> Optional[str]:
+    r = _get_room(room_id)
+    if not r:
+        return "room_not_found"
+    with r["lock"]:
         if r["state"] != "waiting":
             return "room_not_joinable"
         if player in r["players"]:
@@ -1090,6 +2317,7 @@ def join_room(room_id: str, player: str) -> Optional[str]:
         if len(r["players"]) >= r["max_players"]:
             return "room_full"
         r["players"].append(player)
+        _journal_room(r)
         return None
 
 def leave_room(room_id: str, player: str) -> Optional[str]:
@@ -1097,24 +2325,28 @@ def leave_room(room_id: str, player: str) -> Optional[str]:
         r = rooms.get(room_id)
         if not r:
             return "room_not_found"
-        if player in r["players"]:
-            r["players"].remove(player)
-            if r["owner"] == player and r["players"]:
-                r["owner"] = r["players"][0]
-            # 改进: 不立即删除空房间,而是标记为可清理状态
-            # 这样前端切换标签时不会突然看不到房间
-            if not r["players"] and r["state"] == "waiting":
-                # 只在waiting状态且无玩家时才删除,running/ended状态保留以便查看
-                print(f"[DEBUG] leave_room: deleting empty waiting room {room_id} because last player left")
-                del rooms[room_id]
-            return None
-        return "not_in_room"
+        with r["lock"]:
+            if player in r["players"]:
+                r["players"].remove(player)
+                if r["owner"] == player and r["players"]:
+                    r["owner"] = r["players"][0]
+                # 改进: 不立即删除空房间,而是标记为可清理状态
+                # 这样前端切换标签时不会突然看不到房间
+                if not r["players"] and r["state"] == "waiting":
+                    # 只在waiting状态且无玩家时才删除,running/ended状态保留以便查看
+                    print(f"[DEBUG] leave_room: deleting empty waiting room {room_id} because last player left")
+                    _discard_room_unsafe(room_id)
+                else:
+                    _journal_room(r)
+                return None
+            return "not_in_room"
 
-def start_room_game(room_id: str) -> Optional[str]:
-    with rooms_lock:
-        r = rooms.get(room_id)
-        if not r:
-            return "room_not_found"
+def start_room_game(room_id: str, seed: Optional[int] = None) -> Optional[str]:
+    """seed: the game's RNG seed (else config.json's "seed", else random); logged so the run can be repeated."""
+    r = _get_room(room_id)
+    if not r:
+        return "room_not_found"
+    with r["lock"]:
         if r["state"] != "waiting":
             return "already_started"
         
@@ -1132,7 +2364,11 @@ def start_room_game(room_id: str) -> Optional[str]:
             players = [f"AI_{i}" for i in range(1, 7)]
         
         # 创建游戏实例
-        g = Game(players)
+        if seed is None and isinstance(cfg, dict) and isinstance(cfg.get("seed"), int):
+            seed = cfg["seed"]
+        g = _new_game(players, seed=seed)
+        print(f"[DEBUG] start_room_game: room {room_id} seed={g.seed}")
+        g.event_sink = lambda event_type, data, rid=room_id: _publish_room_event(rid, event_type, data)
         
         # 应用角色偏好配置
         if cfg and isinstance(cfg, dict):
@@ -1143,43 +2379,114 @@ def start_room_game(room_id: str) -> Optional[str]:
         
         _stop_auto_runner(room_id)
         _AUTO_THREADS.pop(room_id, None)
+        _AUTO_TASKS.pop(room_id, None)
         _AUTO_STOP_FLAGS.pop(room_id, None)
 
         r["game"] = g
         r["players"] = players  # 更新房间玩家列表为游戏玩家
-        r["state"] = "running"
+        # 多房间模式下超过并发上限时进入排队，空出名额后自动开始
+        admitted = _acquire_run_slot(room_id, g)
+        r["state"] = "running" if admitted else "queued"
+        _journal_snapshot(r, g)
+    if admitted:
         _ensure_auto_runner(room_id)
-        return None
+    return None
 
-def _get_room_state_unsafe(room_id: str) -> Optional[Dict[str, Any]]:
-    """Internal helper: get room state WITHOUT acquiring lock (caller must hold lock)"""
+def _room_snapshot_unsafe(room_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Copy the small mutable room fields (caller must hold rooms_lock for the table lookup; the
+    fields are read under the room's own lock). Everything expensive (to_dict / JSON) is done
+    from this copy after the locks are released.
+    """
     r = rooms.get(room_id)
     if not r:
         return None
-    g = r.get("game")
+    with r["lock"]:
+        snapshot = {
+            "id": r["id"],
+            "owner": r["owner"],
+            "players": list(r["players"]),
+            "max_players": r["max_players"],
+            "created_at": r["created_at"],
+            "state": r.get("state", "waiting"),
+            "game": r.get("game"),
+        }
+    if snapshot["state"] == "queued":
+        snapshot["queue_position"] = _queue_position(room_id)
+    return snapshot
+
+def _room_envelope(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    g = snapshot["game"]
     # If the game object exists and has reached ended state, reflect that in the room state
-    room_state = r.get("state", "waiting")
+    room_state = snapshot["state"]
     if g and getattr(g, "state", None) == "ended":
         room_state = "ended"
-    return {
-        "id": r["id"],
-        "owner": r["owner"],
-        "players": list(r["players"]),
-        "max_players": r["max_players"],
-        "created_at": r["created_at"],
-        "state": room_state,
-        "game": g.to_dict() if g else None,
-    }
+    envelope = {k: v for k, v in snapshot.items() if k != "game"}
+    envelope["state"] = room_state
+    # resume point for GET /rooms/<id>/stream?since=<event_seq>
+    stream = _ROOM_STREAMS.get(snapshot["id"])
+    envelope["event_seq"] = stream.last_seq if stream is not None else 0
+    return envelope
+
+def _room_state_from_snapshot(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    g = snapshot["game"]
+    state = _room_envelope(snapshot)
+    state["game"] = g.to_dict() if g else None
+    return state
+
+def _room_state_json(snapshot: Dict[str, Any], history_format: str = "normalized") -> Tuple[str, str]:
+    """
+    Same content as _room_state_from_snapshot, serialized: returns (etag, json_text).
+    The game part comes from Game.to_json(), so an unchanged game is never re-serialized;
+    the small room envelope is dumped each time and folded into the ETag.
+    """
+    g = snapshot["game"]
+    head = json.dumps(_room_envelope(snapshot), ensure_ascii=False, default=str)
+    game_version, game_json = g.to_json(history_format) if g else (0, "null")
+    etag = f"{game_version}-{zlib.crc32(head.encode('utf-8')):08x}"
+    if history_format == "legacy":
+        etag += "-legacy"
+    return etag, f'{head[:-1]}, "game": {game_json}}}'
+
+def _get_room_state_unsafe(room_id: str) -> Optional[Dict[str, Any]]:
+    """Internal helper: get room state WITHOUT acquiring lock (caller must hold lock)"""
+    snapshot = _room_snapshot_unsafe(room_id)
+    return _room_state_from_snapshot(snapshot) if snapshot else None
 
 def get_room_state(room_id: str) -> Optional[Dict[str, Any]]:
-    """Public API: get room state WITH lock"""
+    """Public API: get room state; only the field copy happens under rooms_lock."""
     with rooms_lock:
-        return _get_room_state_unsafe(room_id)
+        snapshot = _room_snapshot_unsafe(room_id)
+    return _room_state_from_snapshot(snapshot) if snapshot else None
+
+def _json_response(body: str, etag: str):
+    resp = Response(body, mimetype="application/json")
+    resp.set_etag(etag)
+    # browsers keep the body but revalidate every poll, so unchanged state costs a 304
+    resp.headers["Cache-Control"] = "no-cache"
+    # answers If-None-Match with an empty 304
+    return resp.make_conditional(request)
 
 @app.route("/health")
 def health():
     return jsonify({"status": "ok"})
 
+@app.route("/metrics")
+def metrics_handler():
+    """Call accounting in Prometheus text format; ?format=json returns a snapshot with p50/p95/p99."""
+    if request.args.get("format") == "json":
+        return jsonify(metrics.REGISTRY.snapshot())
+    return Response(metrics.REGISTRY.render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.route("/audit/<raw_id>")
+def audit_handler(raw_id: str):
+    """Full provider response behind a decision's meta.raw_id (bounded store, see audit.py)."""
+    store = getattr(ai_client, "AUDIT_STORE", None)
+    record = store.get(raw_id) if store is not None else None
+    if record is None:
+        return jsonify({"error": "not_found"}), 404
+    return jsonify(record)
+
 # Small helpers for reading/writing JSON config files in project root / game folder
 def _read_json_file(path: str):
     try:
@@ -1205,27 +2512,73 @@ def _write_json_file(path: str, data) -> bool:
 API_KEYS_PATH = os.path.join(PROJECT_ROOT, "api_keys.json")
 PLAYERS_CONFIG_PATH = os.path.join(PROJECT_ROOT, "games", "werewolf", "config.json")
 
+def _read_config_cached(path: str):
+    """Read a config file through ai_client's shared mtime-validated cache (plain read for the stub client)."""
+    reader = getattr(ai_client, "read_json_cached", None)
+    if reader is None:
+        return _read_json_file(path)
+    return reader(path)
+
+
+def _invalidate_config_cache(path: Optional[str] = None):
+    invalidate = getattr(ai_client, "invalidate_config_cache", None)
+    if invalidate is not None:
+        invalidate(path)
+    _CREDENTIALS_TABLE["api_cfg"] = _CREDENTIALS_TABLE["players_cfg"] = None
+    _CREDENTIALS_TABLE["bundles"] = {}
+
+
+# player -> credential bundle, precomputed for the currently cached api_keys.json / config.json objects
+_CREDENTIALS_TABLE: Dict[str, Any] = {"api_cfg": None, "players_cfg": None, "bundles": {}}
+_EMPTY_CONFIG: Dict[str, Any] = {}
+
+
+def _credentials_table() -> Dict[str, Any]:
+    global _CREDENTIALS_TABLE
+    api_cfg = _read_config_cached(API_KEYS_PATH) or _EMPTY_CONFIG
+    players_cfg = _read_config_cached(PLAYERS_CONFIG_PATH) or _EMPTY_CONFIG
+    table = _CREDENTIALS_TABLE
+    if table["api_cfg"] is api_cfg and table["players_cfg"] is players_cfg:
+        return table
+
+    providers: Dict[str, Dict[str, Any]] = {}
+    legacy_key: Optional[str] = None
+    if isinstance(api_cfg, dict):
+        raw_providers = api_cfg.get("providers")
+        if isinstance(raw_providers, dict):
+            providers = {k: v for k, v in raw_providers.items() if isinstance(v, dict)}
+        if not providers:
+            providers = {k: v for k, v in api_cfg.items() if isinstance(v, dict) and (
+                "api_key" in v or "key" in v or "secret" in v
+            )}
+        for k in ("OPENAI_API_KEY", "openai", "api_key", "apiKey"):
+            val = api_cfg.get(k)
+            if isinstance(val, str) and val:
+                legacy_key = val
+                break
+    player_map = players_cfg.get("player_map", {}) if isinstance(players_cfg, dict) else {}
+    table = {
+        "api_cfg": api_cfg,
+        "players_cfg": players_cfg,
+        "providers": providers,
+        "player_map": player_map if isinstance(player_map, dict) else {},
+        "legacy_key": legacy_key,
+        "bundles": {},
+    }
+    _CREDENTIALS_TABLE = table
+    return table
+
+
 def resolve_player_credentials(player: str) -> Dict[str, Any]:
     """Return a structured credential bundle for the given player."""
-    providers: Dict[str, Dict[str, Any]] = {}
-    provider_name: Optional[str] = None
-    provider_entry: Optional[Dict[str, Any]] = None
-    api_key_value: Optional[str] = None
+    table = _credentials_table()
+    bundle = table["bundles"].get(player)
+    if bundle is None:
+        providers: Dict[str, Dict[str, Any]] = table["providers"]
+        provider_name: Optional[str] = table["player_map"].get(player)
+        provider_entry: Optional[Dict[str, Any]] = None
+        api_key_value: Optional[str] = None
 
-    try:
-        api_cfg = _read_json_file(API_KEYS_PATH) or {}
-        if isinstance(api_cfg, dict):
-            raw_providers = api_cfg.get("providers")
-            if isinstance(raw_providers, dict):
-                providers = {k: v for k, v in raw_providers.items() if isinstance(v, dict)}
-            if not providers:
-                providers = {k: v for k, v in api_cfg.items() if isinstance(v, dict) and (
-                    "api_key" in v or "key" in v or "secret" in v
-                )}
-        players_cfg = _read_json_file(PLAYERS_CONFIG_PATH) or {}
-        player_map = players_cfg.get("player_map", {}) if isinstance(players_cfg, dict) else {}
-
-        provider_name = player_map.get(player)
         if provider_name and providers.get(provider_name):
             provider_entry = providers.get(provider_name)
         elif providers:
@@ -1233,30 +2586,19 @@ def resolve_player_credentials(player: str) -> Dict[str, Any]:
 
         if provider_entry:
             api_key_value = provider_entry.get("api_key") or provider_entry.get("key") or provider_entry.get("secret")
-    except Exception:
-        providers = {}
+        if not api_key_value:
+            api_key_value = table["legacy_key"]
+        if not api_key_value:
+            api_key_value = API_KEY or None
 
-    if not api_key_value:
-        try:
-            api_cfg = _read_json_file(API_KEYS_PATH) or {}
-            if isinstance(api_cfg, dict):
-                for k in ("OPENAI_API_KEY", "openai", "api_key", "apiKey"):
-                    val = api_cfg.get(k)
-                    if isinstance(val, str) and val:
-                        api_key_value = val
-                        break
-        except Exception:
-            pass
-
-    if not api_key_value:
-        api_key_value = API_KEY or None
-
-    return {
-        "api_key": api_key_value,
-        "provider": provider_name,
-        "provider_config": provider_entry,
-        "providers": providers,
-    }
+        bundle = {
+            "api_key": api_key_value,
+            "provider": provider_name,
+            "provider_config": provider_entry,
+            "providers": providers,
+        }
+        table["bundles"][player] = bundle
+    return dict(bundle)
 
 # Resolve per-player API key using /config/api_keys providers and /config/players.player_map
 def get_api_key_for_player(player: str) -> Optional[str]:
@@ -1282,6 +2624,7 @@ def api_keys_config():
     if body is None:
         return jsonify({"error": "invalid_json"}), 400
     ok = _write_json_file(API_KEYS_PATH, body)
+    _invalidate_config_cache(API_KEYS_PATH)
     if not ok:
         return jsonify({"error": "write_failed"}), 500
     return jsonify({"status": "ok"})
@@ -1312,18 +2655,32 @@ def api_keys_test():
     # Try a simple HTTP HEAD/GET to the model_url to check reachability
     reachable = None
     if model_url:
+        import urllib.error
+        import urllib.request
         try:
-            import urllib.request
             req = urllib.request.Request(model_url, method="GET")
             # don't hang long
             with urllib.request.urlopen(req, timeout=5) as resp:
                 reachable = True
+        except urllib.error.HTTPError:
+            # chat endpoints answer GET with 404/405: the server is up
+            reachable = True
         except Exception as e:
             reachable = False
     else:
         reachable = None
 
-    return jsonify({"ok": True, "provider": provider_name, "has_key": has_key, "model_url": model_url, "reachable": reachable})
+    # the probe result also feeds the provider's circuit breaker (an open circuit goes half-open when reachable)
+    provider_health = ai_client.report_probe(provider_name, reachable) if hasattr(ai_client, "report_probe") else None
+    return jsonify({"ok": True, "provider": provider_name, "has_key": has_key, "model_url": model_url, "reachable": reachable,
+                    "health": provider_health})
+
+
+@app.route("/providers/health", methods=["GET"])
+def providers_health():
+    """Circuit breaker state and rolling health score per provider (see health.py)."""
+    registry = getattr(ai_client, "PROVIDER_HEALTH", None)
+    return jsonify({"providers": registry.snapshot() if registry is not None else {}})
 
 @app.route("/config/players", methods=["GET", "POST"])
 def players_config():
@@ -1340,6 +2697,7 @@ def players_config():
     if not isinstance(body, dict) or "players" not in body or not isinstance(body.get("players"), list):
         return jsonify({"error": "invalid_schema"}), 400
     ok = _write_json_file(PLAYERS_CONFIG_PATH, body)
+    _invalidate_config_cache(PLAYERS_CONFIG_PATH)
     if not ok:
         return jsonify({"error": "write_failed"}), 500
     return jsonify({"status": "ok"})
@@ -1347,11 +2705,13 @@ def players_config():
 @app.route("/rooms", methods=["GET", "POST"])
 def rooms_handler():
     if request.method == "GET":
+        # 持锁期间只复制房间字段，序列化与日志都在释放锁之后进行，避免阻塞 join/start 与自动推进线程
         with rooms_lock:
-            # 使用不加锁的内部版本,因为我们已经持有锁
-            room_list = [_get_room_state_unsafe(rid) for rid in rooms.keys()]
-            print(f"[DEBUG] GET /rooms -> 返回 {len(room_list)} 个房间: {[r['id'] for r in room_list if r]}")
-            return jsonify({"rooms": room_list})
+            snapshots = [_room_snapshot_unsafe(rid) for rid in list(rooms.keys())]
+        room_list = [_room_state_json(snap) for snap in snapshots if snap]
+        print(f"[DEBUG] GET /rooms -> 返回 {len(room_list)} 个房间: {[snap['id'] for snap in snapshots if snap]}")
+        etag = f"{zlib.crc32('|'.join(tag for tag, _ in room_list).encode('utf-8')):08x}-{len(room_list)}"
+        return _json_response('{"rooms": [' + ", ".join(body for _, body in room_list) + "]}", etag)
     body = request.json or {}
     owner = body.get("owner", "AI_owner")
     max_players = int(body.get("max_players", 6))
@@ -1385,52 +2745,167 @@ def leave_handler(room_id: str):
 
 @app.route("/rooms/<room_id>/start", methods=["POST"])
 def start_handler(room_id: str):
-    err = start_room_game(room_id)
+    body = request.get_json(silent=True) or {}
+    seed = body.get("seed") if isinstance(body, dict) else None
+    if seed is not None and (isinstance(seed, bool) or not isinstance(seed, int)):
+        return jsonify({"error": "invalid_seed"}), 400
+    err = start_room_game(room_id, seed=seed)
     if err:
         return jsonify({"error": err}), 400
     # If players config exists, apply role_preferences to newly created game
-    with rooms_lock:
-        r = rooms.get(room_id)
-        if r and r.get("game") and os.path.exists(PLAYERS_CONFIG_PATH):
-            cfg = _read_json_file(PLAYERS_CONFIG_PATH) or {}
-            prefs = cfg.get("role_preferences", {}) if isinstance(cfg, dict) else {}
-            g: Optional[Game] = r.get("game")
-            if g:
-                # apply preferences: for any player with a preferred role, sync role assignment across structures
-                for p, pref in prefs.items():
-                    if p in g.players and pref in ROLES:
-                        g.set_player_role(p, pref)
-    return jsonify({"status": "started", "room": get_room_state(room_id)})
+    r = _get_room(room_id)
+    status = "started"
+    if r:
+        with r["lock"]:
+            if r.get("state") == "queued":
+                status = "queued"
+            if r.get("game") and os.path.exists(PLAYERS_CONFIG_PATH):
+                cfg = _read_json_file(PLAYERS_CONFIG_PATH) or {}
+                prefs = cfg.get("role_preferences", {}) if isinstance(cfg, dict) else {}
+                g: Optional[Game] = r.get("game")
+                if g:
+                    # apply preferences: for any player with a preferred role, sync role assignment across structures
+                    for p, pref in prefs.items():
+                        if p in g.players and pref in ROLES:
+                            g.set_player_role(p, pref)
+    return jsonify({"status": status, "room": get_room_state(room_id)})
 
 @app.route("/rooms/<room_id>/state", methods=["GET"])
 def room_state_handler(room_id: str):
-    st = get_room_state(room_id)
-    if not st:
+    with rooms_lock:
+        snapshot = _room_snapshot_unsafe(room_id)
+    if not snapshot:
         return jsonify({"error": "room_not_found"}), 404
-    return jsonify(st)
+    # ?history=legacy: pre-normalization history events (talks + speeches, werewolf.actions ...) for old clients
+    history_format = request.args.get("history", "normalized")
+    if history_format not in HISTORY_FORMATS:
+        return jsonify({"error": "invalid_history_format"}), 400
+    etag, body = _room_state_json(snapshot, history_format)
+    return _json_response(body, etag)
+
+@app.route("/rooms/<room_id>/history", methods=["GET"])
+def room_history_handler(room_id: str):
+    """
+    Page through a room's full event history, including events already spilled from memory to disk:
+    ?offset=<absolute index>&limit=<n, max 500>&history=normalized|legacy.
+    """
+    with rooms_lock:
+        snapshot = _room_snapshot_unsafe(room_id)
+    if not snapshot:
+        return jsonify({"error": "room_not_found"}), 404
+    g = snapshot["game"]
+    history_format = request.args.get("history", "normalized")
+    if history_format not in HISTORY_FORMATS:
+        return jsonify({"error": "invalid_history_format"}), 400
+    try:
+        offset = max(0, int(request.args.get("offset", 0)))
+        limit = min(500, max(0, int(request.args.get("limit", 50))))
+    except ValueError:
+        return jsonify({"error": "invalid_paging"}), 400
+    log = getattr(g, "history", None)
+    if not isinstance(log, HistoryLog):
+        return jsonify({"room_id": room_id, "total": 0, "archived": 0, "offset": offset, "limit": limit, "events": []})
+    events = log.page(offset, limit)
+    if history_format == "legacy":
+        events = legacy_history(events)
+    return jsonify({
+        "room_id": room_id,
+        "total": log.total,
+        "archived": log.archived,
+        "offset": offset,
+        "limit": limit,
+        "events": events,
+    })
+
+@app.route("/rooms/<room_id>/stream", methods=["GET"])
+def room_stream_handler(room_id: str):
+    """
+    Server-Sent Events with incremental game deltas: phase, speech, vote, vote_result, death,
+    night_result, plus live speech_token chunks; a final `end` event closes the stream once the room
+    is discarded. Durable events carry `id: <seq>`; reconnecting with Last-Event-ID (or ?since=<seq>)
+    replays what was missed, otherwise a `resync` event tells the client to refetch /rooms/<id>/state.
+    """
+    with rooms_lock:
+        if room_id not in rooms:
+            return jsonify({"error": "room_not_found"}), 404
+    since_raw = request.args.get("since") or request.headers.get("Last-Event-ID")
+    try:
+        since = int(since_raw) if since_raw not in (None, "") else None
+    except ValueError:
+        return jsonify({"error": "invalid_since"}), 400
+    stream = _room_stream(room_id)
+    q, replay, resync = stream.subscribe(since)
+
+    def generate():
+        try:
+            yield ": connected\n\n"
+            if resync:
+                yield _sse_format("resync", {"seq": stream.last_seq})
+            last = since
+            for item in replay:
+                last = item["seq"]
+                yield _sse_format(item["type"], item["data"], item["seq"])
+            while True:
+                try:
+                    item = q.get(timeout=SSE_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    if room_id not in rooms or _ROOM_STREAMS.get(room_id) is not stream:
+                        # the room was discarded (and its stream replaced or dropped) while we waited
+                        yield _sse_format("end", {"reason": "room_removed"})
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                if item["type"] == "end":
+                    yield _sse_format("end", item["data"])
+                    return
+                seq = item.get("seq")
+                if seq is not None:
+                    if last is not None and seq > last + 1:
+                        # our queue overflowed and dropped events
+                        yield _sse_format("resync", {"seq": seq - 1})
+                    last = seq
+                yield _sse_format(item["type"], item["data"], seq)
+        finally:
+            stream.unsubscribe(q)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return Response(generate(), mimetype="text/event-stream", headers=headers)
 
 @app.route("/rooms/<room_id>/step", methods=["POST"])
 def room_step_handler(room_id: str):
     now = time.time()
-    with rooms_lock:
-        r = rooms.get(room_id)
-        if not r:
-            return jsonify({"error": "room_not_found"}), 404
+    r = _get_room(room_id)
+    if not r:
+        return jsonify({"error": "room_not_found"}), 404
+    with r["lock"]:
         # debounce quick repeated step calls
         last = r.get("last_step", 0)
         if now - last < 0.7:
             return jsonify({"status": "throttled", "message": "step called too quickly"}), 429
         r["last_step"] = now
         g: Optional[Game] = r.get("game")
+        queued = r.get("state") == "queued"
     if not g:
         return jsonify({"error": "game_not_started"}), 400
+    if queued:
+        return jsonify({"status": "queued", "message": "waiting for a free game slot", "queue_position": _queue_position(room_id)}), 409
     if _auto_runner_active(room_id):
         return jsonify({"status": "auto", "message": "game is auto-running"}), 409
     g.step()
-    with rooms_lock:
-        if g.state == "ended":
-            r["state"] = "ended"
+    if _record_step(r, g):
+        _release_run_slot(room_id, g)
     return jsonify({"status": "ok", "room": get_room_state(room_id)})
 
+def recover_rooms_at_startup(use_reloader: bool) -> List[str]:
+    """
+    Startup hook for the serving process. With the reloader on, the first process only watches files and
+    spawns the server as a child (WERKZEUG_RUN_MAIN=true); that parent must not resume runners of its own.
+    """
+    if use_reloader and os.environ.get("WERKZEUG_RUN_MAIN") != "true":
+        return []
+    return recover_rooms()
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=8080, debug=True)
\ No newline at end of file
+    use_reloader = os.getenv("WEREWOLF_RELOADER", "1").strip().lower() not in ("0", "false", "no", "off")
+    recover_rooms_at_startup(use_reloader)
+    app.run(host="0.0.0.0", port=8080, debug=True, use_reloader=use_reloader)
\ No newline at end of file
@@ -0,0 +1,119 @@
+"""
+原始 provider 响应的审计存储。
+
+decide_* 不再把完整的 chat.completion JSON 放进 meta（它会被复制进 current_talks、history、
+to_dict 快照和后续 prompt），而是存到这里，meta 只保留 "raw_id"。
+
+- 内存中最多保留 max_entries 条（最旧的先淘汰）
+- 设置了 directory 时每条记录同时追加到 <directory>/raw_responses.jsonl，按 id 记住偏移量，
+  被挤出内存的记录仍可从磁盘读回；偏移量索引最多 max_index_entries 条（最旧的先淘汰，之后按 id 查不到）
+- 文件句柄常驻（O_APPEND），序列化和写盘都不持有保护内存索引的锁，get 不会被写盘拖住
+- GET /audit/<raw_id>（app.py）按 id 查询
+
+环境变量：WEREWOLF_AUDIT_DIR（默认不落盘）、WEREWOLF_AUDIT_MAX_ENTRIES（默认 500）、
+WEREWOLF_AUDIT_MAX_INDEX_ENTRIES（默认 100000）。
+"""
+import itertools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+AUDIT_FILENAME = "raw_responses.jsonl"
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+class AuditStore:
+    def __init__(self, max_entries: int = 500, directory: Optional[str] = None, max_index_entries: int = 100000):
+        self.max_entries = max(0, int(max_entries))
+        self.max_index_entries = max(1, int(max_index_entries))
+        self.directory = directory
+        self.path = os.path.join(directory, AUDIT_FILENAME) if directory else None
+        self._lock = threading.Lock()
+        # serializes appends only; never taken together with _lock
+        self._write_lock = threading.Lock()
+        self._fd: Optional[int] = None
+        self._records: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._offsets: "OrderedDict[str, int]" = OrderedDict()
+        self._ids = itertools.count(1)
+        self._prefix = f"{os.getpid():x}{int(time.time()) & 0xffffff:06x}"
+        self.stats = {"stored": 0, "evicted": 0, "disk_reads": 0, "index_evicted": 0}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> "AuditStore":
+        return cls(max_entries=_env_int("WEREWOLF_AUDIT_MAX_ENTRIES", 500), directory=os.getenv("WEREWOLF_AUDIT_DIR") or None,
+                   max_index_entries=_env_int("WEREWOLF_AUDIT_MAX_INDEX_ENTRIES", 100000))
+
+    def _append(self, data: bytes) -> int:
+        """Append one line to the audit file and return the byte offset it starts at."""
+        with self._write_lock:
+            if self._fd is None:
+                self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+            view = memoryview(data)
+            while view:
+                view = view[os.write(self._fd, view):]
+            # O_APPEND: the position after the write is the end of this line, even if another process appends too
+            return os.lseek(self._fd, 0, os.SEEK_CUR) - len(data)
+
+    def put(self, raw: Any, **info: Any) -> Optional[str]:
+        """Store one raw response (plus player / kind / provider / model ...) and return its id."""
+        if raw is None or (not self.max_entries and not self.path):
+            return None
+        raw_id = f"raw-{self._prefix}-{next(self._ids)}"
+        record = {"id": raw_id, "ts": time.time(), **info, "raw": raw}
+        offset = None
+        if self.path:
+            try:
+                offset = self._append((json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8"))
+            except (OSError, TypeError, ValueError):
+                pass
+        with self._lock:
+            if offset is not None:
+                self._offsets[raw_id] = offset
+                while len(self._offsets) > self.max_index_entries:
+                    self._offsets.popitem(last=False)
+                    self.stats["index_evicted"] += 1
+            if self.max_entries:
+                self._records[raw_id] = record
+                while len(self._records) > self.max_entries:
+                    self._records.popitem(last=False)
+                    self.stats["evicted"] += 1
+            self.stats["stored"] += 1
+        return raw_id
+
+    def get(self, raw_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            record = self._records.get(raw_id)
+            offset = self._offsets.get(raw_id)
+        if record is not None or offset is None:
+            return record
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                record = json.loads(f.readline().decode("utf-8"))
+        except (OSError, ValueError):
+            return None
+        self.stats["disk_reads"] += 1
+        return record
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+            self._offsets.clear()
+
+    def close(self):
+        with self._write_lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
@@ -0,0 +1,170 @@
+"""
+按 provider 的熔断器与健康评分（ai_client 每次请求前询问、请求后上报）。
+
+- 熔断：连续 failure_threshold 次失败（超时 / 连接错误 / 5xx / 401 等，不含 429 和本地限流）后进入 open，
+  open 期间的调用立即失败，不再白等 timeout；open_seconds 后进入 half_open，只放一个探测请求，
+  成功则 closed，失败则重新 open 且冷却时间翻倍（上限 max_open_seconds）
+- 健康分：成功率与延迟的指数滑动平均，score = success / (1 + latency / latency_ref)，
+  用于在 api_keys.json 中标为 "compatible" 的备选 provider 里挑一个做故障转移
+- /config/api_keys/test 的可达性探测也会上报：可达时让 open 的熔断器提前进入 half_open，不可达记一次失败
+"""
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, open_seconds: float = 30.0, max_open_seconds: float = 300.0):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.open_seconds = max(0.0, float(open_seconds))
+        self.max_open_seconds = max(self.open_seconds, float(max_open_seconds))
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.cooldown = self.open_seconds
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _refresh_locked(self, now: float):
+        if self.state == OPEN and now - self.opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+            self._probing = False
+
+    def current_state(self) -> str:
+        with self._lock:
+            self._refresh_locked(time.monotonic())
+            return self.state
+
+    def available(self) -> bool:
+        """Would a call be let through right now (without claiming the half-open probe)?"""
+        with self._lock:
+            self._refresh_locked(time.monotonic())
+            return self.state == CLOSED or (self.state == HALF_OPEN and not self._probing)
+
+    def allow(self) -> bool:
+        """Claim permission for one request; in half_open only a single probe is in flight at a time."""
+        with self._lock:
+            self._refresh_locked(time.monotonic())
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record(self, ok: bool) -> Optional[str]:
+        """Report a request's result; returns the new state when it changed."""
+        with self._lock:
+            before = self.state
+            if ok:
+                self.failures = 0
+                self.state = CLOSED
+                self.cooldown = self.open_seconds
+            else:
+                self.failures += 1
+                if self.state == HALF_OPEN:
+                    # the probe failed: stay away twice as long
+                    self.cooldown = min(self.max_open_seconds, max(self.cooldown, 0.001) * 2)
+                    self._open_locked()
+                elif self.state == CLOSED and self.failures >= self.failure_threshold:
+                    self._open_locked()
+            self._probing = False
+            return self.state if self.state != before else None
+
+    def cancel(self):
+        """The claimed request ended without a verdict on the provider (e.g. 429): free the half-open probe."""
+        with self._lock:
+            self._probing = False
+
+    def _open_locked(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+
+    def probe_reachable(self) -> Optional[str]:
+        """An out-of-band reachability check succeeded: skip the rest of the open cooldown."""
+        with self._lock:
+            if self.state == OPEN:
+                self.state = HALF_OPEN
+                self._probing = False
+                return self.state
+            return None
+
+
+class ProviderHealth:
+    def __init__(self, name: str, breaker: CircuitBreaker, alpha: float = 0.2, latency_ref: float = 5.0):
+        self.name = name
+        self.breaker = breaker
+        self.alpha = alpha
+        self.latency_ref = latency_ref
+        self.success = 1.0
+        self.latency: Optional[float] = None
+        self.stats = {"ok": 0, "failed": 0, "rejected": 0}
+        self._lock = threading.Lock()
+
+    def observe(self, ok: bool, latency: Optional[float] = None) -> Optional[str]:
+        with self._lock:
+            self.success += self.alpha * ((1.0 if ok else 0.0) - self.success)
+            if ok and latency is not None:
+                self.latency = latency if self.latency is None else self.latency + self.alpha * (latency - self.latency)
+            self.stats["ok" if ok else "failed"] += 1
+        return self.breaker.record(ok)
+
+    @property
+    def score(self) -> float:
+        latency = self.latency if self.latency is not None else self.latency_ref
+        return self.success / (1.0 + latency / self.latency_ref)
+
+    def snapshot(self) -> Dict[str, Any]:
+        breaker = self.breaker
+        return {
+            "state": breaker.current_state(),
+            "consecutive_failures": breaker.failures,
+            "cooldown": round(breaker.cooldown, 3),
+            "success": round(self.success, 3),
+            "latency": None if self.latency is None else round(self.latency, 3),
+            "score": round(self.score, 3),
+            **self.stats,
+        }
+
+
+class HealthRegistry:
+    def __init__(self, failure_threshold: int = 5, open_seconds: float = 30.0, max_open_seconds: float = 300.0):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self._lock = threading.Lock()
+        self._providers: Dict[str, ProviderHealth] = {}
+
+    def get(self, provider: str) -> ProviderHealth:
+        health = self._providers.get(provider)
+        if health is None:
+            with self._lock:
+                health = self._providers.get(provider)
+                if health is None:
+                    breaker = CircuitBreaker(self.failure_threshold, self.open_seconds, self.max_open_seconds)
+                    health = self._providers[provider] = ProviderHealth(provider, breaker)
+        return health
+
+    def available(self, provider: str) -> bool:
+        return self.get(provider).breaker.available()
+
+    def pick(self, candidates: Iterable[str]) -> Optional[str]:
+        """The best-scored candidate whose breaker would let a call through, or None."""
+        usable: List[ProviderHealth] = [self.get(name) for name in candidates if name]
+        usable = [h for h in usable if h.breaker.available()]
+        if not usable:
+            return None
+        return max(usable, key=lambda h: h.score).name
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            providers = dict(self._providers)
+        return {name: health.snapshot() for name, health in sorted(providers.items())}
+
+    def reset(self):
+        with self._lock:
+            self._providers.clear()
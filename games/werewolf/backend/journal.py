@@ -0,0 +1,138 @@
+"""
+每个房间一份追加写入的日志 + 定期快照，后端重启后 app.recover_rooms() 据此重建 rooms 并续跑对局。
+
+    <dir>/<room_id>/journal.jsonl   每行一条记录 {"seq", "ts", "type", ...}
+    <dir>/<room_id>/snapshot.json   最近一次完整状态 {"seq", "ts", "state"}
+
+- append() 只 flush；durable=True 的记录（app.py 在每个阶段结束时写入的 step / room）以及距上次
+  fsync 超过 fsync_interval 秒的写入才 fsync，普通事件借下一次 fsync 一起落盘（批量 fsync）
+- write_snapshot() 先写临时文件再 os.replace，然后截断日志；崩溃在两步之间也没关系，
+  load() 会跳过 seq 不大于快照 seq 的记录
+- 最后一行写了一半（进程在 write 中途被杀）时 load() 忽略它
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+JOURNAL_FILENAME = "journal.jsonl"
+SNAPSHOT_FILENAME = "snapshot.json"
+
+
+def _dumps(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, default=str, separators=(",", ":"))
+
+
+class RoomJournal:
+    def __init__(self, directory: str, room_id: str, fsync_interval: float = 1.0):
+        self.room_id = room_id
+        self.path = os.path.join(directory, room_id)
+        self.journal_path = os.path.join(self.path, JOURNAL_FILENAME)
+        self.snapshot_path = os.path.join(self.path, SNAPSHOT_FILENAME)
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._file = None
+        self._last_sync = 0.0
+        self._pending = 0
+        self.seq = 0
+        self.stats = {"records": 0, "fsyncs": 0, "snapshots": 0}
+        os.makedirs(self.path, exist_ok=True)
+        snapshot, records = self.load()
+        if records:
+            self.seq = records[-1]["seq"]
+        elif snapshot:
+            self.seq = snapshot.get("seq", 0)
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.journal_path, "a", encoding="utf-8")
+        return self._file
+
+    def append(self, record_type: str, durable: bool = False, **payload: Any) -> int:
+        with self._lock:
+            self.seq += 1
+            record = {"seq": self.seq, "ts": time.time(), "type": record_type, **payload}
+            f = self._open()
+            f.write(_dumps(record) + "\n")
+            f.flush()
+            self._pending += 1
+            self.stats["records"] += 1
+            if durable or time.time() - self._last_sync >= self.fsync_interval:
+                self._sync_locked()
+            return self.seq
+
+    def _sync_locked(self):
+        if self._file is not None and self._pending:
+            os.fsync(self._file.fileno())
+            self.stats["fsyncs"] += 1
+        self._pending = 0
+        self._last_sync = time.time()
+
+    def sync(self):
+        with self._lock:
+            self._sync_locked()
+
+    def write_snapshot(self, state: Dict[str, Any]):
+        """Persist a full state as of the current seq and start a fresh journal after it."""
+        with self._lock:
+            self._sync_locked()
+            tmp = self.snapshot_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(_dumps({"seq": self.seq, "ts": time.time(), "state": state}))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.snapshot_path)
+            if self._file is not None:
+                self._file.close()
+            self._file = open(self.journal_path, "w", encoding="utf-8")
+            self.stats["snapshots"] += 1
+
+    def load(self) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """(latest snapshot or None, journal records written after it, in order)."""
+        snapshot = None
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            snapshot = None
+        after = snapshot.get("seq", 0) if snapshot else 0
+        records: List[Dict[str, Any]] = []
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # torn tail write
+                        break
+                    if record.get("seq", 0) > after:
+                        records.append(record)
+        except OSError:
+            pass
+        return snapshot, records
+
+    def close(self):
+        with self._lock:
+            self._sync_locked()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def remove(self):
+        self.close()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def room_ids(directory: str) -> List[str]:
+    """Rooms that have a journal or snapshot under `directory`."""
+    try:
+        names = sorted(os.listdir(directory))
+    except OSError:
+        return []
+    return [
+        name for name in names
+        if os.path.exists(os.path.join(directory, name, SNAPSHOT_FILENAME))
+        or os.path.exists(os.path.join(directory, name, JOURNAL_FILENAME))
+    ]
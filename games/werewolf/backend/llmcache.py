@@ -0,0 +1,140 @@
+"""
+按内容寻址的模型响应缓存（ai_client 在发请求前查、拿到合法回复后写）。
+
+评测重跑和回放调试时，同一个模型会多次收到逐字节相同的请求，命中缓存就不再走网络。
+
+- key = sha256(规范化后的请求 payload)，包括 model、system / user 消息、response_format、temperature、max_tokens；
+  "stream" 不参与，所以流式与非流式调用共用同一条缓存
+- 内存层：最多 max_entries 条的 LRU
+- 磁盘层（可选，设置了 path 时）：SQLite 单文件，最多 max_disk_entries 条，超出时按最近访问时间淘汰最旧的
+- ttl 秒后过期（0 = 不过期），过期条目在读到时删除
+- 两层都存序列化后的 JSON 文本，命中时重新解析，调用方拿到的对象可以随意修改
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+MEMORY = "memory"
+DISK = "disk"
+MISS = "miss"
+
+
+def cache_key(payload: Dict[str, Any]) -> str:
+    """Content hash of a chat-completions payload (everything but "stream")."""
+    body = {k: v for k, v in payload.items() if k != "stream"}
+    blob = json.dumps(body, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 1000, ttl: float = 0.0, path: Optional[str] = None, max_disk_entries: int = 50000):
+        self.max_entries = max(0, int(max_entries))
+        self.ttl = max(0.0, float(ttl))
+        self.path = path
+        self.max_disk_entries = max(1, int(max_disk_entries))
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._disk_count = 0
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stored": 0, "evicted": 0, "expired": 0}
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, created REAL, accessed REAL, value TEXT)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+            self._disk_count = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def _expired(self, created: float, now: float) -> bool:
+        return bool(self.ttl) and now - created > self.ttl
+
+    def lookup(self, key: str) -> Tuple[Optional[Dict[str, Any]], str]:
+        """(cached value or None, tier it came from: "memory" / "disk" / "miss")."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[0], now):
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return json.loads(entry[1]), MEMORY
+                del self._memory[key]
+                self.stats["expired"] += 1
+            if self._db is not None:
+                row = self._db.execute("SELECT created, value FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    if not self._expired(row[0], now):
+                        self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                        self._remember_locked(key, row[0], row[1])
+                        self.stats["disk_hits"] += 1
+                        return json.loads(row[1]), DISK
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._disk_count -= 1
+                    self.stats["expired"] += 1
+            self.stats["misses"] += 1
+            return None, MISS
+
+    def put(self, key: str, value: Dict[str, Any]):
+        try:
+            blob = json.dumps(value, ensure_ascii=False, default=str)
+        except (TypeError, ValueError):
+            return
+        now = time.time()
+        with self._lock:
+            self._remember_locked(key, now, blob)
+            if self._db is not None:
+                inserted = self._db.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone() is None
+                self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)", (key, now, now, blob))
+                self._disk_count += inserted
+                if self._disk_count > self.max_disk_entries:
+                    self._evict_disk_locked(now)
+            self.stats["stored"] += 1
+
+    def _remember_locked(self, key: str, created: float, blob: str):
+        if not self.max_entries:
+            return
+        self._memory[key] = (created, blob)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["evicted"] += 1
+
+    def _evict_disk_locked(self, now: float):
+        if self.ttl:
+            expired = self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,)).rowcount
+            self.stats["expired"] += expired
+            self._disk_count -= expired
+        # trim to 90% so a full cache does not pay for a DELETE on every put
+        excess = self._disk_count - int(self.max_disk_entries * 0.9)
+        if excess > 0:
+            evicted = self._db.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed LIMIT ?)", (excess,)).rowcount
+            self.stats["evicted"] += evicted
+            self._disk_count -= evicted
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"memory_entries": len(self._memory), "disk_entries": self._disk_count if self._db is not None else None,
+                    **self.stats}
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._disk_count = 0
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,220 @@
+"""
+进程内的指标注册表：Counter / Histogram，按标签聚合，导出为 Prometheus 文本格式（app.py 的 GET /metrics）
+或 JSON 快照（带 p50/p95/p99）。
+
+ai_client 记录每次 HTTP 调用（provider / model / phase / outcome、重试、token 数），
+app.py 记录每个 AI 决策（是否退回启发式、端到端耗时）。phase 通过 contextvar 传递：
+调用方用 `with metrics.phase("day_voting"):` 包住决策，同一线程 / asyncio task 里的 ai_client 调用自动带上该标签。
+"""
+import bisect
+import contextlib
+import contextvars
+import math
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+CURRENT_PHASE: "contextvars.ContextVar[Optional[str]]" = contextvars.ContextVar("werewolf_phase", default=None)
+
+@contextlib.contextmanager
+def phase(name: Optional[str]):
+    """Tag every metric recorded inside the block (same thread / asyncio task) with phase=name."""
+    token = CURRENT_PHASE.set(name)
+    try:
+        yield
+    finally:
+        CURRENT_PHASE.reset(token)
+
+def current_phase() -> str:
+    return CURRENT_PHASE.get() or "unknown"
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[Any], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames: Tuple[str, ...] = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple("" if labels[n] is None else str(labels[n]) for n in self.labelnames)
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def _header(self, name: Optional[str] = None) -> List[str]:
+        name = name or self.name
+        return [f"# HELP {name} {self.help}", f"# TYPE {name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._series.get(self._key(labels), 0.0)
+
+    def total(self, **match) -> float:
+        """Sum over every series whose labels include `match`."""
+        idx = [(self.labelnames.index(k), str(v)) for k, v in match.items()]
+        with self._lock:
+            return sum(v for key, v in self._series.items() if all(key[i] == want for i, want in idx))
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._series.items())
+        lines = self._header(f"{self.name}_total")
+        for key, value in items:
+            lines.append(f"{self.name}_total{_format_labels(self.labelnames, key)} {_format_number(value)}")
+        return lines
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            items = sorted(self._series.items())
+        return [{"labels": dict(zip(self.labelnames, key)), "value": value} for key, value in items]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = (), buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [per-bucket counts (last one is +Inf), sum, count]
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        series = self._series.get(self._key(labels))
+        if not series:
+            return None
+        with self._lock:
+            counts = list(series[0])
+            total = series[2]
+        return self._estimate(counts, total, q)
+
+    def _estimate(self, counts: List[int], total: int, q: float) -> Optional[float]:
+        """Linear interpolation inside the bucket holding the q-th observation (histogram_quantile semantics)."""
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for i, n in enumerate(counts):
+            if seen + n >= rank and n:
+                if i >= len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self._series.items())
+        lines = self._header()
+        for key, (counts, total_sum, total_count) in items:
+            cumulative = 0
+            for bound, n in zip(list(self.buckets) + [math.inf], counts):
+                cumulative += n
+                le = ("le", _format_number(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_number(total_sum)}")
+            lines.append(f"{self.name}_count{labels} {total_count}")
+        return lines
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            items = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self._series.items())
+        out = []
+        for key, (counts, total_sum, total_count) in items:
+            entry: Dict[str, Any] = {"labels": dict(zip(self.labelnames, key)), "count": total_count, "sum": total_sum}
+            for q in QUANTILES:
+                entry[f"p{int(q * 100)}"] = self._estimate(counts, total_count, q)
+            out.append(entry)
+        return out
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _get_or_create(self, cls, name: str, help_text: str, labelnames: Iterable[str], **kwargs) -> Any:
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = self._metrics[name] = cls(name, help_text, labelnames, **kwargs)
+        if not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+            raise ValueError(f"metric {name} already registered with a different type or labels")
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, labelnames)
+
+    def histogram(self, name: str, help_text: str, labelnames: Iterable[str] = (), buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {m.name: {"type": m.kind, "help": m.help, "series": m.snapshot()} for m in metrics}
+
+    def reset(self):
+        """Zero every series (metric definitions stay registered)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+REGISTRY = MetricsRegistry()
@@ -0,0 +1,356 @@
+"""
+离线、确定性的 OpenAI 兼容 mock provider，用于在没有网络的机器上压测整局吞吐、连接池与重试行为。
+
+两种用法：
+  1) 进程内 transport：api_keys.json 中把 provider 的 model_url 写成 mock://...，
+     ai_client 的 pooled session 会把 mock:// 交给 MockLLMAdapter 处理，不经过任何 socket。
+  2) 本地 HTTP server：python mock_llm.py --port 8089 --config "latency_ms=200&error_rate=0.05"，
+     再把 model_url 写成 http://127.0.0.1:8089/v1/chat/completions（走真实的 HTTPAdapter / urllib3 连接池）。
+
+mock://<任意 host/path>?<参数>，参数均可省略：
+  latency_ms        基础延迟（毫秒，默认 0；mock:// 下超过请求的 read timeout 时按超时处理）
+  latency_dist      fixed | uniform | normal | lognormal（默认 fixed）
+  jitter_ms         uniform 的半宽 / normal 的标准差（默认 0）
+  sigma             lognormal 的形状参数，latency_ms 为中位数（默认 0.5）
+  error_rate        返回 503 的概率
+  rate_limit_rate   返回 429 + Retry-After 的概率
+  retry_after       429 响应携带的 Retry-After 秒数（默认 1）
+  malformed_rate    返回 200 但 message.content 是被截断的 JSON 的概率
+  stream_chunk_chars  stream=true 时每个 SSE 增量的字符数（默认 8）
+  seed              故障注入 / 延迟抽样的随机种子
+
+回复内容只取决于 prompt：按 ai_client 的 INPUT_JSON 中 action_requirements.expected_action 生成
+speak / vote / kill / reveal / protect / witch_action 的合法 JSON，目标由 prompt 的 crc32 在候选玩家中确定性选出。
+"""
+import io
+import json
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.exceptions import MaxRetryError
+from urllib3.response import HTTPResponse
+from urllib3.util.retry import Retry
+
+MOCK_SCHEME = "mock://"
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal")
+
+_REASONS = {200: "OK", 400: "Bad Request", 429: "Too Many Requests", 503: "Service Unavailable"}
+_PLAYER_RE = re.compile(r"\bAI_\d+\b")
+
+class MockTimeout(Exception):
+    """The drawn latency is longer than the request's read timeout (MockLLMAdapter turns it into requests' ReadTimeout)."""
+
+class MockLLM:
+    """线程安全的 mock chat-completions 后端；respond(payload) -> (status, headers, body bytes)。"""
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        latency_dist: str = "fixed",
+        jitter_ms: float = 0.0,
+        sigma: float = 0.5,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after: float = 1.0,
+        malformed_rate: float = 0.0,
+        stream_chunk_chars: int = 8,
+        seed: Optional[int] = None,
+    ):
+        if latency_dist not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"latency_dist must be one of {LATENCY_DISTRIBUTIONS}, got {latency_dist!r}")
+        self.latency_ms = max(0.0, float(latency_ms))
+        self.latency_dist = latency_dist
+        self.jitter_ms = max(0.0, float(jitter_ms))
+        self.sigma = max(0.0, float(sigma))
+        self.error_rate = float(error_rate)
+        self.rate_limit_rate = float(rate_limit_rate)
+        self.retry_after = max(0.0, float(retry_after))
+        self.malformed_rate = float(malformed_rate)
+        self.stream_chunk_chars = max(1, int(stream_chunk_chars))
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._counter = 0
+        self.stats: Dict[str, int] = {"requests": 0, "ok": 0, "errors": 0, "rate_limited": 0, "malformed": 0, "streamed": 0, "timeouts": 0}
+
+    @classmethod
+    def from_url(cls, url: str) -> "MockLLM":
+        query = parse_qs(urlsplit(url).query)
+        opts: Dict[str, Any] = {}
+        casts = {
+            "latency_ms": float, "latency_dist": str, "jitter_ms": float, "sigma": float,
+            "error_rate": float, "rate_limit_rate": float, "retry_after": float,
+            "malformed_rate": float, "stream_chunk_chars": int, "seed": int,
+        }
+        for name, cast in casts.items():
+            if name in query:
+                try:
+                    opts[name] = cast(query[name][-1])
+                except ValueError:
+                    raise ValueError(f"invalid mock option {name}={query[name][-1]!r}")
+        return cls(**opts)
+
+    def _draw(self) -> Tuple[float, float, int]:
+        """一次加锁抽样：(故障骰子, 延迟秒数, 请求序号)，保证同一 seed 下的序列可复现。"""
+        with self._lock:
+            self._counter += 1
+            roll = self._rng.random()
+            base = self.latency_ms
+            if self.latency_dist == "uniform":
+                delay = self._rng.uniform(base - self.jitter_ms, base + self.jitter_ms)
+            elif self.latency_dist == "normal":
+                delay = self._rng.gauss(base, self.jitter_ms)
+            elif self.latency_dist == "lognormal" and base > 0:
+                delay = self._rng.lognormvariate(math.log(base), self.sigma)
+            else:
+                delay = base
+            return roll, max(0.0, delay) / 1000.0, self._counter
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def respond(self, payload: Any, timeout: Optional[float] = None) -> Tuple[int, Dict[str, str], bytes]:
+        """timeout: the caller's read timeout; a drawn latency above it sleeps `timeout` and raises MockTimeout."""
+        self._count("requests")
+        roll, delay, seq = self._draw()
+        if delay:
+            if timeout is not None and delay > timeout:
+                time.sleep(timeout)
+                self._count("timeouts")
+                raise MockTimeout(f"mock latency {delay:.3f}s exceeds read timeout {timeout}s")
+            time.sleep(delay)
+        if not isinstance(payload, dict) or not isinstance(payload.get("messages"), list):
+            return _error(400, "invalid_request_error", "expected a chat.completions payload with messages")
+        # 各类故障按累积概率互斥地落在 [0, 1) 上
+        if roll < self.error_rate:
+            self._count("errors")
+            return _error(503, "server_error", "mock upstream overloaded")
+        roll -= self.error_rate
+        if roll < self.rate_limit_rate:
+            self._count("rate_limited")
+            status, headers, body = _error(429, "rate_limit_error", "mock rate limit reached")
+            headers["Retry-After"] = _format_seconds(self.retry_after)
+            return status, headers, body
+        roll -= self.rate_limit_rate
+
+        content = self.reply_content(payload)
+        if roll < self.malformed_rate:
+            self._count("malformed")
+            content = content[: max(1, len(content) // 2)]
+        self._count("ok")
+        model = payload.get("model") or "mock"
+        completion_id = f"mock-{seq}"
+        prompt_chars = sum(len(str(m.get("content") or "")) for m in payload["messages"] if isinstance(m, dict))
+        usage = {"prompt_tokens": prompt_chars // 4, "completion_tokens": len(content) // 4}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        if payload.get("stream"):
+            self._count("streamed")
+            return 200, {"Content-Type": "text/event-stream"}, self._sse_body(completion_id, model, content, usage)
+        body = {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": usage,
+        }
+        return 200, {"Content-Type": "application/json"}, json.dumps(body, ensure_ascii=False).encode("utf-8")
+
+    def _sse_body(self, completion_id: str, model: str, content: str, usage: Dict[str, int]) -> bytes:
+        step = self.stream_chunk_chars
+        lines: List[str] = []
+        for start in range(0, len(content), step):
+            event = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": content[start:start + step]}, "finish_reason": None}],
+            }
+            lines.append("data: " + json.dumps(event, ensure_ascii=False) + "\n\n")
+        final = {"id": completion_id, "object": "chat.completion.chunk", "model": model,
+                 "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage}
+        lines.append("data: " + json.dumps(final, ensure_ascii=False) + "\n\n")
+        lines.append("data: [DONE]\n\n")
+        return "".join(lines).encode("utf-8")
+
+    def reply_content(self, payload: Dict[str, Any]) -> str:
+        """根据 prompt 确定性地生成 assistant 回复（JSON 字符串）。"""
+        messages = [m for m in payload.get("messages") or [] if isinstance(m, dict)]
+        prompt = str(messages[-1].get("content") or "") if messages else ""
+        input_obj = _parse_input_json(prompt)
+        player = input_obj.get("current_player")
+        expected = (input_obj.get("action_requirements") or {}).get("expected_action")
+        candidates = _candidates(input_obj, prompt, player)
+        digest = zlib.crc32(prompt.encode("utf-8"))
+        target = candidates[digest % len(candidates)] if candidates else None
+
+        if expected == "vote":
+            reply: Dict[str, Any] = {"action": "vote", "target": target} if target else {"action": "none"}
+        elif expected in ("kill", "reveal", "protect"):
+            reply = {"action": expected, "target": target} if target else {"action": "none"}
+        elif expected == "witch_action":
+            reply = {"action": "none"}
+        elif expected == "none":
+            reply = {"action": "none"}
+        else:
+            speaker = player or "我"
+            speech = f"{speaker}：我觉得{target}的发言有些可疑，今天先听听大家的意见。" if target else f"{speaker}：我暂时没有特别的信息。"
+            reply = {"action": "speak", "speech": speech, "meta": {"mock": True}}
+        return json.dumps(reply, ensure_ascii=False)
+
+def _parse_input_json(prompt: str) -> Dict[str, Any]:
+    marker = prompt.find("INPUT_JSON:")
+    if marker == -1:
+        return {}
+    start = prompt.find("{", marker)
+    end = prompt.find("\n\nINSTRUCTION", start)
+    if start == -1:
+        return {}
+    try:
+        obj = json.loads(prompt[start:end] if end != -1 else prompt[start:])
+    except ValueError:
+        return {}
+    return obj if isinstance(obj, dict) else {}
+
+def _candidates(input_obj: Dict[str, Any], prompt: str, player: Optional[str]) -> List[str]:
+    details = input_obj.get("current_phase_details") or {}
+    names = details.get("available_targets") or (input_obj.get("game_context") or {}).get("alive_players")
+    if not isinstance(names, list) or not names:
+        names = sorted(set(_PLAYER_RE.findall(prompt)))
+    return [n for n in names if isinstance(n, str) and n != player]
+
+def _error(status: int, err_type: str, message: str) -> Tuple[int, Dict[str, str], bytes]:
+    body = json.dumps({"error": {"message": message, "type": err_type}}).encode("utf-8")
+    return status, {"Content-Type": "application/json"}, body
+
+def _format_seconds(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else f"{value:g}"
+
+# one MockLLM per distinct mock:// URL, so counters and the seeded RNG survive across sessions
+_MOCKS: Dict[str, MockLLM] = {}
+_MOCKS_LOCK = threading.Lock()
+
+def get_mock(url: str) -> MockLLM:
+    mock = _MOCKS.get(url)
+    if mock is not None:
+        return mock
+    with _MOCKS_LOCK:
+        mock = _MOCKS.get(url)
+        if mock is None:
+            mock = MockLLM.from_url(url)
+            _MOCKS[url] = mock
+        return mock
+
+def reset_mocks():
+    with _MOCKS_LOCK:
+        _MOCKS.clear()
+
+class MockLLMAdapter(BaseAdapter):
+    """
+    requests transport adapter for mock:// URLs. Status-based retries follow the session's urllib3
+    Retry policy (status_forcelist / backoff / Retry-After) the same way HTTPAdapter applies them.
+    """
+
+    def __init__(self, max_retries: Optional[Retry] = None):
+        super().__init__()
+        self.max_retries = max_retries if isinstance(max_retries, Retry) else Retry(0, read=False)
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        mock = get_mock(request.url)
+        try:
+            body = request.body
+            if isinstance(body, bytes):
+                body = body.decode("utf-8")
+            payload = json.loads(body) if body else None
+        except ValueError:
+            payload = None
+        retries = self.max_retries
+        read_timeout = timeout[1] if isinstance(timeout, tuple) else timeout
+        while True:
+            try:
+                status, headers, content = mock.respond(payload, timeout=read_timeout)
+            except MockTimeout as exc:
+                raise requests.exceptions.ReadTimeout(str(exc), request=request)
+            raw = HTTPResponse(body=io.BytesIO(content), headers=headers, status=status, preload_content=False)
+            if not retries.is_retry(request.method, status, "Retry-After" in headers):
+                break
+            try:
+                retries = retries.increment(request.method, request.url, response=raw)
+            except MaxRetryError:
+                if retries.raise_on_status:
+                    raise requests.exceptions.RetryError(f"mock retries exhausted for {request.url}", request=request)
+                break
+            retries.sleep(raw)
+        return self._build_response(request, status, headers, content, retries)
+
+    def _build_response(self, request, status: int, headers: Dict[str, str], content: bytes, retries: Retry) -> requests.Response:
+        resp = requests.Response()
+        resp.status_code = status
+        resp.reason = _REASONS.get(status, "")
+        resp.headers = CaseInsensitiveDict(headers)
+        # a urllib3 response like HTTPAdapter hands out, so raw.retries.history reports the retries taken
+        resp.raw = HTTPResponse(body=io.BytesIO(content), headers=headers, status=status, preload_content=False, retries=retries)
+        resp.encoding = "utf-8"
+        resp.url = request.url
+        resp.request = request
+        resp.connection = self
+        return resp
+
+    def close(self):
+        pass
+
+def serve(host: str = "127.0.0.1", port: int = 8089, mock: Optional[MockLLM] = None):
+    """在本地起一个 OpenAI 兼容的 HTTP mock server（阻塞）；任何 POST 路径都当作 chat/completions。"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    backend = mock or MockLLM()
+
+    class _Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                payload = json.loads(self.rfile.read(length) or b"null")
+            except ValueError:
+                payload = None
+            status, headers, content = backend.respond(payload)
+            self.send_response(status)
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    print(f"mock LLM listening on http://{host}:{port}/v1/chat/completions")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+    return backend
+
+def _main(argv: Optional[Iterable[str]] = None):
+    import argparse
+    p = argparse.ArgumentParser(description="Offline OpenAI-compatible mock LLM server")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8089)
+    p.add_argument("--config", default="", help="mock options as a query string, e.g. latency_ms=200&error_rate=0.05")
+    args = p.parse_args(argv)
+    serve(args.host, args.port, MockLLM.from_url(f"{MOCK_SCHEME}server?{args.config}"))
+
+if __name__ == "__main__":
+    _main()
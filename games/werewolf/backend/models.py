@@ -92,10 +92,10 @@ class GameState:
                 return p
         return None
 
-    def assign_roles_default(self):
+    def assign_roles_default(self, rng: Optional[random.Random] = None):
         n = len(self.players)
         roles = default_roles_for(n)
-        random.shuffle(roles)
+        (rng or random).shuffle(roles)
         for p, r in zip(self.players, roles):
             p.role = r
             # initialize role-based resources/state
@@ -217,8 +217,8 @@ def default_roles_for(n: int) -> List[Role]:
         roles.extend([Role.VILLAGER] * (n - len(roles)))
     return roles[:n]
 
-def create_default_game(player_names: List[str]) -> GameState:
+def create_default_game(player_names: List[str], rng: Optional[random.Random] = None) -> GameState:
     players = [Player(name, Role.VILLAGER) for name in player_names]
     gs = GameState(players)
-    gs.assign_roles_default()
+    gs.assign_roles_default(rng)
     return gs
\ No newline at end of file
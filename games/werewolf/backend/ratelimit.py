@@ -0,0 +1,213 @@
+"""
+按 provider 的限流与自适应并发（ai_client 的每次 chat-completions 调用都经过这里）。
+
+- 令牌桶：api_keys.json 的 provider 条目可写 "rpm" / "tpm"（或 requests_per_minute / tokens_per_minute），
+  每次调用前按 1 个请求和估算的 token 数（prompt + max_tokens）取令牌，不够就等；调用结束后按实际 usage 退补
+- AIMD 并发窗口：同一 provider 同时在途的调用数不超过 limit；成功一次 limit += 1/limit（约每轮 +1），
+  429 / 5xx 时 limit 减半（同一冷却期内只减一次），下限 min_concurrency
+- Retry-After：429 携带的等待时间对整个 provider 生效，暂停期间所有新调用都排队，而不是各自撞墙
+
+acquire() 等待超过 max_wait 秒返回 None，调用方按失败处理（退回启发式）。
+"""
+import email.utils
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+THROTTLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+def parse_retry_after(value: Any) -> Optional[float]:
+    """Retry-After header (delta seconds or HTTP date) -> seconds from now, None if absent / unparseable."""
+    if value is None or value == "":
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(str(value))
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class TokenBucket:
+    """Refills `rate_per_min / 60` per second up to `capacity`; take() may run negative (debt is waited off)."""
+
+    def __init__(self, rate_per_min: float, capacity: Optional[float] = None):
+        self.rate = max(1e-9, float(rate_per_min)) / 60.0
+        self.capacity = float(capacity or rate_per_min)
+        self.tokens = self.capacity
+        self._stamp = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        # a request larger than the bucket only has to wait for a full bucket
+        need = min(amount, self.capacity)
+        return 0.0 if self.tokens >= need else (need - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self.tokens -= amount
+
+
+class ProviderLimiter:
+    def __init__(
+        self,
+        name: str,
+        rpm: Optional[float] = None,
+        tpm: Optional[float] = None,
+        max_concurrency: int = 16,
+        min_concurrency: int = 1,
+        decrease: float = 0.5,
+        cooldown: float = 1.0,
+        max_wait: float = 30.0,
+    ):
+        self.name = name
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.min_concurrency = max(1, min(int(min_concurrency), self.max_concurrency))
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.max_wait = max_wait
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self.stats = {"acquired": 0, "waited": 0, "timeouts": 0, "throttled": 0, "decreases": 0}
+
+    def _wait_locked(self, tokens: float, now: float) -> float:
+        wait = max(0.0, self.paused_until - time.time())
+        if self.in_flight >= int(self.limit):
+            # woken by release(); the timeout only bounds the recheck
+            wait = max(wait, 0.05)
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1, now))
+        if self.tokens is not None and tokens:
+            wait = max(wait, self.tokens.wait_time(tokens, now))
+        return wait
+
+    def acquire(self, tokens: float = 0, max_wait: Optional[float] = None) -> Optional[float]:
+        """Block until a slot (and the rate budget) is free; returns the seconds waited, None on timeout."""
+        max_wait = self.max_wait if max_wait is None else max_wait
+        start = time.monotonic()
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                wait = self._wait_locked(tokens, now)
+                if wait <= 0:
+                    break
+                if now - start + wait > max_wait:
+                    self.stats["timeouts"] += 1
+                    return None
+                self._cond.wait(wait)
+            self.in_flight += 1
+            if self.requests is not None:
+                self.requests.take(1)
+            if self.tokens is not None and tokens:
+                self.tokens.take(tokens)
+            waited = time.monotonic() - start
+            self.stats["acquired"] += 1
+            if waited > 0.001:
+                self.stats["waited"] += 1
+            return waited
+
+    def release(self, ok: bool = False, token_delta: float = 0):
+        """
+        Give the slot back. ok: the call succeeded (grows the window; failures are reported through
+        throttle()); token_delta: actual - reserved tokens, settled against the tokens/min bucket.
+        """
+        with self._cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            if self.tokens is not None and token_delta:
+                self.tokens.take(token_delta)
+            if ok:
+                self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def throttle(self, retry_after: Optional[float] = None):
+        """Provider pushed back (429 / 5xx): halve the window once per cooldown and honor Retry-After for everyone."""
+        with self._cond:
+            now = time.time()
+            self.stats["throttled"] += 1
+            if now - self._last_decrease >= self.cooldown:
+                self.limit = max(float(self.min_concurrency), self.limit * self.decrease)
+                self._last_decrease = now
+                self.stats["decreases"] += 1
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+            self._cond.notify_all()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "paused_for": max(0.0, round(self.paused_until - time.time(), 3)),
+                "rpm_tokens": None if self.requests is None else round(self.requests.tokens, 1),
+                "tpm_tokens": None if self.tokens is None else round(self.tokens.tokens, 1),
+                **self.stats,
+            }
+
+
+def _number(entry: Dict[str, Any], *names: str) -> Optional[float]:
+    for name in names:
+        value = entry.get(name)
+        if value is None:
+            continue
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            continue
+        if value > 0:
+            return value
+    return None
+
+
+class LimiterRegistry:
+    """One ProviderLimiter per provider id; rebuilt when that provider's limits in api_keys.json change."""
+
+    def __init__(self, defaults: Optional[Dict[str, Any]] = None):
+        self.defaults = dict(defaults or {})
+        self._lock = threading.Lock()
+        self._limiters: Dict[str, Tuple[Tuple[Any, ...], ProviderLimiter]] = {}
+
+    def _settings(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        settings = {
+            "rpm": _number(entry, "rpm", "requests_per_minute"),
+            "tpm": _number(entry, "tpm", "tokens_per_minute"),
+            "max_concurrency": int(_number(entry, "max_concurrency") or self.defaults.get("max_concurrency", 16)),
+        }
+        for name in ("min_concurrency", "decrease", "cooldown", "max_wait"):
+            if name in self.defaults:
+                settings[name] = self.defaults[name]
+        return settings
+
+    def get(self, provider: str, entry: Optional[Dict[str, Any]] = None) -> ProviderLimiter:
+        settings = self._settings(entry or {})
+        key = tuple(sorted(settings.items()))
+        current = self._limiters.get(provider)
+        if current is not None and current[0] == key:
+            return current[1]
+        with self._lock:
+            current = self._limiters.get(provider)
+            if current is None or current[0] != key:
+                current = self._limiters[provider] = (key, ProviderLimiter(provider, **settings))
+            return current[1]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            limiters = {name: limiter for name, (_, limiter) in self._limiters.items()}
+        return {name: limiter.snapshot() for name, limiter in limiters.items()}
+
+    def reset(self):
+        with self._lock:
+            self._limiters.clear()
@@ -0,0 +1,160 @@
+"""
+模型调用的录制 / 回放 transport（ai_client 的 pooled session 在 record / replay 模式下挂上这里的 adapter）。
+
+- record：RecordingAdapter 包住原来的 adapter（HTTPAdapter / MockLLMAdapter）照常发请求，把每个请求的
+  payload 和最终响应（urllib3 重试之后的那一个：status、headers、body、耗时）追加到 transcript 文件（JSONL）。
+  流式响应会先整段读完再交给调用方，录制模式下 on_token 因此是一次性到达的
+- replay：ReplayAdapter 不碰网络，按请求 payload 的 sha256 找到录下的响应原样返回；同一请求录到多次
+  （重试、同一 prompt 问了两遍）时按录制顺序依次返回，用完后重复最后一条；没录到的请求按连接错误处理
+- replay_latency=True 时按录制时的耗时 sleep 再返回，否则立即返回（把引擎本身的开销和 provider 延迟分开测）
+
+配合 Game 的 seed（app.py）使用：同一 seed、同一 transcript 回放出来的是同一局。
+"""
+import hashlib
+import http
+import io
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.response import HTTPResponse
+
+RECORD = "record"
+REPLAY = "replay"
+MODES = (RECORD, REPLAY)
+_WIRE_HEADERS = frozenset({"content-encoding", "content-length", "transfer-encoding", "connection"})
+
+
+def request_payload(request: requests.PreparedRequest) -> Any:
+    body = request.body
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", errors="replace")
+    try:
+        return json.loads(body) if body else None
+    except ValueError:
+        return body
+
+
+def request_key(payload: Any) -> str:
+    blob = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class Transcript:
+    def __init__(self, path: str, mode: str, replay_latency: bool = False):
+        if mode not in MODES:
+            raise ValueError(f"transcript mode must be one of {MODES}, got {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.replay_latency = replay_latency
+        self._lock = threading.Lock()
+        self._recorded: Dict[str, List[Dict[str, Any]]] = {}
+        self._served: Dict[str, int] = {}
+        self.stats = {"recorded": 0, "replayed": 0, "missing": 0}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if mode == REPLAY:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # torn tail write of an interrupted recording
+                        break
+                    self._recorded.setdefault(record["key"], []).append(record)
+        except OSError as exc:
+            raise ValueError(f"cannot read transcript {self.path}: {exc}")
+
+    def record(self, request: requests.PreparedRequest, response: requests.Response, elapsed: float):
+        payload = request_payload(request)
+        record = {
+            "key": request_key(payload),
+            "ts": time.time(),
+            "url": request.url,
+            "payload": payload,
+            "status": response.status_code,
+            # the body is stored decoded, so the headers describing the wire encoding do not apply on replay
+            "headers": {k: v for k, v in response.headers.items() if k.lower() not in _WIRE_HEADERS},
+            "body": response.content.decode("utf-8", errors="replace"),
+            "elapsed": round(elapsed, 4),
+        }
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self.stats["recorded"] += 1
+
+    def lookup(self, request: requests.PreparedRequest) -> Optional[Dict[str, Any]]:
+        key = request_key(request_payload(request))
+        with self._lock:
+            records = self._recorded.get(key)
+            if not records:
+                self.stats["missing"] += 1
+                return None
+            index = self._served.get(key, 0)
+            self._served[key] = index + 1
+            self.stats["replayed"] += 1
+            return records[min(index, len(records) - 1)]
+
+    def adapter(self, inner: BaseAdapter) -> BaseAdapter:
+        """The adapter to mount in place of `inner` for this transcript's mode."""
+        return RecordingAdapter(inner, self) if self.mode == RECORD else ReplayAdapter(self)
+
+
+class RecordingAdapter(BaseAdapter):
+    def __init__(self, inner: BaseAdapter, transcript: Transcript):
+        super().__init__()
+        self.inner = inner
+        self.transcript = transcript
+
+    def send(self, request, **kwargs):
+        start = time.monotonic()
+        response = self.inner.send(request, **kwargs)
+        # reads a streamed body in full; the caller's iter_lines() then walks the buffered content
+        self.transcript.record(request, response, time.monotonic() - start)
+        return response
+
+    def close(self):
+        self.inner.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    def __init__(self, transcript: Transcript):
+        super().__init__()
+        self.transcript = transcript
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        record = self.transcript.lookup(request)
+        if record is None:
+            raise requests.exceptions.ConnectionError(f"no recorded response for this request in {self.transcript.path}", request=request)
+        if self.transcript.replay_latency and record.get("elapsed"):
+            time.sleep(record["elapsed"])
+        status = int(record["status"])
+        headers = record.get("headers") or {}
+        content = (record.get("body") or "").encode("utf-8")
+        resp = requests.Response()
+        resp.status_code = status
+        try:
+            resp.reason = http.HTTPStatus(status).phrase
+        except ValueError:
+            resp.reason = ""
+        resp.headers = CaseInsensitiveDict(headers)
+        resp.raw = HTTPResponse(body=io.BytesIO(content), headers=headers, status=status, preload_content=False)
+        resp.encoding = "utf-8"
+        resp.url = request.url
+        resp.request = request
+        resp.connection = self
+        return resp
+
+    def close(self):
+        pass
@@ -14,6 +14,7 @@ const RoundTableGame = ({ roomId }) => {
   const [roomState, setRoomState] = useState(null);
   const [showRoles, setShowRoles] = useState(false);
   const [activeSpeech, setActiveSpeech] = useState(null);
+  const [liveSpeech, setLiveSpeech] = useState(null); // 正在流式生成的发言 { player, speech }
   const [autoStep, setAutoStep] = useState(true);
   const [avatars, setAvatars] = useState({});
   const canvasRef = useRef(null);
@@ -26,10 +27,61 @@ const RoundTableGame = ({ roomId }) => {
   useEffect(() => {
     if (!roomId) return;
     loadRoomState();
-    const interval = setInterval(loadRoomState, 2000); // 每2秒刷新
+    // 有 SSE 推送时只保留低频兜底刷新；不支持 EventSource 的环境仍每2秒轮询
+    const interval = setInterval(loadRoomState, typeof EventSource === "undefined" ? 2000 : 30000);
     return () => clearInterval(interval);
   }, [roomId]);
 
+  useEffect(() => {
+    // 订阅后端 SSE 增量事件；断线重连时浏览器会带上 Last-Event-ID，由后端补发错过的事件
+    if (!roomId || typeof EventSource === "undefined") return;
+    const source = new EventSource(`/rooms/${roomId}/stream`);
+    const on = (type, handler) =>
+      source.addEventListener(type, (e) => {
+        try {
+          handler(JSON.parse(e.data));
+        } catch (err) {
+          // ignore malformed event
+        }
+      });
+    on("speech_token", (data) => setLiveSpeech({ player: data.player, speech: data.text }));
+    on("speech", (data) => {
+      setLiveSpeech(null);
+      patchPhaseContext((ctx) => {
+        const talks = ctx.current_talks || [];
+        if (talks.some((t) => t.player === data.player && t.round === data.round && t.speech === data.speech)) return ctx;
+        return { ...ctx, current_talks: [...talks, { player: data.player, round: data.round, speech: data.speech }] };
+      });
+      setActiveSpeech(data.player);
+      setTimeout(() => setActiveSpeech(null), 4000);
+    });
+    on("vote", (data) =>
+      patchPhaseContext((ctx) => {
+        const votes = { ...(ctx.current_votes || {}) };
+        votes[data.vote] = (votes[data.vote] || 0) + 1;
+        return { ...ctx, current_votes: votes, current_votes_meta: [...(ctx.current_votes_meta || []), data] };
+      })
+    );
+    on("vote_result", (data) => patchPhaseContext((ctx) => ({ ...ctx, current_votes: data.tally || {} })));
+    on("death", (data) =>
+      setRoomState((prev) =>
+        prev && prev.game ? { ...prev, game: { ...prev.game, alive: (prev.game.alive || []).filter((p) => p !== data.player) } } : prev
+      )
+    );
+    // 阶段切换、夜晚结算与断档时拉取一次完整状态
+    on("phase", () => loadRoomState());
+    on("night_result", () => loadRoomState());
+    on("resync", () => loadRoomState());
+    return () => source.close();
+  }, [roomId]);
+
+  function patchPhaseContext(fn) {
+    setRoomState((prev) => {
+      if (!prev || !prev.game) return prev;
+      return { ...prev, game: { ...prev.game, phase_context: fn(prev.game.phase_context || {}) } };
+    });
+  }
+
   useEffect(() => {
     let tid = null;
     if (autoStep && roomState && roomState.game && roomState.game.state !== "ended") {
@@ -227,8 +279,9 @@ const RoundTableGame = ({ roomId }) => {
 
         {/* 玩家位置 */}
         {playerPositions.map(({ player, x, y, isAlive, role }, index) => {
-          const recentSpeech = recentTalks.find((t) => t.player === player);
-          const showBubble = recentSpeech && activeSpeech === player;
+          const live = liveSpeech && liveSpeech.player === player ? liveSpeech : null;
+          const recentSpeech = live || recentTalks.find((t) => t.player === player);
+          const showBubble = recentSpeech && (live || activeSpeech === player);
 
           return (
             <div key={player} style={{ position: "absolute", left: x - 40, top: y - 40 }}>
@@ -0,0 +1,255 @@
+"""
+Micro-benchmarks for one game cycle: engine phases, serialization and prompt building.
+
+    python games/werewolf/scripts/bench_engine.py --out bench.json
+    python games/werewolf/scripts/bench_engine.py --compare bench.json --threshold 0.25
+
+AI decisions are never sent to a real provider: --ai heuristic (default) plays with the built-in
+fallbacks, --ai mock routes every call through the offline mock:// provider (backend/mock_llm.py,
+zero latency) so prompt building, the pooled session and response parsing are part of the timing.
+Results are JSON ({"meta", "results": [{case, players, median_us, ...}], "prompt_tokens": [...]});
+prompt_tokens compares the estimated size of each prompt as pretty / compact / compact + short-key
+INPUT_JSON. --compare exits 1 when a case's median got slower than the baseline by more than --threshold.
+"""
+import contextlib
+import io
+import json
+import os
+import pathlib
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import importlib.util
+
+BASE = pathlib.Path(__file__).resolve().parent.parent
+APP_PATH = BASE / "backend" / "app.py"
+PLAYER_COUNTS = (6, 8, 10, 12, 16)
+
+def load_app():
+    spec = importlib.util.spec_from_file_location("ww_app", str(APP_PATH))
+    ww = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(ww)
+    return ww
+
+def use_mock_provider(ww, query="seed=1"):
+    """Point api_keys.json lookups at a temp file whose only provider is the in-process mock."""
+    keys = {"providers": {"mock": {"api_key": "mock-key", "model_url": f"mock://bench/v1/chat/completions?{query}"}}}
+    fd, path = tempfile.mkstemp(prefix="ww_bench_keys_", suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(keys, f)
+    ww.API_KEYS_PATH = path
+    ww.ai_client.API_KEYS_PATH = path
+    return path
+
+def new_game(ww, n, seed, ai="heuristic"):
+    random.seed(seed)
+    game = ww.Game([f"AI_{i}" for i in range(1, n + 1)])
+    game.ai_enabled = ai != "heuristic"
+    # single-threaded so the numbers measure the engine, not pool scheduling
+    game.parallel_ai_calls = False
+    return game
+
+def played_game(ww, n, seed, ai="heuristic"):
+    """A game after one full night + day, so history / talks / votes are populated."""
+    game = new_game(ww, n, seed, ai)
+    game.night_phase()
+    game.day_phase()
+    return game
+
+def legacy_state(game):
+    # prompt builders read the {"alive", "players", "roles_known_to_server", ...} shape
+    state = game.to_dict()
+    state["alive"] = sorted(game.alive)
+    state["roles_known_to_server"] = dict(game.roles)
+    return state
+
+def measure(fn, setup=None, samples=20, number=1):
+    """
+    Time `fn` `samples` times; each sample runs it `number` times on a fresh setup() value (untimed).
+    Returns per-call microseconds.
+    """
+    timings = []
+    sink = io.StringIO()
+    for _ in range(samples):
+        arg = setup() if setup else None
+        with contextlib.redirect_stdout(sink):
+            start = time.perf_counter()
+            for _ in range(number):
+                fn(arg)
+            elapsed = time.perf_counter() - start
+        sink.seek(0)
+        sink.truncate()
+        timings.append(elapsed / number * 1e6)
+    timings.sort()
+    return {
+        "samples": samples,
+        "number": number,
+        "min_us": round(timings[0], 2),
+        "median_us": round(statistics.median(timings), 2),
+        "mean_us": round(statistics.fmean(timings), 2),
+        "p95_us": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+    }
+
+def _sample_replies(players):
+    target = players[-1]
+    return [
+        (json.dumps({"action": "kill", "target": target}), "night", "werewolf"),
+        (json.dumps({"action": "witch_action", "save_target": target}), "witch_action", "witch"),
+        (json.dumps({"action": "vote", "target": target}), "vote", None),
+        (json.dumps({"action": "speak", "speech": f"我怀疑 {target}，理由是昨天的发言前后矛盾。" * 3, "meta": {}}), "speak", None),
+        ("I vote " + target, "vote", None),
+    ]
+
+def bench_players(ww, n, samples, seed, ai):
+    ac = ww.ai_client
+    results = []
+
+    def add(case, stats):
+        row = {"case": case, "players": n}
+        row.update(stats)
+        results.append(row)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        base = played_game(ww, n, seed, ai)
+    players = list(base.players)
+    state = legacy_state(base)
+    talks = list(base.current_talks)
+    wolf = next((p for p in players if base.roles.get(p) == "werewolf"), players[0])
+    replies = _sample_replies(players)
+
+    add("night_phase", measure(lambda g: g.night_phase(), lambda: new_game(ww, n, seed, ai), samples))
+
+    def _after_night():
+        with contextlib.redirect_stdout(io.StringIO()):
+            g = new_game(ww, n, seed, ai)
+            g.night_phase()
+        return g
+
+    add("day_phase", measure(lambda g: g.day_phase(), _after_night, samples))
+    add("to_dict", measure(lambda _: base.to_dict(), None, samples, number=50))
+    add("to_json_uncached", measure(lambda _: (base._touch(), base.to_json()), None, samples, number=50))
+    add("visible_history_all_players", measure(
+        lambda _: [base._get_visible_history_for(p) for p in players], None, samples, number=20))
+    add("build_night_prompt", measure(lambda _: ac.build_night_prompt(wolf, "werewolf", state), None, samples, number=50))
+    add("build_day_prompt", measure(lambda _: ac.build_day_prompt(players[0], state), None, samples, number=50))
+    add("build_talk_prompt", measure(lambda _: ac.build_talk_prompt(players[0], state, talks), None, samples, number=50))
+    add("validate_json_response", measure(
+        lambda _: [ac.validate_json_response(text, schema, role) for text, schema, role in replies], None, samples, number=200))
+    return results
+
+PROMPT_MODES = {"pretty": (False, False), "compact": (True, False), "compact_short_keys": (True, True)}
+
+def prompt_sizes(ww, n, seed):
+    """Estimated prompt tokens of each builder under every INPUT_JSON serialization mode (late game: 3 cycles)."""
+    ac = ww.ai_client
+    with contextlib.redirect_stdout(io.StringIO()):
+        game = new_game(ww, n, seed)
+        for _ in range(3):
+            if game.check_win():
+                break
+            game.night_phase()
+            game.day_phase()
+    players = list(game.players)
+    state = legacy_state(game)
+    state["phase_context"] = {"current_talks": list(game.current_talks)}
+    wolf = next((p for p in players if game.roles.get(p) == "werewolf"), players[0])
+    builders = {
+        "night": lambda: ac.build_night_prompt(wolf, "werewolf", state, message_id="1"),
+        "day": lambda: ac.build_day_prompt(players[0], state, message_id="1"),
+        "talk": lambda: ac.build_talk_prompt(players[0], state, list(game.current_talks), message_id="1"),
+    }
+    saved = (ac.PROMPT_COMPACT, ac.PROMPT_SHORT_KEYS)
+    rows = []
+    try:
+        for name, build in builders.items():
+            row = {"prompt": name, "players": n}
+            for mode, (compact, short_keys) in PROMPT_MODES.items():
+                ac.PROMPT_COMPACT, ac.PROMPT_SHORT_KEYS = compact, short_keys
+                row[f"{mode}_tokens"] = ac._estimate_tokens(build())
+            row["reduction"] = round(1 - row["compact_tokens"] / row["pretty_tokens"], 4)
+            rows.append(row)
+    finally:
+        ac.PROMPT_COMPACT, ac.PROMPT_SHORT_KEYS = saved
+    return rows
+
+def run_benchmarks(player_counts=PLAYER_COUNTS, samples=20, seed=1, ai="heuristic"):
+    ww = load_app()
+    keys_path = use_mock_provider(ww) if ai == "mock" else None
+    try:
+        results = []
+        sizes = []
+        for n in player_counts:
+            results.extend(bench_players(ww, n, samples, seed, ai))
+            sizes.extend(prompt_sizes(ww, n, seed))
+    finally:
+        if keys_path:
+            os.unlink(keys_path)
+    meta = {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "ai": ai,
+        "seed": seed,
+        "samples": samples,
+        "timestamp": time.time(),
+    }
+    return {"meta": meta, "results": results, "prompt_tokens": sizes}
+
+def compare(current, baseline, threshold=0.25):
+    """Return [(case, players, base_median, new_median, ratio)] for cases slower than baseline * (1 + threshold)."""
+    modes = (current.get("meta", {}).get("ai"), baseline.get("meta", {}).get("ai"))
+    if modes[0] != modes[1]:
+        raise ValueError(f"cannot compare --ai {modes[0]} results against a --ai {modes[1]} baseline")
+    old = {(r["case"], r["players"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for row in current.get("results", []):
+        prev = old.get((row["case"], row["players"]))
+        if not prev or not prev.get("median_us"):
+            continue
+        ratio = row["median_us"] / prev["median_us"]
+        if ratio > 1 + threshold:
+            regressions.append((row["case"], row["players"], prev["median_us"], row["median_us"], round(ratio, 3)))
+    return regressions
+
+def print_table(report):
+    print(f"{'case':<30}{'players':>8}{'median_us':>14}{'p95_us':>14}")
+    for r in report["results"]:
+        print(f"{r['case']:<30}{r['players']:>8}{r['median_us']:>14.1f}{r['p95_us']:>14.1f}")
+    print()
+    print(f"{'prompt':<30}{'players':>8}{'pretty':>10}{'compact':>10}{'short':>10}{'saved':>8}")
+    for r in report.get("prompt_tokens", []):
+        print(f"{r['prompt']:<30}{r['players']:>8}{r['pretty_tokens']:>10}{r['compact_tokens']:>10}"
+              f"{r['compact_short_keys_tokens']:>10}{r['reduction']:>8.1%}")
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--players", type=str, default=",".join(str(n) for n in PLAYER_COUNTS), help="comma-separated player counts")
+    p.add_argument("--samples", type=int, default=20)
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--ai", choices=("heuristic", "mock"), default="heuristic")
+    p.add_argument("--out", type=str, default=None, help="write the JSON report here")
+    p.add_argument("--compare", type=str, default=None, help="baseline JSON report to check for regressions")
+    p.add_argument("--threshold", type=float, default=0.25, help="allowed median slowdown ratio for --compare")
+    args = p.parse_args()
+    report = run_benchmarks(
+        player_counts=[int(x) for x in args.players.split(",") if x.strip()],
+        samples=args.samples,
+        seed=args.seed,
+        ai=args.ai,
+    )
+    print_table(report)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Wrote {len(report['results'])} results to {args.out}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for case, n, old_us, new_us, ratio in regressions:
+            print(f"REGRESSION {case} players={n}: {old_us:.1f}us -> {new_us:.1f}us (x{ratio})")
+        sys.exit(1 if regressions else 0)
@@ -1,3 +1,4 @@
+import os
 import time
 import csv
 import json
@@ -5,6 +6,7 @@ import pathlib
 import importlib.util
 from statistics import mean
 import copy
+from concurrent.futures import ProcessPoolExecutor
 
 BASE = pathlib.Path(__file__).resolve().parent.parent
 APP_PATH = BASE / "backend" / "app.py"
@@ -15,104 +17,173 @@ def load_app():
     spec.loader.exec_module(ww)
     return ww
 
-def analyze_history(game):
-    # game is dict from get_room_state(... )['game']
-    history = game.get("history", [])
-    latencies = []
-    model_calls = 0
+def _percentile(values, q):
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))]
+
+def _latency_summary(latencies):
+    return {
+        "avg_latency": mean(latencies) if latencies else 0,
+        "p50_latency": _percentile(latencies, 0.50),
+        "p95_latency": _percentile(latencies, 0.95),
+        "p99_latency": _percentile(latencies, 0.99),
+    }
+
+def _iter_decisions(history):
+    """Yield (phase, latency, heuristic) for every AI decision recorded in a game's history."""
     for h in history:
         if h.get("phase") == "night":
-            for a in h.get("actions", []):
+            if "actions" in (h.get("werewolf") or {}):
+                # legacy event shape (to_dict("legacy") / older jsonl files)
+                wolf_actions = (h.get("werewolf") or {}).get("actions", [])
+                role_meta = {role: (h.get(role) or {}).get("meta") for role in ("seer", "witch")}
+            else:
+                actions = h.get("actions") or []
+                wolf_actions = [a for a in actions if a.get("action") == "werewolf_vote"]
+                role_meta = {
+                    "seer": next((a.get("meta") for a in actions if a.get("action") == "seer_reveal"), None),
+                    "witch": next((a.get("meta") for a in actions if a.get("action") in ("witch_save", "witch_poison")),
+                                  (h.get("witch") or {}).get("meta")),
+                }
+            for a in wolf_actions:
                 meta = a.get("meta") or {}
-                if meta.get("latency") is not None:
-                    latencies.append(meta.get("latency"))
-                    model_calls += 1
+                yield "werewolf_kill", meta.get("latency"), meta.get("heuristic")
+            for role in ("seer", "witch"):
+                if (h.get(role) or {}).get("actor"):
+                    meta = role_meta[role] or {}
+                    yield f"{role}_action", meta.get("latency"), meta.get("heuristic")
+            for t in h.get("night_talks", []):
+                phase = "monologue" if t.get("type") == "monologue" else "werewolf_discussion"
+                yield phase, t.get("latency"), (t.get("meta") or {}).get("heuristic")
         if h.get("phase") == "day":
             for v in h.get("votes_meta", []):
-                if v.get("latency") is not None:
-                    latencies.append(v.get("latency"))
-                    model_calls += 1
+                yield "day_vote", v.get("latency"), v.get("heuristic")
             for t in h.get("talks", []):
-                if t.get("latency") is not None:
-                    latencies.append(t.get("latency"))
-                    model_calls += 1
-    avg_latency = mean(latencies) if latencies else 0
-    return {"model_calls": model_calls, "avg_latency": avg_latency, "raw_latencies": latencies}
-
-def run_games(num_games=10, players=None, out_csv=None, out_jsonl=None):
-    ww = load_app()
+                yield "day_talk", t.get("latency"), (t.get("meta") or {}).get("heuristic")
+
+def analyze_history(game):
+    """
+    Call accounting for one game (dict from Game.to_dict() / get_room_state(...)['game']).
+    Covers night actions, werewolf discussion, role monologues, day speeches and votes.
+    model_calls / latencies only count decisions answered by a model; heuristic fallbacks are counted apart.
+    """
+    latencies = []
+    fallbacks = 0
+    by_phase = {}
+    for phase, latency, heuristic in _iter_decisions(game.get("history", [])):
+        if latency is None:
+            continue
+        entry = by_phase.setdefault(phase, {"decisions": 0, "model_calls": 0, "heuristic_fallbacks": 0, "latencies": []})
+        entry["decisions"] += 1
+        if heuristic:
+            entry["heuristic_fallbacks"] += 1
+            fallbacks += 1
+        else:
+            entry["model_calls"] += 1
+            entry["latencies"].append(latency)
+            latencies.append(latency)
+    for entry in by_phase.values():
+        entry.update(_latency_summary(entry.pop("latencies")))
+    decisions = len(latencies) + fallbacks
+    stats = {
+        "model_calls": len(latencies),
+        "heuristic_fallbacks": fallbacks,
+        "fallback_rate": fallbacks / decisions if decisions else 0,
+        "raw_latencies": latencies,
+        "by_phase": by_phase,
+    }
+    stats.update(_latency_summary(latencies))
+    return stats
+
+_APP = None
+
+def _get_app():
+    # one app module per process; worker processes load their own copy on first use
+    global _APP
+    if _APP is None:
+        _APP = load_app()
+    return _APP
+
+def play_game(index, players=None, heuristic_only=False, seed=None):
+    """Play one headless game (no rooms / auto-runner) and return its jsonl entry."""
+    ww = _get_app()
     ai_client = getattr(ww, "ai_client", None)
+    g = ww.run_headless_game(players=players, heuristic_only=heuristic_only, seed=seed)
+    game = g.to_dict()
+    # determine winner & days
+    winner = None
+    days = game.get("day", 0)
+    for h in reversed(game.get("history", [])):
+        if h.get("phase") == "end":
+            winner = h.get("winner")
+            break
+    stats = analyze_history(game)
+    row = {
+        "game_index": index,
+        "room_id": f"headless_{index}",
+        "winner": winner,
+        "days": days,
+        "model_calls": stats["model_calls"],
+        "heuristic_fallbacks": stats["heuristic_fallbacks"],
+        "avg_latency_sec": round(stats["avg_latency"], 4),
+        "p95_latency_sec": round(stats["p95_latency"], 4),
+        "timestamp": time.time()
+    }
+
+    # snapshot ai_client last actions and api_keys mapping if available
+    client_snapshot = {}
+    api_map = {}
+    try:
+        if ai_client:
+            client_snapshot = copy.deepcopy(getattr(ai_client, "_LAST_ACTIONS", {}))
+            api_map = copy.deepcopy(ai_client.load_api_keys() if hasattr(ai_client, "load_api_keys") else {})
+    except Exception:
+        client_snapshot = {}
+        api_map = {}
+    return {
+        "meta": row,
+        "call_stats": stats["by_phase"],
+        "game": game,
+        "ai_client_last_actions": client_snapshot,
+        "api_keys_snapshot": api_map
+    }
+
+def _play_game_args(args):
+    return play_game(*args)
+
+def run_games(num_games=10, players=None, out_csv=None, out_jsonl=None, workers=1, heuristic_only=False, seed=None):
+    """
+    Run num_games headless games. workers > 1 spreads them over a process pool; results are
+    merged back in game_index order, so the output files do not depend on the worker count.
+    seed (optional) makes game i use seed + i.
+    """
     results = []
     jsonl_path = out_jsonl or (BASE / "eval_results.jsonl")
     csv_path = out_csv or (BASE / "eval_results.csv")
-    # initialize jsonl file
-    with open(jsonl_path, "w", encoding="utf-8") as jf:
-        pass
-
-    for i in range(num_games):
-        room_owner = f"Eval_{i}_owner"
-        rid = ww.create_room(room_owner, max_players=(len(players) if players else 6))
-        # join players
-        if players:
-            for p in players:
-                if p != room_owner:
-                    ww.join_room(rid, p)
-        else:
-            # add default AI_1..AI_5
-            for j in range(1, 6):
-                ww.join_room(rid, f"AI_{j}")
-        # start game
-        ww.start_room_game(rid)
-        # step until end with safety limit
-        for _ in range(1000):
-            st = ww.get_room_state(rid)
-            if st["state"] == "ended":
-                break
-            ww.rooms[rid]["game"].step()
-        st = ww.get_room_state(rid)
-        game = st.get("game") or {}
-        # determine winner & days
-        winner = None
-        days = game.get("day", 0)
-        for h in reversed(game.get("history", [])):
-            if h.get("phase") == "end":
-                winner = h.get("winner")
-                break
-        stats = analyze_history(game)
-        row = {
-            "game_index": i,
-            "room_id": rid,
-            "winner": winner,
-            "days": days,
-            "model_calls": stats["model_calls"],
-            "avg_latency_sec": round(stats["avg_latency"], 4),
-            "timestamp": time.time()
-        }
-        results.append(row)
-
-        # snapshot ai_client last actions and api_keys mapping if available
-        client_snapshot = {}
-        api_map = {}
-        try:
-            if ai_client:
-                client_snapshot = copy.deepcopy(getattr(ai_client, "_LAST_ACTIONS", {}))
-                api_map = copy.deepcopy(ai_client.load_api_keys() if hasattr(ai_client, "load_api_keys") else {})
-        except Exception:
-            client_snapshot = {}
-            api_map = {}
-
-        # write jsonl entry (one JSON object per line)
-        entry = {
-            "meta": row,
-            "game": game,
-            "ai_client_last_actions": client_snapshot,
-            "api_keys_snapshot": api_map
-        }
-        with open(jsonl_path, "a", encoding="utf-8") as jf:
-            jf.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    jobs = [(i, players, heuristic_only, None if seed is None else seed + i) for i in range(num_games)]
+
+    if workers and workers > 1:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        chunksize = max(1, num_games // (workers * 4))
+        entries = pool.map(_play_game_args, jobs, chunksize=chunksize)
+    else:
+        pool = None
+        entries = (_play_game_args(job) for job in jobs)
+
+    try:
+        # write jsonl entry (one JSON object per line) as games complete, in index order
+        with open(jsonl_path, "w", encoding="utf-8") as jf:
+            for entry in entries:
+                results.append(entry["meta"])
+                jf.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    finally:
+        if pool is not None:
+            pool.shutdown()
 
     # write CSV
-    fieldnames = ["game_index", "room_id", "winner", "days", "model_calls", "avg_latency_sec", "timestamp"]
+    fieldnames = ["game_index", "room_id", "winner", "days", "model_calls", "heuristic_fallbacks", "avg_latency_sec", "p95_latency_sec", "timestamp"]
     with open(csv_path, "w", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(f, fieldnames=fieldnames)
         writer.writeheader()
@@ -127,5 +198,21 @@ if __name__ == "__main__":
     p.add_argument("--games", type=int, default=10)
     p.add_argument("--out", type=str, default=None)
     p.add_argument("--jsonl", type=str, default=None)
+    p.add_argument("--workers", type=int, default=1, help="parallel worker processes")
+    p.add_argument("--heuristic-only", action="store_true", help="skip model calls, play with built-in heuristics")
+    p.add_argument("--seed", type=int, default=None, help="base RNG seed; game i uses seed + i")
+    p.add_argument("--record", type=str, default=None, help="append every provider request/response to this transcript")
+    p.add_argument("--replay", type=str, default=None, help="serve provider calls from this transcript, no network")
     args = p.parse_args()
-    run_games(num_games=args.games, out_csv=args.out, out_jsonl=args.jsonl)
\ No newline at end of file
+    if args.record or args.replay:
+        # read by ai_client on import, in this process and in every worker process
+        os.environ["WEREWOLF_TRANSPORT_MODE"] = "replay" if args.replay else "record"
+        os.environ["WEREWOLF_TRANSPORT_PATH"] = args.replay or args.record
+    run_games(
+        num_games=args.games,
+        out_csv=args.out,
+        out_jsonl=args.jsonl,
+        workers=args.workers,
+        heuristic_only=args.heuristic_only,
+        seed=args.seed,
+    )
@@ -0,0 +1,68 @@
+import importlib.util
+import json
+import pathlib
+
+import pytest
+
+BASE = pathlib.Path(__file__).resolve().parent.parent
+
+
+def load_app_module():
+    app_path = BASE / "backend" / "app.py"
+    spec = importlib.util.spec_from_file_location("ww_app", str(app_path))
+    ww = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(ww)
+    return ww
+
+
+def stop_room_runners(ww, timeout: float = 10.0):
+    """Discard every room of this app module and wait for its auto-runners to exit."""
+    with ww.rooms_lock:
+        threads = list(ww._AUTO_THREADS.values())
+        tasks = list(ww._AUTO_TASKS.values())
+        for room_id in list(ww.rooms):
+            ww._discard_room_unsafe(room_id)
+    for thread in threads:
+        thread.join(timeout)
+    for task in tasks:
+        try:
+            task.result(timeout)
+        except Exception:
+            pass
+
+
+@pytest.fixture
+def ww():
+    """A freshly loaded app module; its rooms and auto-runners do not outlive the test."""
+    module = load_app_module()
+    yield module
+    stop_room_runners(module)
+
+
+@pytest.fixture
+def mock_providers(ww, tmp_path, monkeypatch):
+    """
+    use(name=query, ...) points ai_client at in-process mock:// providers and returns {name: MockLLM}.
+    Each provider serves model "<name>-model"; compatible={name: [...]} and settings={name: {...}}
+    (rpm, max_concurrency, ...) go into the api_keys.json entries. AI_1..AI_16 play on the first provider.
+    """
+    def use(compatible=None, settings=None, **queries):
+        keys_path = tmp_path / "api_keys.json"
+        players_path = tmp_path / "config.json"
+        providers = {}
+        for name, query in queries.items():
+            url = f"mock://{tmp_path.name}-{name}/v1/chat/completions?{query}"
+            providers[name] = {"api_key": f"{name}-key", "model": f"{name}-model", "model_url": url}
+            providers[name].update((settings or {}).get(name, {}))
+        for name, targets in (compatible or {}).items():
+            providers[name]["compatible"] = targets
+        keys_path.write_text(json.dumps({"providers": providers}), encoding="utf-8")
+        first = next(iter(providers))
+        players_path.write_text(json.dumps({"player_map": {f"AI_{i}": first for i in range(1, 17)}}), encoding="utf-8")
+        monkeypatch.setattr(ww, "API_KEYS_PATH", str(keys_path))
+        monkeypatch.setattr(ww, "PLAYERS_CONFIG_PATH", str(players_path))
+        monkeypatch.setattr(ww.ai_client, "API_KEYS_PATH", str(keys_path))
+        mock_llm = ww.ai_client._load_mock_llm()
+        return {name: mock_llm.get_mock(providers[name]["model_url"]) for name in queries}
+
+    return use
@@ -0,0 +1,50 @@
+import importlib.util
+import pathlib
+
+def load_ai_client():
+    base = pathlib.Path(__file__).resolve().parent.parent
+    client_path = base / "backend" / "ai_client.py"
+    spec = importlib.util.spec_from_file_location("ww_ai_client", str(client_path))
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+class _FakeResponse:
+    def __init__(self, data):
+        self._data = data
+        self.status_code = 200
+
+    def raise_for_status(self):
+        return None
+
+    def json(self):
+        return self._data
+
+def test_session_shared_per_api_url():
+    ac = load_ai_client()
+    s1 = ac.get_http_session("https://a.example/v1/chat/completions")
+    s2 = ac.get_http_session("https://a.example/v1/chat/completions")
+    s3 = ac.get_http_session("https://b.example/v1/chat/completions")
+    assert s1 is s2
+    assert s1 is not s3
+    adapter = s1.get_adapter("https://a.example/")
+    assert adapter._pool_maxsize == ac.HTTP_POOL_SIZE
+    # retries belong to _call_with_retries (deadline-bounded); the transport makes exactly one attempt
+    assert adapter.max_retries.total == 0
+    ac.close_http_sessions()
+    assert ac.get_http_session("https://a.example/v1/chat/completions") is not s1
+
+def test_call_goes_through_pooled_session(monkeypatch):
+    ac = load_ai_client()
+    calls = []
+
+    class _FakeSession:
+        def post(self, url, json=None, headers=None, timeout=None):
+            calls.append((url, headers.get("Authorization")))
+            return _FakeResponse({"choices": [{"message": {"content": "{\"action\":\"none\"}"}}]})
+
+    monkeypatch.setattr(ac, "get_http_session", lambda url: _FakeSession())
+    text, raw, model = ac.call_openai_chat_with_meta("hi", "sk-test", model="m")
+    assert text == "{\"action\":\"none\"}"
+    assert model == "m"
+    assert calls == [(ac.OPENAI_API_URL, "Bearer sk-test")]
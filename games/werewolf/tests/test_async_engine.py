@@ -0,0 +1,72 @@
+import asyncio
+import importlib.util
+import pathlib
+
+def load_app_module():
+    base = pathlib.Path(__file__).resolve().parent.parent
+    app_path = base / "backend" / "app.py"
+    spec = importlib.util.spec_from_file_location("ww_app", str(app_path))
+    ww = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(ww)
+    return ww
+
+def test_many_async_games_share_one_loop(monkeypatch):
+    ww = load_app_module()
+    in_flight = {"now": 0, "peak": 0}
+
+    async def fake_vote(player, context, api_key=None):
+        in_flight["now"] += 1
+        in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+        await asyncio.sleep(0.001)
+        in_flight["now"] -= 1
+        options = [p for p in context.get("alive_players", []) if p != player]
+        return {"vote_target": options[0]} if options else None
+
+    monkeypatch.setattr(ww.ai_client, "adecide_vote", fake_vote)
+    games = [ww.AsyncGame([f"AI_{i}" for i in range(1, 7)]) for _ in range(20)]
+
+    async def run_all():
+        await asyncio.gather(*(g.arun_to_end(max_steps=200) for g in games))
+
+    asyncio.run(run_all())
+    assert all(g.state == "ended" for g in games)
+    assert all(any(h.get("phase") == "end" for h in g.history) for g in games)
+    # votes from different voters/rooms were awaited concurrently on the single loop
+    assert in_flight["peak"] > 1
+
+def test_async_voting_keeps_voter_order(monkeypatch):
+    ww = load_app_module()
+    game = ww.AsyncGame([f"AI_{i}" for i in range(1, 7)])
+    alive = sorted(game.alive)
+
+    async def fake_vote(player, context, api_key=None):
+        # later voters answer first
+        await asyncio.sleep(0.001 * (len(alive) - alive.index(player)))
+        return {"vote_target": alive[-1] if player != alive[-1] else alive[0]}
+
+    monkeypatch.setattr(ww.ai_client, "adecide_vote", fake_vote)
+    result = asyncio.run(game._arun_voting([]))
+    assert [v["voter"] for v in result["votes_meta"]] == alive
+    assert result["lynched"] == alive[-1]
+
+def test_blocking_calls_are_capped_by_the_offload_pool(monkeypatch):
+    ww = load_app_module()
+    ac = ww.ai_client
+    monkeypatch.setattr(ac, "ASYNC_OFFLOAD_WORKERS", 2)
+    monkeypatch.setattr(ac, "_ASYNC_OFFLOAD_EXECUTOR", None)
+    lock = ww.threading.Lock()
+    in_flight = {"now": 0, "peak": 0}
+
+    def blocking_call():
+        with lock:
+            in_flight["now"] += 1
+            in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+        ww.time.sleep(0.02)
+        with lock:
+            in_flight["now"] -= 1
+
+    async def run_all():
+        await asyncio.gather(*(ac.run_blocking(blocking_call) for _ in range(8)))
+
+    asyncio.run(run_all())
+    assert in_flight["peak"] == 2
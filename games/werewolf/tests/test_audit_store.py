@@ -0,0 +1,44 @@
+import json
+
+def test_store_is_bounded_and_reads_evicted_records_from_disk(ww, tmp_path):
+    ac = ww.ai_client
+    store = ac.audit.AuditStore(max_entries=2, directory=str(tmp_path))
+    ids = [store.put({"n": i, "text": "数据"}, player=f"AI_{i}", kind="talk") for i in range(3)]
+    assert len(store) == 2 and store.stats["evicted"] == 1
+    assert store.get(ids[0]) == {"id": ids[0], "ts": store.get(ids[0])["ts"], "player": "AI_0", "kind": "talk", "raw": {"n": 0, "text": "数据"}}
+    assert store.stats["disk_reads"] >= 1 and store.get(ids[2])["raw"]["n"] == 2
+    assert len((tmp_path / ac.audit.AUDIT_FILENAME).read_text(encoding="utf-8").splitlines()) == 3
+    store.close()
+
+    # the offset index is bounded too; a second store appends after the first one's records
+    indexed = ac.audit.AuditStore(max_entries=1, directory=str(tmp_path), max_index_entries=2)
+    more = [indexed.put({"n": i}) for i in range(3, 6)]
+    assert len(indexed._offsets) == 2 and indexed.stats["index_evicted"] == 1
+    assert indexed.get(more[0]) is None and indexed.get(more[1])["raw"] == {"n": 4}
+    assert len((tmp_path / ac.audit.AUDIT_FILENAME).read_text(encoding="utf-8").splitlines()) == 6
+    indexed.close()
+
+    memory_only = ac.audit.AuditStore(max_entries=1)
+    first = memory_only.put({"n": 1})
+    memory_only.put({"n": 2})
+    assert memory_only.get(first) is None and memory_only.put(None) is None
+
+def test_history_and_snapshots_carry_only_raw_ids(ww, mock_providers, monkeypatch):
+    mock_providers(audited="seed=4")
+    monkeypatch.setattr(ww.ai_client, "AUDIT_STORE", ww.ai_client.audit.AuditStore(max_entries=1000))
+    game = ww.Game([f"AI_{i}" for i in range(1, 7)])
+    for i, player in enumerate(game.players):
+        game.set_player_role(player, "werewolf" if i < 2 else "villager")
+    game.step()
+    game.step()
+
+    snapshot = json.dumps(game.to_dict(), ensure_ascii=False)
+    assert '"raw"' not in snapshot and "chatcmpl" not in snapshot and "mock-" not in snapshot
+    talk = next(h for h in game.history if h.get("phase") == "day")["talks"][0]
+    record = ww.ai_client.AUDIT_STORE.get(talk["meta"]["raw_id"])
+    assert record["player"] == talk["player"] and record["kind"] == "talk" and record["phase"] == "day_discussion"
+    assert record["raw"]["choices"][0]["message"]["content"]
+
+    client = ww.app.test_client()
+    assert client.get(f"/audit/{talk['meta']['raw_id']}").get_json()["raw"] == record["raw"]
+    assert client.get("/audit/raw-missing").status_code == 404
@@ -0,0 +1,26 @@
+import importlib
+import json
+import pathlib
+
+BASE = pathlib.Path(__file__).resolve().parent.parent
+
+def test_bench_engine_reports_every_case(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(str(BASE / "scripts"))
+    bench = importlib.import_module("bench_engine")
+    report = bench.run_benchmarks(player_counts=[6, 16], samples=2)
+    cases = {(r["case"], r["players"]) for r in report["results"]}
+    for case in ("night_phase", "day_phase", "to_dict", "visible_history_all_players",
+                 "build_night_prompt", "build_day_prompt", "build_talk_prompt", "validate_json_response"):
+        assert (case, 6) in cases and (case, 16) in cases
+    assert all(r["median_us"] > 0 and r["min_us"] <= r["median_us"] <= r["p95_us"] for r in report["results"])
+    assert json.loads(json.dumps(report))["meta"]["ai"] == "heuristic"
+    sizes = {(r["prompt"], r["players"]): r for r in report["prompt_tokens"]}
+    assert set(sizes) == {(p, n) for p in ("night", "day", "talk") for n in (6, 16)}
+    assert all(r["compact_tokens"] < r["pretty_tokens"] for r in sizes.values())
+
+    slower = json.loads(json.dumps(report))
+    for row in slower["results"]:
+        row["median_us"] *= 2
+    regressions = bench.compare(slower, report, threshold=0.5)
+    assert len(regressions) == len(report["results"])
+    assert bench.compare(report, report) == []
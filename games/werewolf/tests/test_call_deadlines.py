@@ -0,0 +1,49 @@
+import json
+import time
+
+def test_deadline_bounds_slow_calls_and_retries(ww, mock_providers, monkeypatch):
+    ac = ww.ai_client
+    mocks = mock_providers(slow="latency_ms=3000", flaky="malformed_rate=1")
+    start = time.time()
+    text, raw, _ = ac.call_openai_chat_with_meta("hi", "slow", force_json=True, deadline=1.2)
+    assert text is None and "timeout" in raw["error"].lower()
+    assert time.time() - start < 2.5
+    assert mocks["slow"].stats["timeouts"] >= 1
+
+    # truncated JSON is retried within the budget; the last reply is still handed to the caller's parser
+    prompt = ac.build_day_prompt("AI_1", {"alive": ["AI_1", "AI_2"], "players": ["AI_1", "AI_2"]})
+    text, raw, model = ac.call_openai_chat_with_meta(prompt, "flaky", force_json=True)
+    assert text and model == "flaky-model"
+    assert mocks["flaky"].stats["malformed"] == ac.HTTP_RETRIES + 1
+    assert ac.LLM_RETRIES.value(provider="flaky", model="flaky-model") == ac.HTTP_RETRIES
+
+    # 5xx is retried once per attempt budget, not again inside the transport
+    mocks.update(mock_providers(down="error_rate=1"))
+    text, raw, _ = ac.call_openai_chat_with_meta("hi", "down")
+    assert text is None and mocks["down"].stats["requests"] == ac.HTTP_RETRIES + 1
+
+    monkeypatch.setenv("WEREWOLF_DEADLINE_DAY_VOTING", "7")
+    assert ac.call_deadline("day_voting") == 7.0
+    assert ac.call_deadline("seer_reveal") == ac.CALL_DEADLINE
+
+def test_hedged_request_takes_the_first_valid_reply(ww, mock_providers, monkeypatch):
+    ac = ww.ai_client
+    mocks = mock_providers(primary="latency_ms=1500", backup="latency_ms=10")
+    monkeypatch.setattr(ac, "HEDGE_ENABLED", True)
+    monkeypatch.setattr(ac, "HEDGE_PROVIDER", "backup")
+    monkeypatch.setattr(ac, "HEDGE_DELAY", 0.1)
+    prompt = ac.build_day_prompt("AI_1", {"alive": ["AI_1", "AI_2"], "players": ["AI_1", "AI_2"]})
+    start = time.time()
+    with ac.metrics.phase("day_voting"):
+        text, raw, model = ac.call_openai_chat_with_meta(prompt, "primary", force_json=True)
+    assert time.time() - start < 1.0
+    assert model == "backup-model" and json.loads(text)["action"] == "vote"
+    assert ac.LLM_HEDGES.value(provider="primary", backup="backup", outcome="won") == 1
+    assert mocks["backup"].stats["ok"] == 1
+
+    # a provider is never hedged onto itself, and without a configured backup nothing is hedged
+    monkeypatch.setattr(ac, "HEDGE_DELAY", 5.0)
+    text, _, model = ac.call_openai_chat_with_meta(prompt, "backup", force_json=True)
+    assert model == "backup-model" and ac.LLM_HEDGES.total(outcome="fired") == 1
+    monkeypatch.setattr(ac, "HEDGE_PROVIDER", None)
+    assert ac._hedge_backup({"provider": "primary"}) is None
@@ -0,0 +1,61 @@
+import time
+
+def _use_providers(ww, mock_providers, monkeypatch, **kwargs):
+    monkeypatch.setattr(ww.ai_client, "HTTP_RETRIES", 0)
+    monkeypatch.setattr(ww.ai_client, "PROVIDER_HEALTH", ww.ai_client.health.HealthRegistry(failure_threshold=2, open_seconds=0.2))
+    return mock_providers(**kwargs)
+
+def test_breaker_opens_fails_fast_and_recovers(ww, mock_providers, monkeypatch):
+    ac = ww.ai_client
+    mocks = _use_providers(ww, mock_providers, monkeypatch, down="error_rate=1")
+    for _ in range(2):
+        text, raw, _ = ac.call_openai_chat_with_meta("hi", "down")
+        assert text is None
+    assert ac.PROVIDER_HEALTH.get("down").breaker.current_state() == "open"
+    assert ac.LLM_CIRCUIT.value(provider="down", state="open") == 1
+
+    # open: no request reaches the provider, and the rejection takes no rate-limiter slot
+    sent = mocks["down"].stats["requests"]
+    acquired = ac.RATE_LIMITS.snapshot()["down"]["acquired"]
+    start = time.time()
+    text, raw, _ = ac.call_openai_chat_with_meta("hi", "down")
+    assert text is None and "circuit open" in raw["error"]
+    assert time.time() - start < 0.1 and mocks["down"].stats["requests"] == sent
+    limiter = ac.RATE_LIMITS.snapshot()["down"]
+    assert limiter["acquired"] == acquired and limiter["in_flight"] == 0
+
+    # after the cooldown a single probe goes through; the provider is back, so the circuit closes
+    mocks["down"].error_rate = 0.0
+    time.sleep(0.25)
+    assert ac.PROVIDER_HEALTH.get("down").breaker.current_state() == "half_open"
+    text, _, _ = ac.call_openai_chat_with_meta("hi", "down")
+    assert text
+    assert ac.PROVIDER_HEALTH.get("down").breaker.current_state() == "closed"
+
+def test_failed_probe_doubles_cooldown(ww):
+    breaker = ww.ai_client.health.CircuitBreaker(failure_threshold=1, open_seconds=0.05, max_open_seconds=0.15)
+    assert breaker.record(False) == "open" and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow() and not breaker.allow()
+    assert breaker.record(False) == "open" and breaker.cooldown == 0.1
+    breaker.probe_reachable()
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.cooldown == 0.15
+
+def test_open_circuit_fails_over_to_compatible_provider(ww, mock_providers, monkeypatch):
+    ac = ww.ai_client
+    mocks = _use_providers(ww, mock_providers, monkeypatch, compatible={"primary": ["spare"]},
+                           primary="error_rate=1", spare="latency_ms=1")
+    for _ in range(2):
+        ac.call_openai_chat_with_meta("hi", "primary")
+    sent = mocks["primary"].stats["requests"]
+    text, _, model = ac.call_openai_chat_with_meta("hi", "primary", model="primary-model")
+    assert text and model == "spare-model"
+    assert mocks["primary"].stats["requests"] == sent
+    assert ac.LLM_FAILOVERS.value(provider="primary", target="spare") == 1
+
+    client = ww.app.test_client()
+    body = client.get("/providers/health").get_json()["providers"]
+    assert body["primary"]["state"] == "open" and body["primary"]["failed"] == 2
+    assert body["spare"]["state"] == "closed" and body["spare"]["ok"] == 1
@@ -0,0 +1,76 @@
+import importlib.util
+import json
+import os
+import pathlib
+
+def load_app_module():
+    base = pathlib.Path(__file__).resolve().parent.parent
+    app_path = base / "backend" / "app.py"
+    spec = importlib.util.spec_from_file_location("ww_app", str(app_path))
+    ww = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(ww)
+    return ww
+
+def _write(path, data, bump=0):
+    path.write_text(json.dumps(data), encoding="utf-8")
+    if bump:
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + bump))
+
+def test_credentials_cached_until_file_changes(tmp_path, monkeypatch):
+    ww = load_app_module()
+    keys_path = tmp_path / "api_keys.json"
+    players_path = tmp_path / "config.json"
+    _write(keys_path, {"providers": {"p1": {"api_key": "k1", "model": "m1"}, "p2": {"api_key": "k2"}}})
+    _write(players_path, {"players": ["AI_1"], "player_map": {"AI_1": "p2"}})
+    monkeypatch.setattr(ww, "API_KEYS_PATH", str(keys_path))
+    monkeypatch.setattr(ww, "PLAYERS_CONFIG_PATH", str(players_path))
+
+    first = ww.resolve_player_credentials("AI_1")
+    assert first["provider"] == "p2" and first["api_key"] == "k2"
+    table = ww._credentials_table()
+    assert ww._credentials_table() is table
+    # unmapped players fall back to the first provider
+    assert ww.resolve_player_credentials("AI_9")["provider"] == "p1"
+
+    _write(players_path, {"players": ["AI_1"], "player_map": {"AI_1": "p1"}}, bump=10_000_000)
+    assert ww._credentials_table() is not table
+    assert ww.resolve_player_credentials("AI_1")["api_key"] == "k1"
+
+def test_config_post_invalidates_cache(tmp_path, monkeypatch):
+    ww = load_app_module()
+    keys_path = tmp_path / "api_keys.json"
+    players_path = tmp_path / "config.json"
+    _write(keys_path, {"providers": {"p1": {"api_key": "k1"}}})
+    _write(players_path, {"players": ["AI_1"], "player_map": {}})
+    monkeypatch.setattr(ww, "API_KEYS_PATH", str(keys_path))
+    monkeypatch.setattr(ww, "PLAYERS_CONFIG_PATH", str(players_path))
+    assert ww.resolve_player_credentials("AI_1")["api_key"] == "k1"
+
+    client = ww.app.test_client()
+    resp = client.post("/config/api_keys", json={"providers": {"p9": {"api_key": "k9"}}})
+    assert resp.status_code == 200
+    assert ww.resolve_player_credentials("AI_1")["provider"] == "p9"
+
+def test_ai_client_provider_resolution_is_cached(tmp_path, monkeypatch):
+    ww = load_app_module()
+    ac = ww.ai_client
+    keys_path = tmp_path / "api_keys.json"
+    _write(keys_path, {"providers": {"p1": {"api_key": "k1", "model": "m1", "model_url": "http://x/v1"}}})
+    monkeypatch.setattr(ac, "API_KEYS_PATH", str(keys_path))
+    by_name = ac.resolve_provider("p1")
+    by_secret = ac.resolve_provider("k1")
+    assert by_name["api_key"] == "k1" and by_name["model"] == "m1" and by_name["api_url"] == "http://x/v1"
+    assert by_secret["provider"] == "p1"
+    assert ac.resolve_provider("p1") is by_name
+    assert ac.resolve_provider("unknown")["api_key"] == "unknown"
+
+def test_load_api_keys_leaves_the_shared_cache_untouched(tmp_path, monkeypatch):
+    ww = load_app_module()
+    ac = ww.ai_client
+    keys_path = tmp_path / "api_keys.json"
+    _write(keys_path, {"providers": {"p1": {"api_key": "k1"}}})
+    monkeypatch.setattr(ac, "API_KEYS_PATH", str(keys_path))
+    keys = ac.load_api_keys()
+    assert keys["player_map"] == {} and ac.load_api_keys() is keys
+    assert "player_map" not in ac.read_json_cached(str(keys_path))
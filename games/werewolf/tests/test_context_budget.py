@@ -0,0 +1,63 @@
+import importlib.util
+import json
+import pathlib
+
+BASE = pathlib.Path(__file__).resolve().parent.parent
+
+def load_app_module():
+    app_path = BASE / "backend" / "app.py"
+    spec = importlib.util.spec_from_file_location("ww_app", str(app_path))
+    ww = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(ww)
+    return ww
+
+def _history(days, speech="我觉得 AI_3 的发言很可疑，昨天投票也跟着狼队走。" * 4):
+    history = []
+    for day in range(1, days + 1):
+        history.append({"phase": "night", "day": day, "killed": f"AI_{day}", "announcement": f"AI_{day} died",
+                        "night_talks": [{"player": "AI_9", "speech": speech, "meta": {"latency": 0.1}}]})
+        history.append({"phase": "day", "day": day, "lynched": f"AI_{day + 5}", "votes": {"AI_7": f"AI_{day + 5}"},
+                        "votes_meta": [{"voter": "AI_7", "latency": 0.2}],
+                        "talks": [{"player": f"AI_{i}", "round": 1, "speech": speech, "model": "m", "latency": 0.3}
+                                  for i in range(6, 12)]})
+    return history
+
+def test_recent_days_verbatim_older_days_summarized():
+    ac = load_app_module().ai_client
+    history = _history(4)
+    compressed, report = ac.compress_history(history, max_tokens=100000, recent_days=2)
+    assert [h["day"] for h in compressed["day_events"]] == [3, 3, 4, 4]
+    assert compressed["earlier_days"][0].startswith("Day 1: night: AI_1; lynched=AI_6")
+    talk = compressed["day_events"][1]["talks"][0]
+    assert talk == {"player": "AI_6", "round": 1, "speech": history[-3]["talks"][0]["speech"]}
+    assert "votes_meta" not in compressed["day_events"][1]
+    assert report["summarized_days"] == 2 and report["truncated_speeches"] == 0
+    assert report["compressed_tokens"] < report["original_tokens"] and report["ratio"] < 1
+    assert history[-1]["talks"][0]["latency"] == 0.3  # input is not mutated
+
+def test_budget_is_enforced_by_truncating_then_summarizing():
+    ac = load_app_module().ai_client
+    history = _history(3)
+    _, loose = ac.compress_history(history, max_tokens=100000, recent_days=3)
+    compressed, report = ac.compress_history(history, max_tokens=loose["compressed_tokens"] // 2, recent_days=3, speech_chars=20)
+    assert report["truncated_speeches"] > 0
+    assert report["compressed_tokens"] <= report["max_tokens"]
+    assert all(len(t["speech"]) <= 21 for h in compressed["day_events"] for t in h.get("talks", []))
+    _, tight = ac.compress_history(history, max_tokens=300, recent_days=3, speech_chars=20)
+    assert tight["summarized_days"] >= 1 and tight["ratio"] < report["ratio"]
+
+def test_day_prompt_uses_compressed_history_and_reports_ratio():
+    ww = load_app_module()
+    ac = ww.ai_client
+    ww.metrics.REGISTRY.reset()
+    state = {"day": 5, "players": [f"AI_{i}" for i in range(1, 12)], "alive": ["AI_1", "AI_3", "AI_5"],
+             "history": _history(5), "roles_known_to_server": {"AI_1": "villager"}}
+    with ww.metrics.phase("day_voting"):
+        prompt = ac.build_day_prompt("AI_1", state)
+    payload = json.loads(prompt.split("INPUT_JSON:\n", 1)[1].split("\n\nINSTRUCTION", 1)[0])
+    assert len(payload["complete_history"]["earlier_days"]) == 3
+    assert {h["day"] for h in payload["complete_history"]["day_events"]} == {4, 5}
+    report = ac._LAST_CONTEXT_REPORT["AI_1"]
+    assert report["compressed_tokens"] <= report["max_tokens"] < ac.CONTEXT_MAX_TOKENS
+    assert ac.PROMPT_COMPRESSION_RATIO.count(phase="day_voting") == 1
+    assert ac.PROMPT_HISTORY_TOKENS.value(phase="day_voting", stage="original") == report["original_tokens"]
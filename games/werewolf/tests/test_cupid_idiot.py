@@ -1,16 +1,4 @@
-import importlib.util
-import pathlib
-
-def load_app_module():
-    base = pathlib.Path(__file__).resolve().parent.parent
-    app_path = base / "backend" / "app.py"
-    spec = importlib.util.spec_from_file_location("ww_app", str(app_path))
-    ww = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(ww)
-    return ww
-
-def test_cupid_lovers_win():
-    ww = load_app_module()
+def test_cupid_lovers_win(ww):
     rid = ww.create_room("owner", max_players=4)
     for i in range(1, 4):
         ww.join_room(rid, f"AI_{i}")
@@ -34,8 +22,7 @@ def test_cupid_lovers_win():
     winner = game.check_win()
     assert winner == "lovers"
 
-def test_idiot_survives_vote():
-    ww = load_app_module()
+def test_idiot_survives_vote(ww):
     rid = ww.create_room("owner2", max_players=4)
     for i in range(1, 4):
         ww.join_room(rid, f"AI_{i}")
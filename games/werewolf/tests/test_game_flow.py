@@ -1,16 +1,4 @@
-import importlib.util
-import pathlib
-
-def load_app_module():
-    base = pathlib.Path(__file__).resolve().parent.parent
-    app_path = base / "backend" / "app.py"
-    spec = importlib.util.spec_from_file_location("ww_app", str(app_path))
-    ww = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(ww)
-    return ww
-
-def test_room_flow():
-    ww = load_app_module()
+def test_room_flow(ww):
     rid = ww.create_room("AI_owner", max_players=6)
     assert rid is not None
     # join players AI_1..AI_5
@@ -32,8 +20,7 @@ def test_room_flow():
     assert "history" in game and len(game["history"]) > 0
     assert any(h.get("phase") == "end" for h in game["history"])
 
-def test_join_full_room():
-    ww = load_app_module()
+def test_join_full_room(ww):
     rid = ww.create_room("ownerX", max_players=3)
     assert rid is not None
     assert ww.join_room(rid, "p2") is None
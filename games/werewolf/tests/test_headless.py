@@ -0,0 +1,41 @@
+import csv
+import importlib.util
+import pathlib
+
+BASE = pathlib.Path(__file__).resolve().parent.parent
+
+def load_module(name, path):
+    spec = importlib.util.spec_from_file_location(name, str(path))
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+def test_headless_game_runs_without_rooms_or_model_calls(monkeypatch):
+    ww = load_module("ww_app", BASE / "backend" / "app.py")
+
+    def no_calls(*args, **kwargs):
+        raise AssertionError("heuristic-only games must not reach the AI client")
+
+    for name in ("decide_talk", "decide_vote", "decide_night_action"):
+        monkeypatch.setattr(ww.ai_client, name, no_calls)
+    game = ww.run_headless_game(players=[f"AI_{i}" for i in range(1, 9)], heuristic_only=True, seed=7)
+    assert game.state == "ended"
+    assert any(h.get("phase") == "end" for h in game.history)
+    assert not ww.rooms and not ww._AUTO_THREADS
+
+def test_run_eval_workers_merge_in_order(tmp_path, monkeypatch):
+    # imported by name so worker processes can unpickle its job function
+    monkeypatch.syspath_prepend(str(BASE / "scripts"))
+    run_eval = importlib.import_module("run_eval")
+
+    def rows(workers):
+        out = tmp_path / f"eval_{workers}.csv"
+        run_eval.run_games(num_games=6, out_csv=out, out_jsonl=tmp_path / f"eval_{workers}.jsonl",
+                           workers=workers, heuristic_only=True, seed=3)
+        with open(out, encoding="utf-8") as f:
+            return [{k: v for k, v in r.items() if k != "timestamp"} for r in csv.DictReader(f)]
+
+    serial = rows(1)
+    assert [r["game_index"] for r in serial] == [str(i) for i in range(6)]
+    assert all(r["winner"] for r in serial)
+    assert rows(2) == serial
@@ -0,0 +1,65 @@
+import importlib.util
+import json
+import pathlib
+import random
+
+BASE = pathlib.Path(__file__).resolve().parent.parent
+
+def load_app_module():
+    app_path = BASE / "backend" / "app.py"
+    spec = importlib.util.spec_from_file_location("ww_app", str(app_path))
+    ww = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(ww)
+    return ww
+
+def _played_game(ww):
+    random.seed(7)
+    game = ww.Game([f"AI_{i}" for i in range(1, 9)])
+    game.ai_enabled = False
+    roles = ["werewolf", "werewolf", "seer", "witch", "villager", "villager", "villager", "villager"]
+    for player, role in zip(game.players, roles):
+        game.set_player_role(player, role)
+    game.night_phase()
+    game.day_phase()
+    return game
+
+def test_events_store_each_speech_and_action_once():
+    ww = load_app_module()
+    game = _played_game(ww)
+    night = next(h for h in game.history if h.get("phase") == "night")
+    day = next(h for h in game.history if h.get("phase") == "day")
+    assert "speeches" not in day and "announcement" not in day
+    assert "werewolf_choices" not in night and set(night["werewolf"]) == {"target", "votes"}
+    assert "meta" not in night["seer"] and "actions" not in night["witch"]
+
+    history = json.dumps(game.to_dict()["history"], ensure_ascii=False)
+    for talk in day["talks"] + night["night_talks"]:
+        speech = json.dumps(talk["speech"], ensure_ascii=False)
+        same = [t for t in day["talks"] + night["night_talks"] if t["speech"] == talk["speech"]]
+        assert history.count(speech) == len(same)
+    assert len(game.to_json()[1]) < len(game.to_json("legacy")[1]) * 0.8
+
+def test_legacy_view_matches_previous_event_shape():
+    ww = load_app_module()
+    game = _played_game(ww)
+    legacy = game.to_dict("legacy")
+    assert legacy["history_format"] == "legacy"
+    night = next(h for h in legacy["history"] if h.get("phase") == "night")
+    day = next(h for h in legacy["history"] if h.get("phase") == "day")
+    assert day["speeches"] == day["talks"] and day["announcement"] == night["announcement"]
+    assert sorted(a["actor"] for a in night["werewolf"]["actions"]) == ["AI_1", "AI_2"]
+    assert night["werewolf_choices"] == [a["target"] for a in night["werewolf"]["actions"] if a["target"]]
+    assert night["werewolf"]["discussions"] == [t for t in night["night_talks"] if t.get("type") != "monologue"]
+    assert night["seer"]["actor"] == "AI_3" and "latency" in night["seer"]["meta"]
+    assert night["witch"]["actor"] == "AI_4" and "meta" in night["witch"]
+    assert legacy["phase_context"]["last_night_result"]["werewolf_choices"] == night["werewolf_choices"]
+    # the stored events are not touched by the view
+    assert "speeches" not in next(h for h in game.history if h.get("phase") == "day")
+
+def test_visible_history_keeps_morning_announcement():
+    ww = load_app_module()
+    game = _played_game(ww)
+    visible = game._get_visible_history_for("AI_5")
+    night = next(h for h in visible if h["phase"] == "night")
+    day = next(h for h in visible if h["phase"] == "day")
+    assert day["announcement"] == night["announcement"] and day["talks"]
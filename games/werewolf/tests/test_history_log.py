@@ -0,0 +1,68 @@
+import importlib.util
+import pathlib
+
+def load_app_module():
+    base = pathlib.Path(__file__).resolve().parent.parent
+    app_path = base / "backend" / "app.py"
+    spec = importlib.util.spec_from_file_location("ww_app", str(app_path))
+    ww = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(ww)
+    return ww
+
+def test_history_log_bounds_memory_and_pages_from_archive(tmp_path):
+    ww = load_app_module()
+    log = ww.HistoryLog(max_events=10, archive_dir=str(tmp_path))
+    for i in range(300):
+        log.append({"phase": "death_event", "day": i, "player": f"AI_{i}", "note": "出局"})
+    assert 10 <= len(log) <= 12 and log.total == 300 and log.archived == 300 - len(log)
+    assert log[-1]["day"] == 299 and [e["day"] for e in log[-3:]] == [297, 298, 299]
+    assert [e["day"] for e in log.page(0, 3)] == [0, 1, 2]
+    assert [e["day"] for e in log.page(130, 5)] == [130, 131, 132, 133, 134]
+    # a page spanning the archive / memory boundary
+    boundary = log.archived
+    assert [e["day"] for e in log.page(boundary - 2, 4)] == list(range(boundary - 2, boundary + 2))
+    assert log.page(295, 50)[-1]["note"] == "出局" and len(log.page(295, 50)) == 5
+    assert log.page(400, 5) == []
+    assert len(list(tmp_path.iterdir())) == 1
+
+    dropped = ww.HistoryLog(max_events=4, archive_dir="off")
+    for i in range(20):
+        dropped.append({"day": i})
+    assert dropped.total == 20 and dropped.page(0, 2) == [] and dropped.page(19, 1) == [{"day": 19}]
+
+def test_room_history_endpoint(monkeypatch, tmp_path):
+    ww = load_app_module()
+    monkeypatch.setattr(ww, "_ensure_auto_runner", lambda rid: None)
+    client = ww.app.test_client()
+    room_id = ww.create_room("tester")
+    assert ww.start_room_game(room_id) is None
+    game = ww.rooms[room_id]["game"]
+    game.history = ww.HistoryLog(max_events=8, archive_dir=str(tmp_path))
+    game.ai_enabled = False
+    while game.state != "ended" and game.day < 6:
+        game.step()
+    for i in range(30):
+        game.history.append({"phase": "death_event", "day": game.day, "player": f"AI_{i % 6 + 1}", "cause": "test"})
+
+    body = client.get(f"/rooms/{room_id}/history?offset=0&limit=500").get_json()
+    assert body["total"] == game.history.total and len(body["events"]) == body["total"]
+    assert body["archived"] > 0 and body["events"][-1] == game.history[-1]
+    legacy = client.get(f"/rooms/{room_id}/history?history=legacy&limit=500").get_json()["events"]
+    assert all("speeches" in e for e in legacy if e.get("phase") == "day" and "talks" in e)
+    assert client.get(f"/rooms/{room_id}/history?limit=x").status_code == 400
+    assert client.get("/rooms/nope/history").status_code == 404
+
+    # discarding the room deletes its archive along with the journal
+    assert len(list(tmp_path.iterdir())) == 1
+    with ww.rooms_lock:
+        ww._discard_room_unsafe(room_id)
+    assert list(tmp_path.iterdir()) == []
+
+def test_headless_games_archive_only_when_asked(monkeypatch, tmp_path):
+    ww = load_app_module()
+    monkeypatch.setattr(ww, "HISTORY_ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setattr(ww, "HISTORY_MAX_EVENTS", 4)
+    game = ww.run_headless_game(heuristic_only=True, seed=1)
+    assert game.history.archived > 0 and list(tmp_path.iterdir()) == []
+    game = ww.run_headless_game(heuristic_only=True, seed=1, archive_history=True)
+    assert game.history.archive_path and len(list(tmp_path.iterdir())) == 1
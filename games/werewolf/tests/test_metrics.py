@@ -0,0 +1,76 @@
+import importlib
+import pathlib
+
+BASE = pathlib.Path(__file__).resolve().parent.parent
+
+def test_registry_prometheus_text_and_quantiles(ww):
+    registry = ww.metrics.MetricsRegistry()
+    calls = registry.counter("demo_calls", "Demo calls", ("provider",))
+    calls.inc(provider='a"b')
+    calls.inc(2, provider='a"b')
+    latency = registry.histogram("demo_seconds", "Demo latency", ("provider",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.05, 0.5, 5.0):
+        latency.observe(value, provider="p")
+    text = registry.render_prometheus()
+    assert "# TYPE demo_calls_total counter" in text
+    assert 'demo_calls_total{provider="a\\"b"} 3' in text
+    assert 'demo_seconds_bucket{provider="p",le="0.1"} 2' in text
+    assert 'demo_seconds_bucket{provider="p",le="+Inf"} 4' in text
+    assert 'demo_seconds_count{provider="p"} 4' in text
+    assert latency.quantile(0.5, provider="p") == 0.1
+    assert 0.1 < latency.quantile(0.75, provider="p") <= 1.0
+    assert registry.snapshot()["demo_seconds"]["series"][0]["p99"] == 1.0
+    assert registry.counter("demo_calls", "Demo calls", ("provider",)) is calls
+
+def test_game_calls_recorded_per_phase(ww, mock_providers):
+    ww.metrics.REGISTRY.reset()
+    mock_providers(mock="seed=2")
+    game = ww.Game([f"AI_{i}" for i in range(1, 7)])
+    for i, player in enumerate(game.players):
+        game.set_player_role(player, "werewolf" if i < 2 else "villager")
+    game.step()
+    game.step()
+
+    ac = ww.ai_client
+    voters = len(next(h for h in game.history if h.get("phase") == "day")["votes_meta"])
+    assert ac.LLM_REQUESTS.total(provider="mock", phase="day_voting", outcome="ok") == voters
+    assert ac.LLM_REQUESTS.total(provider="mock", phase="werewolf_discussion") == 6
+    assert ac.LLM_TOKENS.total(provider="mock", kind="prompt") > 0 and ac.LLM_TOKENS.total(provider="mock", kind="completion") > 0
+    assert ww.AI_DECISIONS.total(provider="mock", phase="day_voting", source="model") == voters
+    assert ww.AI_DECISIONS.total(provider="mock", phase="monologue") == 0  # no seer / witch in this setup
+
+    client = ww.app.test_client()
+    resp = client.get("/metrics")
+    assert resp.status_code == 200 and resp.content_type.startswith("text/plain")
+    body = resp.get_data(as_text=True)
+    assert "# TYPE werewolf_llm_requests_total counter" in body
+    assert 'provider="mock",model="gpt-4o-mini",phase="day_voting",outcome="ok"} ' in body
+    assert "werewolf_ai_decision_seconds_bucket" in body
+    snapshot = client.get("/metrics?format=json").get_json()
+    series = snapshot["werewolf_llm_request_seconds"]["series"]
+    assert all(s["p95"] is not None for s in series)
+
+def test_retries_and_error_outcomes(ww, mock_providers):
+    ww.metrics.REGISTRY.reset()
+    mock_providers(mock="rate_limit_rate=1&retry_after=0")
+    ac = ww.ai_client
+    with ww.metrics.phase("day_voting"):
+        assert ac.call_openai_chat_with_meta("hi", "mock")[0] is None
+    assert ac.LLM_REQUESTS.value(provider="mock", model="mock-model", phase="day_voting", outcome="http_429") == 1
+    assert ac.LLM_RETRIES.value(provider="mock", model="mock-model") == ac.HTTP_RETRIES
+
+def test_analyze_history_covers_discussions_and_monologues(monkeypatch):
+    monkeypatch.syspath_prepend(str(BASE / "scripts"))
+    run_eval = importlib.import_module("run_eval")
+    game = {"history": [
+        {"phase": "night", "werewolf": {"actions": [{"meta": {"latency": 0.2}}]},
+         "seer": {"actor": "AI_3", "meta": {"latency": 0.4}},
+         "witch": {"actor": None, "meta": {}},
+         "night_talks": [{"latency": 0.1, "meta": {}}, {"type": "monologue", "latency": 0.3, "meta": {"heuristic": True}}]},
+        {"phase": "day", "votes_meta": [{"latency": 0.5}], "talks": [{"latency": 0.6, "meta": {}}]},
+    ]}
+    stats = run_eval.analyze_history(game)
+    assert stats["model_calls"] == 5 and stats["heuristic_fallbacks"] == 1
+    assert set(stats["by_phase"]) == {"werewolf_kill", "seer_action", "werewolf_discussion", "monologue", "day_vote", "day_talk"}
+    assert stats["by_phase"]["monologue"]["heuristic_fallbacks"] == 1
+    assert stats["p95_latency"] == 0.6 and abs(stats["avg_latency"] - 0.36) < 1e-9
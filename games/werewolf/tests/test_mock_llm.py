@@ -0,0 +1,51 @@
+import json
+
+def test_mock_chat_replies_are_deterministic(ww, mock_providers):
+    ac = ww.ai_client
+    mock = mock_providers(mock="seed=1")["mock"]
+    prompt = ac.build_day_prompt("AI_1", {"alive": ["AI_1", "AI_2", "AI_3"], "players": ["AI_1", "AI_2", "AI_3"]})
+    text, raw, model = ac.call_openai_chat_with_meta(prompt, "mock", force_json=True)
+    assert model == "mock-model" and raw["object"] == "chat.completion"
+    reply = json.loads(text)
+    assert reply["action"] == "vote" and reply["target"] in ("AI_2", "AI_3")
+    assert ac.call_openai_chat_with_meta(prompt, "mock")[0] == text
+
+    decoder = ac.SpeechStreamDecoder()
+    talk = ac.build_talk_prompt("AI_2", {"alive": ["AI_1", "AI_2", "AI_3"]}, [])
+    streamed, raw, _ = ac.stream_openai_chat_with_meta(talk, "mock", lambda delta, _t: decoder.feed(delta))
+    assert raw["stream_chunks"] > 1 and json.loads(streamed)["speech"] == decoder.text
+    assert mock.stats["requests"] == 3 and mock.stats["streamed"] == 1
+
+def test_mock_faults_and_retry_policy(ww, mock_providers):
+    ac = ww.ai_client
+    limited = mock_providers(mock="rate_limit_rate=1&retry_after=0")["mock"]
+    text, raw, _ = ac.call_openai_chat_with_meta("hi", "mock")
+    assert text is None and "429" in raw["error"]
+    # 429s are retried HTTP_RETRIES times (by _call_with_retries, behind the provider limiter), mock:// included
+    assert limited.stats["rate_limited"] == ac.HTTP_RETRIES + 1
+
+    mock_llm = ac._load_mock_llm()
+    status, headers, _ = mock_llm.MockLLM(rate_limit_rate=1, retry_after=2).respond({"messages": []})
+    assert status == 429 and headers["Retry-After"] == "2"
+    status, _, _ = mock_llm.MockLLM(error_rate=1).respond({"messages": []})
+    assert status == 503
+    status, _, body = mock_llm.MockLLM(malformed_rate=1).respond({"messages": [{"role": "user", "content": "x"}]})
+    content = json.loads(body)["choices"][0]["message"]["content"]
+    assert status == 200 and ac.validate_json_response(content, "speak") == (None, "not_json")
+
+    mixed = [mock_llm.MockLLM(error_rate=0.3, seed=5).respond({"messages": []})[0] for _ in range(2)]
+    again = [mock_llm.MockLLM(error_rate=0.3, seed=5).respond({"messages": []})[0] for _ in range(2)]
+    assert mixed == again
+
+def test_game_decisions_reach_mock_provider(ww, mock_providers):
+    mock = mock_providers(mock="seed=3")["mock"]
+    game = ww.Game([f"AI_{i}" for i in range(1, 7)])
+    game.parallel_ai_calls = False
+    for i, player in enumerate(game.players):
+        game.set_player_role(player, "werewolf" if i < 2 else "villager")
+    game.step()
+    game.step()
+    day = next(h for h in game.history if h.get("phase") == "day")
+    assert day["talks"] and all("heuristic" not in t["meta"] for t in day["talks"])
+    assert all(ww.ai_client.AUDIT_STORE.get(t["meta"]["raw_id"])["raw"]["id"].startswith("mock-") for t in day["talks"])
+    assert mock.stats["requests"] >= len(day["talks"]) + 2
@@ -0,0 +1,69 @@
+import importlib.util
+import pathlib
+import threading
+
+def load_app_module():
+    base = pathlib.Path(__file__).resolve().parent.parent
+    app_path = base / "backend" / "app.py"
+    spec = importlib.util.spec_from_file_location("ww_app", str(app_path))
+    ww = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(ww)
+    return ww
+
+def test_single_room_policy_is_default(monkeypatch):
+    ww = load_app_module()
+    monkeypatch.setattr(ww, "_ensure_auto_runner", lambda rid: None)
+    first = ww.create_room("a")
+    assert ww.create_room("b") == first
+
+def test_multi_room_admission_queue(monkeypatch):
+    ww = load_app_module()
+    monkeypatch.setattr(ww, "ROOM_MODE", "multi")
+    monkeypatch.setattr(ww, "MAX_ACTIVE_ROOMS", 2)
+    started = []
+    monkeypatch.setattr(ww, "_ensure_auto_runner", lambda rid: started.append(rid))
+    room_ids = [ww.create_room(f"owner_{i}") for i in range(4)]
+    assert len(set(room_ids)) == 4
+    for rid in room_ids:
+        assert ww.start_room_game(rid) is None
+    states = [ww.get_room_state(rid) for rid in room_ids]
+    assert [s["state"] for s in states] == ["running", "running", "queued", "queued"]
+    assert [s.get("queue_position") for s in states[2:]] == [1, 2]
+    assert started == room_ids[:2]
+
+    client = ww.app.test_client()
+    assert client.post(f"/rooms/{room_ids[2]}/step").get_json()["status"] == "queued"
+
+    # the first game finishing hands its slot to the head of the queue
+    ww._release_run_slot(room_ids[0], ww.rooms[room_ids[0]]["game"])
+    assert started == room_ids[:3]
+    assert ww.get_room_state(room_ids[2])["state"] == "running"
+    assert ww.get_room_state(room_ids[3])["queue_position"] == 1
+    # a stale runner of a replaced game cannot release the slot of the current one
+    ww._release_run_slot(room_ids[1], object())
+    assert ww.get_room_state(room_ids[3])["state"] == "queued"
+
+def test_rooms_progress_concurrently_with_per_room_locks(monkeypatch):
+    ww = load_app_module()
+    monkeypatch.setattr(ww, "ROOM_MODE", "multi")
+    monkeypatch.setattr(ww, "MAX_ACTIVE_ROOMS", 3)
+    monkeypatch.setattr(ww, "AUTO_STEP_DELAY", 0)
+    room_ids = [ww.create_room(f"owner_{i}") for i in range(3)]
+    barrier = threading.Barrier(len(room_ids), timeout=5)
+    seen = set()
+
+    def fake_vote(player, context, api_key=None):
+        # the first vote of each room's runner waits until every room is voting at the same time
+        if id(threading.current_thread()) not in seen:
+            seen.add(id(threading.current_thread()))
+            barrier.wait()
+        return None
+
+    monkeypatch.setattr(ww.ai_client, "decide_vote", fake_vote)
+    monkeypatch.setattr(ww, "PARALLEL_AI_CALLS", False)
+    for rid in room_ids:
+        assert ww.start_room_game(rid) is None
+    for rid in room_ids:
+        ww._AUTO_THREADS[rid].join(timeout=20)
+    assert all(ww.get_room_state(rid)["state"] == "ended" for rid in room_ids)
+    assert not ww._ACTIVE_ROOMS
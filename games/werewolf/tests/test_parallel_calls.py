@@ -0,0 +1,75 @@
+import importlib.util
+import pathlib
+import threading
+
+def load_app_module():
+    base = pathlib.Path(__file__).resolve().parent.parent
+    app_path = base / "backend" / "app.py"
+    spec = importlib.util.spec_from_file_location("ww_app", str(app_path))
+    ww = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(ww)
+    return ww
+
+def test_votes_are_fanned_out_and_kept_in_voter_order(monkeypatch):
+    ww = load_app_module()
+    game = ww.Game([f"AI_{i}" for i in range(1, 7)])
+    game.parallel_ai_calls = True
+    alive = sorted(game.alive)
+    # every vote call blocks until all voters are in flight at the same time
+    barrier = threading.Barrier(len(alive), timeout=5)
+
+    def fake_vote(player, context, api_key=None):
+        barrier.wait()
+        return {"vote_target": alive[0] if player != alive[0] else alive[1]}
+
+    monkeypatch.setattr(ww.ai_client, "decide_vote", fake_vote)
+    result = game._run_voting([])
+    assert [v["voter"] for v in result["votes_meta"]] == alive
+    assert result["tally"][alive[0]] == len(alive) - 1
+    assert result["lynched"] == alive[0]
+    assert game.current_votes_meta == result["votes_meta"]
+
+def test_votes_sequential_when_disabled(monkeypatch):
+    ww = load_app_module()
+    game = ww.Game([f"AI_{i}" for i in range(1, 7)])
+    game.parallel_ai_calls = False
+    seen = []
+
+    def fake_vote(player, context, api_key=None):
+        seen.append((player, threading.current_thread().name))
+        return {"vote_target": "abstain"}
+
+    monkeypatch.setattr(ww.ai_client, "decide_vote", fake_vote)
+    result = game._run_voting([])
+    assert [p for p, _ in seen] == sorted(game.alive)
+    assert all(name == threading.current_thread().name for _, name in seen)
+    assert result["lynched"] is None
+
+def test_night_runs_seer_alongside_wolf_kill_votes(monkeypatch):
+    ww = load_app_module()
+    players = [f"AI_{i}" for i in range(1, 7)]
+    game = ww.Game(players)
+    game.parallel_ai_calls = True
+    for player, role in zip(players, ["werewolf", "werewolf", "seer", "witch", "villager", "villager"]):
+        game.set_player_role(player, role)
+    # both wolf kill votes and the seer check must be in flight together to pass the barrier
+    barrier = threading.Barrier(3, timeout=5)
+    witch_contexts = []
+
+    def fake_action(player, context, api_key=None):
+        phase = context.get("phase")
+        if phase in ("werewolf_kill", "seer_reveal"):
+            barrier.wait()
+            return {"target": "AI_5"}
+        if phase == "witch_action":
+            witch_contexts.append(dict(context))
+        return None
+
+    monkeypatch.setattr(ww.ai_client, "decide_night_action", fake_action)
+    monkeypatch.setattr(ww.ai_client, "decide_talk", lambda *args, **kwargs: None)
+    game.night_phase()
+    night = game.history[-1]
+    assert night["werewolf"]["target"] == "AI_5"
+    assert night["seer"]["actor"] == "AI_3" and night["seer"]["target"] == "AI_5"
+    assert witch_contexts and witch_contexts[0]["werewolf_target"] == "AI_5"
+    assert sorted(a["actor"] for a in night["actions"] if a["action"] == "werewolf_vote") == ["AI_1", "AI_2"]
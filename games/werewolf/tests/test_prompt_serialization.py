@@ -0,0 +1,64 @@
+import importlib.util
+import json
+import pathlib
+
+BASE = pathlib.Path(__file__).resolve().parent.parent
+
+def load_app_module():
+    app_path = BASE / "backend" / "app.py"
+    spec = importlib.util.spec_from_file_location("ww_app", str(app_path))
+    ww = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(ww)
+    return ww
+
+def _input_json(prompt):
+    return prompt.split("INPUT_JSON:\n", 1)[1].split("\n\nINSTRUCTION", 1)[0]
+
+def _talks():
+    raw = {"id": "chatcmpl-1", "choices": [{"message": {"content": "{\"action\":\"speak\"}"}}], "usage": {"prompt_tokens": 900}}
+    return [{"player": f"AI_{i}", "round": 1, "speech": f"我怀疑 AI_{i + 1}", "model": "gpt-4o-mini", "provider": "p",
+             "latency": 0.42, "meta": {"raw": raw, "heuristic": False}} for i in range(1, 7)]
+
+def _state():
+    return {"day": 2, "players": [f"AI_{i}" for i in range(1, 8)], "alive": [f"AI_{i}" for i in range(1, 8)],
+            "roles_known_to_server": {"AI_1": "seer"},
+            "history": [{"phase": "day", "day": 1, "lynched": "AI_9", "votes": {"AI_1": "AI_9"}, "talks": _talks()}]}
+
+def test_compact_prompt_is_smaller(monkeypatch):
+    ac = load_app_module().ai_client
+    monkeypatch.setattr(ac, "PROMPT_SHORT_KEYS", False)
+    monkeypatch.setattr(ac, "PROMPT_COMPACT", False)
+    pretty = ac.build_talk_prompt("AI_1", _state(), _talks(), message_id="1")
+    monkeypatch.setattr(ac, "PROMPT_COMPACT", True)
+    compact = ac.build_talk_prompt("AI_1", _state(), _talks(), message_id="1")
+
+    body = _input_json(compact)
+    assert "\n" not in body and "chatcmpl" not in body and "latency" not in body
+    payload = json.loads(body)
+    assert payload["current_phase_details"]["previous_speeches_today"][0] == {"player": "AI_1", "round": 1, "speech": "我怀疑 AI_2"}
+    assert json.loads(_input_json(pretty))["current_phase_details"] == payload["current_phase_details"]
+    assert ac._estimate_tokens(compact) < ac._estimate_tokens(pretty)
+
+def test_short_keys_only_inside_history_and_speeches():
+    ac = load_app_module().ai_client
+    obj = {"phase": "day_discussion", "current_player": "AI_1",
+           "complete_history": {"day_events": [{"phase": "day", "day": 1, "talks": [{"player": "AI_2", "speech": "hi"}]}]},
+           "current_phase_details": {"previous_speeches_today": [{"player": "AI_3", "speech": "yo", "meta": {}}]}}
+    payload = json.loads(ac.render_input_json(obj, compact=True, short_keys=True))
+    assert payload["phase"] == "day_discussion" and payload["current_player"] == "AI_1"
+    assert payload["complete_history"]["day_events"][0] == {"ph": "day", "d": 1, "t": [{"p": "AI_2", "s": "hi"}]}
+    assert payload["current_phase_details"]["previous_speeches_today"] == [{"p": "AI_3", "s": "yo"}]
+    assert payload["key_legend"]["s"] == "speech"
+    assert obj["current_phase_details"]["previous_speeches_today"][0]["meta"] == {}  # caller's dict untouched
+
+def test_same_state_gives_the_same_cache_key_without_compact(monkeypatch):
+    ac = load_app_module().ai_client
+    monkeypatch.setattr(ac, "PROMPT_COMPACT", False)
+    rerun = _talks()
+    for talk in rerun:
+        # a replayed game: same speeches, different audit ids and timings
+        talk.update(latency=1.7, meta={"raw_id": "raw-other", "raw": {"id": "chatcmpl-2"}})
+    prompts = [ac.build_talk_prompt("AI_1", _state(), talks, message_id="1") for talks in (_talks(), rerun)]
+    assert "chatcmpl" not in prompts[0] and "latency" not in _input_json(prompts[0])
+    keys = {ac.llmcache.cache_key({"model": "m", "messages": [{"role": "user", "content": p}]}) for p in prompts}
+    assert len(keys) == 1
@@ -0,0 +1,79 @@
+import threading
+import time
+
+def test_token_bucket_and_aimd_window(ww):
+    ratelimit = ww.ai_client.ratelimit
+    limiter = ratelimit.ProviderLimiter("p", rpm=600, max_concurrency=4, cooldown=0.0, max_wait=1.0)
+    # 600 rpm = 10/s with a burst of 600: the first calls go straight through
+    assert limiter.acquire() < 0.01
+    limiter.release(ok=True)
+    assert limiter.limit == 4.0
+    limiter.throttle()
+    assert limiter.limit == 2.0
+    limiter.throttle()
+    limiter.throttle()
+    assert limiter.limit == 1.0  # floor: min_concurrency
+    for _ in range(3):
+        limiter.acquire()
+        limiter.release(ok=True)
+    assert 2.0 < limiter.limit < 3.0  # additive increase: +1/limit per success
+
+    # a full window blocks until a slot is released
+    single = ratelimit.ProviderLimiter("s", max_concurrency=1, max_wait=0.2)
+    assert single.acquire() is not None
+    assert single.acquire() is None and single.stats["timeouts"] == 1
+    threading.Timer(0.05, single.release).start()
+    assert single.acquire(max_wait=2.0) >= 0.04
+
+    tpm = ratelimit.ProviderLimiter("t", tpm=60, max_wait=0.5)
+    assert tpm.acquire(60) is not None
+    tpm.release(ok=True, token_delta=-30)  # the reply used half of what was reserved
+    assert abs(tpm.tokens.tokens - 30) < 1
+    assert tpm.acquire(60) is None  # 30 more tokens need 30s at 1 token/s
+
+def test_retry_after_pauses_the_whole_provider(ww):
+    ratelimit = ww.ai_client.ratelimit
+    assert ratelimit.parse_retry_after("2") == 2.0 and ratelimit.parse_retry_after(None) is None
+    assert ratelimit.parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    limiter = ratelimit.ProviderLimiter("p", max_concurrency=8, max_wait=2.0)
+    limiter.throttle(retry_after=0.2)
+    start = time.monotonic()
+    assert limiter.acquire() is not None
+    assert time.monotonic() - start >= 0.15
+    assert limiter.snapshot()["limit"] == 4.0
+
+def test_only_429_5xx_and_timeouts_shrink_the_window(ww):
+    ac = ww.ai_client
+    limiter = ac.ratelimit.ProviderLimiter("p", max_concurrency=8, cooldown=0.0)
+    req = {"provider": "p", "payload": {"messages": []}}
+    # a bad model name / rejected response_format / auth error is the request's problem, not load
+    for status in (400, 401, 404, 422):
+        limiter.acquire()
+        ac._release_limiter(limiter, req, status)
+    assert limiter.limit == 8.0 and limiter.stats["throttled"] == 0 and limiter.in_flight == 0
+    limiter.acquire()
+    ac._release_limiter(limiter, req, 503)
+    limiter.acquire()
+    ac._release_limiter(limiter, req, None, exc=ac.requests.Timeout())
+    assert limiter.limit == 2.0 and limiter.stats["throttled"] == 2
+
+def test_calls_report_429_to_provider_limiter(ww, mock_providers, monkeypatch):
+    ac = ww.ai_client
+    ac.RATE_LIMITS.reset()
+    settings = {"limited": {"rpm": 120, "tpm": 100000, "max_concurrency": 8}}
+    mock_providers(settings=settings, limited="rate_limit_rate=1&retry_after=0.05")
+
+    text, raw, _ = ac.call_openai_chat_with_meta("hi", "limited")
+    assert text is None and "429" in raw["error"]
+    limiter = ac.RATE_LIMITS.get("limited", settings["limited"])
+    snap = limiter.snapshot()
+    # every attempt's 429 is reported: the first try and HTTP_RETRIES retries
+    assert snap["throttled"] == ac.HTTP_RETRIES + 1 and snap["limit"] < 8 and snap["in_flight"] == 0
+    assert limiter.requests is not None and limiter.tokens is not None
+    assert ac.LLM_THROTTLED.value(provider="limited", status="429") == ac.HTTP_RETRIES + 1
+
+    # no slot within max_wait: the call is not sent at all
+    monkeypatch.setattr(limiter, "max_wait", 0.0)
+    limiter.throttle(retry_after=5)
+    text, raw, _ = ac.call_openai_chat_with_meta("hi", "limited", deadline=1.0)
+    assert text is None and raw["error"].startswith("rate limiter")
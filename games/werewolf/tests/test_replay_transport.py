@@ -0,0 +1,85 @@
+import asyncio
+import json
+import random
+
+def _strip_timing(value):
+    # everything but per-call latency / audit ids / timestamps
+    if isinstance(value, dict):
+        return {k: _strip_timing(v) for k, v in value.items() if k not in ("meta", "latency", "ts", "timestamp")}
+    if isinstance(value, list):
+        return [_strip_timing(v) for v in value]
+    return value
+
+def _outcome(game):
+    return {"roles": game.roles, "day": game.day, "alive": sorted(game.alive), "history": _strip_timing(list(game.history))}
+
+def test_seed_reproduces_a_game_regardless_of_module_rng(ww):
+    players = [f"AI_{i}" for i in range(1, 11)]
+    random.seed(1)
+    first = ww.run_headless_game(players=players, heuristic_only=True, seed=42)
+    random.seed(2)
+    second = ww.run_headless_game(players=players, heuristic_only=True, seed=42)
+    assert first.seed == second.seed == 42
+    assert first.roles == second.roles and first.day == second.day and first.alive == second.alive
+    assert [e.get("phase") for e in first.history] == [e.get("phase") for e in second.history]
+
+    # the RNG position is persisted, so a restored game draws what the original would have
+    game = ww.Game(players, seed=5)
+    game.ai_enabled = False
+    game.step()
+    restored = ww.Game.from_state(json.loads(json.dumps(game.export_state())), list(game.history))
+    assert restored.seed == 5 and restored.rng.random() == game.rng.random()
+
+def test_seed_reproduces_a_game_with_parallel_ai_calls(ww):
+    # the default scheduler runs the seer chain next to the werewolf resolution on another thread / task
+    players = [f"AI_{i}" for i in range(1, 9)]
+
+    def play(engine):
+        game = engine(players, seed=7)
+        game.ai_enabled = False
+        game.parallel_ai_calls = True
+        if isinstance(game, ww.AsyncGame):
+            asyncio.run(game.arun_to_end(max_steps=40))
+        else:
+            for _ in range(40):
+                if game.state == "ended":
+                    break
+                game.step()
+        return json.dumps(_strip_timing(list(game.history)), sort_keys=True, default=str)
+
+    for engine in (ww.Game, ww.AsyncGame):
+        assert len({play(engine) for _ in range(15)}) == 1
+
+def test_record_then_replay_without_network(ww, mock_providers, tmp_path):
+    ac = ww.ai_client
+    mock = mock_providers(mock="seed=9")["mock"]
+    transcript_path = str(tmp_path / "transcripts" / "game.jsonl")
+    players = [f"AI_{i}" for i in range(1, 7)]
+    try:
+        ac.use_transcript("record", transcript_path)
+        recorded = ww.run_headless_game(players=players, seed=3, max_steps=4)
+        assert mock.stats["requests"] > 0
+        assert ac.TRANSCRIPT.stats["recorded"] == mock.stats["requests"]
+
+        sent = mock.stats["requests"]
+        ac.use_transcript("replay", transcript_path)
+        replayed = ww.run_headless_game(players=players, seed=3, max_steps=4)
+        assert mock.stats["requests"] == sent
+        assert ac.TRANSCRIPT.stats["missing"] == 0
+        assert ac.TRANSCRIPT.stats["replayed"] == sent
+        assert _outcome(replayed) == _outcome(recorded)
+
+        # a request that was never recorded fails like an unreachable provider
+        text, raw, _ = ac.call_openai_chat_with_meta("never recorded", "mock")
+        assert text is None and "no recorded response" in raw["error"]
+    finally:
+        ac.use_transcript(None)
+
+def test_start_route_accepts_seed(ww, monkeypatch, tmp_path):
+    monkeypatch.setattr(ww, "_ensure_auto_runner", lambda room_id: None)
+    monkeypatch.setattr(ww, "PLAYERS_CONFIG_PATH", str(tmp_path / "missing.json"))
+    client = ww.app.test_client()
+    room_id = ww.create_room("tester")
+    assert client.post(f"/rooms/{room_id}/start", json={"seed": "x"}).status_code == 400
+    assert client.post(f"/rooms/{room_id}/start", json={"seed": 77}).status_code == 200
+    assert ww.rooms[room_id]["game"].seed == 77
@@ -0,0 +1,53 @@
+import time
+
+def test_identical_requests_are_served_from_cache(ww, mock_providers, tmp_path, monkeypatch):
+    ac = ww.ai_client
+    mock = mock_providers(cached="latency_ms=1")["cached"]
+    db_path = str(tmp_path / "cache" / "responses.sqlite")
+    monkeypatch.setattr(ac, "RESPONSE_CACHE", ac.llmcache.ResponseCache(max_entries=10, path=db_path))
+    prompt = ac.build_day_prompt("AI_1", {"alive": ["AI_1", "AI_2"], "players": ["AI_1", "AI_2"]})
+    first = ac.call_openai_chat_with_meta(prompt, "cached", force_json=True)
+    assert first[0] and mock.stats["requests"] == 1
+    assert ac.call_openai_chat_with_meta(prompt, "cached", force_json=True) == first
+    tokens = []
+    text, _, model = ac.stream_openai_chat_with_meta(prompt, "cached", lambda d, t: tokens.append(d), force_json=True)
+    assert text == first[0] and tokens == [text] and model == "cached-model"
+    assert mock.stats["requests"] == 1
+    assert ac.LLM_CACHE.value(model="cached-model", result="memory") == 2
+
+    # a different prompt / response_format is a different key
+    ac.call_openai_chat_with_meta(prompt + " ", "cached", force_json=True)
+    ac.call_openai_chat_with_meta(prompt, "cached")
+    assert mock.stats["requests"] == 3
+
+    # the disk tier survives a restart
+    ac.RESPONSE_CACHE.close()
+    monkeypatch.setattr(ac, "RESPONSE_CACHE", ac.llmcache.ResponseCache(max_entries=10, path=db_path))
+    assert ac.call_openai_chat_with_meta(prompt, "cached", force_json=True) == first
+    assert mock.stats["requests"] == 3 and ac.RESPONSE_CACHE.stats["disk_hits"] == 1
+    ac.RESPONSE_CACHE.close()
+
+def test_failed_and_unparseable_replies_are_not_cached(ww, mock_providers, monkeypatch):
+    ac = ww.ai_client
+    mock = mock_providers(cached="malformed_rate=1")["cached"]
+    monkeypatch.setattr(ac, "HTTP_RETRIES", 0)
+    monkeypatch.setattr(ac, "RESPONSE_CACHE", ac.llmcache.ResponseCache())
+    prompt = ac.build_day_prompt("AI_1", {"alive": ["AI_1", "AI_2"], "players": ["AI_1", "AI_2"]})
+    ac.call_openai_chat_with_meta(prompt, "cached", force_json=True)
+    ac.call_openai_chat_with_meta(prompt, "cached", force_json=True)
+    assert mock.stats["requests"] == 2 and ac.RESPONSE_CACHE.stats["stored"] == 0
+
+def test_ttl_and_size_eviction(ww, tmp_path):
+    llmcache = ww.ai_client.llmcache
+    cache = llmcache.ResponseCache(max_entries=2, ttl=0.1, path=str(tmp_path / "c.sqlite"), max_disk_entries=10)
+    for i in range(12):
+        cache.put(f"k{i}", {"i": i})
+    snap = cache.snapshot()
+    assert snap["memory_entries"] == 2 and snap["disk_entries"] <= 10
+    assert cache.lookup("k0") == (None, "miss")
+    assert cache.lookup("k11") == ({"i": 11}, "memory")
+    assert cache.lookup("k9") == ({"i": 9}, "disk")
+    time.sleep(0.15)
+    assert cache.lookup("k11") == (None, "miss") and cache.stats["expired"] >= 1
+    assert llmcache.cache_key({"model": "m", "stream": True}) == llmcache.cache_key({"model": "m"})
+    cache.close()
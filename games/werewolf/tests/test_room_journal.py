@@ -0,0 +1,94 @@
+import importlib.util
+import json
+import pathlib
+import random
+
+def load_app_module():
+    base = pathlib.Path(__file__).resolve().parent.parent
+    app_path = base / "backend" / "app.py"
+    spec = importlib.util.spec_from_file_location("ww_app", str(app_path))
+    ww = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(ww)
+    return ww
+
+def _simulate_restart(ww):
+    # what a dead process leaves behind: files on disk, nothing in memory
+    for journal in list(ww._ROOM_JOURNALS.values()):
+        journal.close()
+    ww._ROOM_JOURNALS.clear()
+    ww.rooms.clear()
+    ww._ACTIVE_ROOMS.clear()
+
+def test_recover_running_room_from_snapshot_and_steps(monkeypatch, tmp_path):
+    ww = load_app_module()
+    resumed = []
+    monkeypatch.setattr(ww, "_ensure_auto_runner", resumed.append)
+    monkeypatch.setattr(ww, "JOURNAL_DIR", str(tmp_path / "journal"))
+    monkeypatch.setattr(ww, "JOURNAL_SNAPSHOT_EVERY", 2)
+    # 12 players so the game is still going after the steps below
+    players_path = tmp_path / "config.json"
+    players_path.write_text(json.dumps({"players": [f"AI_{i}" for i in range(1, 13)]}), encoding="utf-8")
+    monkeypatch.setattr(ww, "PLAYERS_CONFIG_PATH", str(players_path))
+    random.seed(20)
+    room_id = ww.create_room("tester")
+    assert ww.join_room(room_id, "guest") is None
+    assert ww.start_room_game(room_id) is None
+    r = ww.rooms[room_id]
+    game = r["game"]
+    game.ai_enabled = False
+    # 3 steps: snapshot after the 2nd, then one durable step record on top of it
+    for _ in range(3):
+        game.step()
+        assert not ww._record_step(r, game)
+    expected = json.loads(game.to_json()[1])
+    journal_path = tmp_path / "journal" / room_id / "journal.jsonl"
+    types = [json.loads(line)["type"] for line in journal_path.read_text(encoding="utf-8").splitlines()]
+    assert "step" in types and "event" in types
+    # the process dies in the middle of writing the next record
+    with open(journal_path, "a", encoding="utf-8") as f:
+        f.write('{"seq": 999, "type": "ev')
+
+    _simulate_restart(ww)
+    resumed.clear()
+    assert ww.recover_rooms() == [room_id]
+    recovered = ww.rooms[room_id]
+    restored = json.loads(recovered["game"].to_json()[1])
+    assert sorted(restored.pop("alive")) == sorted(expected.pop("alive"))
+    assert restored == expected
+    assert recovered["game"].history.total == game.history.total
+    assert recovered["players"] == game.players and recovered["owner"] == "tester"
+    assert recovered["state"] == "running" and resumed == [room_id]
+    # the recovered game keeps playing and keeps journaling
+    recovered["game"].ai_enabled = False
+    while recovered["game"].state != "ended" and recovered["game"].day < 20:
+        recovered["game"].step()
+        ww._record_step(recovered, recovered["game"])
+    _simulate_restart(ww)
+    resumed.clear()
+    assert ww.recover_rooms() == [room_id] and resumed == []
+    assert ww.rooms[room_id]["game"].history.total == recovered["game"].history.total
+    assert ww.rooms[room_id]["state"] == "ended"
+
+def test_waiting_room_recovered_and_discard_removes_journal(monkeypatch, tmp_path):
+    ww = load_app_module()
+    monkeypatch.setattr(ww, "JOURNAL_DIR", str(tmp_path))
+    room_id = ww.create_room("tester")
+    ww.join_room(room_id, "guest")
+    _simulate_restart(ww)
+    assert ww.recover_rooms() == [room_id]
+    assert ww.rooms[room_id]["players"] == ["tester", "guest"] and ww.rooms[room_id]["game"] is None
+    assert ww.leave_room(room_id, "tester") is None and ww.leave_room(room_id, "guest") is None
+    assert room_id not in ww.rooms and not (tmp_path / room_id).exists()
+
+def test_startup_recovery_skips_only_the_reloader_parent(monkeypatch):
+    ww = load_app_module()
+    calls = []
+    monkeypatch.setattr(ww, "recover_rooms", lambda: calls.append(1) or [])
+    monkeypatch.delenv("WERKZEUG_RUN_MAIN", raising=False)
+    ww.recover_rooms_at_startup(use_reloader=True)
+    assert calls == []
+    ww.recover_rooms_at_startup(use_reloader=False)
+    assert calls == [1]
+    monkeypatch.setenv("WERKZEUG_RUN_MAIN", "true")
+    ww.recover_rooms_at_startup(use_reloader=True)
+    assert calls == [1, 1]
@@ -0,0 +1,77 @@
+import importlib.util
+import json
+import pathlib
+
+def load_app_module():
+    base = pathlib.Path(__file__).resolve().parent.parent
+    app_path = base / "backend" / "app.py"
+    spec = importlib.util.spec_from_file_location("ww_app", str(app_path))
+    ww = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(ww)
+    return ww
+
+def test_to_json_cached_per_version():
+    ww = load_app_module()
+    game = ww.Game([f"AI_{i}" for i in range(1, 7)])
+    version, body = game.to_json()
+    assert game.to_json()[1] is body
+    assert json.loads(body) == json.loads(json.dumps(game.to_dict(), default=str))
+
+    victim = sorted(game.alive)[0]
+    game._mark_dead(victim, "test")
+    new_version, new_body = game.to_json()
+    assert new_version > version
+    assert victim not in json.loads(new_body)["alive"]
+
+    other = ww.Game([f"AI_{i}" for i in range(1, 7)])
+    assert other.version != game.version
+
+    # the legacy compatibility view is cached per version as well, next to the normalized one
+    legacy = game.to_json("legacy")
+    assert game.to_json("legacy")[1] is legacy[1] and game.to_json()[1] is new_body
+    assert json.loads(legacy[1]) == json.loads(json.dumps(game.to_dict("legacy"), default=str))
+    game._mark_dead(sorted(game.alive)[0], "test")
+    assert game.to_json("legacy")[0] > legacy[0]
+
+def test_state_endpoint_etag_and_304(monkeypatch):
+    ww = load_app_module()
+    monkeypatch.setattr(ww, "_ensure_auto_runner", lambda rid: None)
+    client = ww.app.test_client()
+    room_id = ww.create_room("tester")
+    assert ww.start_room_game(room_id) is None
+
+    first = client.get(f"/rooms/{room_id}/state")
+    assert first.status_code == 200 and first.headers.get("ETag")
+    assert first.get_json() == json.loads(json.dumps(ww.get_room_state(room_id), default=str))
+    again = client.get(f"/rooms/{room_id}/state", headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304 and again.data == b""
+
+    listing = client.get("/rooms")
+    assert [r["id"] for r in listing.get_json()["rooms"]] == [room_id]
+    assert client.get("/rooms", headers={"If-None-Match": listing.headers["ETag"]}).status_code == 304
+
+    ww.rooms[room_id]["game"].step()
+    changed = client.get(f"/rooms/{room_id}/state", headers={"If-None-Match": first.headers["ETag"]})
+    assert changed.status_code == 200 and changed.headers["ETag"] != first.headers["ETag"]
+    assert changed.get_json()["game"]["day"] == 1
+
+def test_room_listing_serializes_outside_rooms_lock(monkeypatch):
+    ww = load_app_module()
+    monkeypatch.setattr(ww, "_ensure_auto_runner", lambda rid: None)
+    room_id = ww.create_room("tester")
+    assert ww.start_room_game(room_id) is None
+    game = ww.rooms[room_id]["game"]
+    lock_held = []
+    original = game.to_dict
+
+    def watching_to_dict(*args):
+        lock_held.append(ww.rooms_lock.locked())
+        return original(*args)
+
+    monkeypatch.setattr(game, "to_dict", watching_to_dict)
+    client = ww.app.test_client()
+    assert client.get("/rooms").status_code == 200
+    assert client.get(f"/rooms/{room_id}/state").status_code == 200
+    game._touch()
+    assert ww.get_room_state(room_id)["game"]["players"] == game.players
+    assert lock_held == [False, False]
@@ -0,0 +1,155 @@
+import importlib.util
+import json
+import pathlib
+
+def load_app_module():
+    base = pathlib.Path(__file__).resolve().parent.parent
+    app_path = base / "backend" / "app.py"
+    spec = importlib.util.spec_from_file_location("ww_app", str(app_path))
+    ww = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(ww)
+    return ww
+
+class _FakeStreamResponse:
+    def __init__(self, lines):
+        self._lines = lines
+        self.headers = {"Content-Type": "text/event-stream"}
+        self.encoding = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        return None
+
+    def iter_lines(self, decode_unicode=False):
+        return iter(self._lines)
+
+def _sse_lines(pieces):
+    lines = [": keep-alive"]
+    for piece in pieces:
+        lines.append("data: " + json.dumps({"id": "c1", "model": "m", "choices": [{"delta": {"content": piece}}]}))
+        lines.append("")
+    lines.append("data: [DONE]")
+    return lines
+
+def test_stream_chat_parses_sse_and_decodes_speech(monkeypatch):
+    ww = load_app_module()
+    ac = ww.ai_client
+    pieces = ['{"action":"speak",', '"spe', 'ech":"我怀疑', 'AI_3\\', 'n有问题","meta":{}}']
+    sent = {}
+
+    class _FakeSession:
+        def post(self, url, json=None, headers=None, timeout=None, stream=False):
+            sent.update(json)
+            sent["_stream"] = stream
+            return _FakeStreamResponse(_sse_lines(pieces))
+
+    monkeypatch.setattr(ac, "get_http_session", lambda url: _FakeSession())
+    decoder = ac.SpeechStreamDecoder()
+    received = []
+    text, raw, model = ac.stream_openai_chat_with_meta(
+        "hi", "sk-test", lambda delta, _t: received.append(decoder.feed(delta)), model="m"
+    )
+    assert sent["stream"] is True and sent["_stream"] is True
+    assert text == "".join(pieces)
+    assert raw["choices"][0]["message"]["content"] == text and raw["stream_chunks"] == len(pieces)
+    assert "".join(received) == decoder.text == "我怀疑AI_3\n有问题"
+
+def test_day_speech_tokens_reach_event_sink(monkeypatch):
+    ww = load_app_module()
+    game = ww.Game([f"AI_{i}" for i in range(1, 7)])
+    events = []
+    game.event_sink = lambda event_type, data: events.append((event_type, data))
+
+    def fake_talk(player, context, talk_history, api_key=None, on_token=None):
+        assert on_token is not None
+        on_token("你好", "你好")
+        on_token("，我是村民", "你好，我是村民")
+        return {"speech": "你好，我是村民", "meta": {}}
+
+    monkeypatch.setattr(ww.ai_client, "decide_talk", fake_talk)
+    talks = game._run_discussion(rounds=1)
+    first = talks[0]["player"]
+    tokens = [d for t, d in events if t == "speech_token" and d["player"] == first]
+    assert [d["text"] for d in tokens] == ["你好", "你好，我是村民"]
+    finals = [d for t, d in events if t == "speech"]
+    assert [d["player"] for d in finals] == [t["player"] for t in talks]
+    assert finals[0]["speech"] == "你好，我是村民"
+
+def test_room_stream_endpoint(monkeypatch):
+    ww = load_app_module()
+    monkeypatch.setattr(ww, "SSE_HEARTBEAT_SECONDS", 0.01)
+    client = ww.app.test_client()
+    assert client.get("/rooms/nope/stream").status_code == 404
+    room_id = ww.create_room("tester")
+    resp = client.get(f"/rooms/{room_id}/stream", buffered=False)
+    assert resp.mimetype == "text/event-stream"
+    chunks = resp.response
+    assert next(chunks).startswith(b": connected")
+    ww._publish_room_event(room_id, "speech_token", {"player": "AI_1", "delta": "hi", "text": "hi"})
+    body = next(chunks)
+    while body.startswith(b":"):
+        body = next(chunks)
+    assert body.startswith(b"event: speech_token\ndata: ")
+
+    # discarding the room ends the stream instead of leaving it on heartbeats forever
+    with ww.rooms_lock:
+        ww._discard_room_unsafe(room_id)
+    rest = list(chunks)
+    assert rest[-1].startswith(b"event: end\ndata: ") and b"room_removed" in rest[-1]
+    resp.close()
+
+    # a subscriber that missed the wake-up notices on its next heartbeat
+    room_id = ww.create_room("tester")
+    resp = client.get(f"/rooms/{room_id}/stream", buffered=False)
+    chunks = resp.response
+    assert next(chunks).startswith(b": connected")
+    with ww.rooms_lock:
+        del ww.rooms[room_id]
+    assert list(chunks)[-1].startswith(b"event: end\ndata: ")
+    resp.close()
+
+def test_event_stream_sequence_and_resume():
+    ww = load_app_module()
+    stream = ww.RoomEventStream(backlog=3)
+    for i in range(5):
+        stream.publish("vote", {"i": i})
+    stream.publish("speech_token", {"delta": "x"}, transient=True)
+    assert stream.last_seq == 5
+    _, replay, resync = stream.subscribe(since=3)
+    assert [e["seq"] for e in replay] == [4, 5] and resync is False
+    # seq 2 was evicted from the 3-event ring buffer
+    _, replay, resync = stream.subscribe(since=1)
+    assert [e["seq"] for e in replay] == [3, 4, 5] and resync is True
+    _, _, resync = stream.subscribe(since=99)
+    assert resync is True
+
+def test_game_deltas_published_with_seq_and_replayed(monkeypatch):
+    ww = load_app_module()
+    client = ww.app.test_client()
+    room_id = ww.create_room("tester")
+    monkeypatch.setattr(ww, "_ensure_auto_runner", lambda rid: None)
+    assert ww.start_room_game(room_id) is None
+    game = ww.rooms[room_id]["game"]
+    # two wolves and no witch: nobody can win before the first day vote
+    for i, player in enumerate(game.players):
+        game.set_player_role(player, "werewolf" if i < 2 else "villager")
+    game.step()
+    game.step()
+    stream = ww._room_stream(room_id)
+    _, replay, _ = stream.subscribe(since=0)
+    types = [e["type"] for e in replay]
+    assert types[0] == "phase" and replay[0]["data"]["state"] == "night"
+    assert "vote" in types and "speech" in types and "speech_token" not in types
+    assert [e["seq"] for e in replay] == list(range(1, len(replay) + 1))
+    assert client.get(f"/rooms/{room_id}/state").get_json()["event_seq"] == stream.last_seq
+
+    resp = client.get(f"/rooms/{room_id}/stream", headers={"Last-Event-ID": str(len(replay) - 1)}, buffered=False)
+    chunks = resp.response
+    assert next(chunks).startswith(b": connected")
+    assert next(chunks).startswith(f"id: {len(replay)}\nevent: {types[-1]}".encode())
+    resp.close()